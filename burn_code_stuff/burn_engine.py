@@ -0,0 +1,630 @@
+# Standard imports
+import argparse
+import asyncio
+from dataclasses import dataclass, field
+import heapq
+import json
+import logging
+import os
+import random
+import tempfile
+import time
+
+# Bittensor imports
+import bittensor as bt
+from bittensor.wallet import Wallet
+
+# Local imports
+from burn_subnet import (
+    BLOCK_FEED_WAIT_MARGIN,
+    BLOCK_TIME,
+    LOCAL_SUBTENSORS,
+    PREPARE_BLOCKS,
+    SUBNET_PARAMS_CACHE_TTL,
+    TRIGGER_POLL_INTERVAL,
+    BurnContext,
+    BurnValidator,
+    NeuronTable,
+    NeuronsUnavailableError,
+    PreparedWeights,
+    SubnetParamsCache,
+    get_storage_value,
+    logger,
+)
+from restarter.block_feed import get_block_feed
+from restarter.pm2_inventory import get_pm2_inventory
+
+
+# Constants
+
+# The burn subnets gathered by gather_burn_subnets
+BURN_SUBNETS_FILE = "~/.bittensor/burn_subnets_data/burn_subnets_data.json"
+
+# The engine's subnets, read by gather_burn_subnets
+BURN_ENGINE_SUBNETS_FILE = "~/.bittensor/burn_subnets_data/burn_engine_subnets.json"
+
+# Blocks to wait before checking again whether a subnet's burn_sn<N> process
+# is still running
+BURN_PROCESS_RECHECK_BLOCKS = 30
+
+# The number of subtensor connections shared by all the burn subnets
+DEFAULT_CONNECTIONS = 4
+
+# Blocks to wait before retrying a subnet that failed
+RETRY_BLOCKS = 5
+
+# Seconds between the first run of each subnet when the engine starts
+START_STAGGER = 1
+
+# Seconds a subnet may hold a subtensor connection before its run is
+# cancelled and the connection rotated
+RUN_TIMEOUT = 180
+
+# Seconds to wait for a subtensor connection to open or close
+CONNECT_TIMEOUT = 30
+
+
+async def query_storage_at_async(subtensor, block_hash, queries):
+    # Async version of burn_subnet.query_storage_at.
+    substrate = subtensor.substrate
+    storage_keys = []
+    names = {}
+    for name, (pallet, storage_function, params) in queries.items():
+        storage_key = await substrate.create_storage_key(
+            pallet, storage_function, params, block_hash=block_hash
+        )
+        storage_keys.append(storage_key)
+        names[storage_key.to_hex()] = name
+
+    values = dict.fromkeys(queries)
+    for storage_key, value in await substrate.query_multi(storage_keys, block_hash=block_hash):
+        values[names[storage_key.to_hex()]] = get_storage_value(value)
+    return values
+
+
+class SubnetLogger(logging.LoggerAdapter):
+    def process(self, msg, kwargs):
+        return f"[sn{self.extra['netuid']}] {msg}", kwargs
+
+
+@dataclass
+class BurnSubnetState:
+    netuid: int
+    wallet: Wallet = field(repr=False)
+    log: SubnetLogger = field(repr=False)
+    params_cache: SubnetParamsCache = field(repr=False)
+    target_uid: int = None
+    deadline: float = 0  # time.time() of the next run
+    trigger_block: int = None  # The next weight setting block, if known
+    runs: int = 0
+    submissions: int = 0
+    last_submit_time: float = None
+    last_error: str = None
+    # The neuron table, fetched on first use, and the epoch it was fetched in
+    neuron_table: NeuronTable = field(default=None, repr=False)
+    neuron_table_epoch: int = None
+
+
+# Subtensor connections shared by the burn subnets. A connection is taken
+# for the duration of one subnet run, so at most pool size subnets query the
+# chain at once. A connection is only moved to another local subtensor when
+# a run on it fails.
+class SubtensorPool:
+    def __init__(self, size, network_names):
+        # Spread the connections over the local subtensors.
+        random.seed()
+        start_index = random.randint(0, len(network_names) - 1)
+        self._all_connections = [
+            _PooledSubtensor(network_names, (start_index + i) % len(network_names))
+            for i in range(size)
+        ]
+
+        self._connections = asyncio.Queue()
+        for connection in self._all_connections:
+            self._connections.put_nowait(connection)
+
+    async def acquire(self):
+        connection = await self._connections.get()
+        try:
+            await asyncio.wait_for(connection.connect(), CONNECT_TIMEOUT)
+        except Exception:
+            await self.release(connection, failed=True)
+            raise
+        return connection
+
+    async def release(self, connection, failed=False):
+        if failed:
+            logger.error("Rotating subtensor connection from '%s'.", connection.network)
+            await connection.rotate()
+        self._connections.put_nowait(connection)
+
+    async def close(self):
+        for connection in self._all_connections:
+            await connection.close()
+
+
+class _PooledSubtensor:
+    def __init__(self, network_names, network_index):
+        self._network_names = network_names
+        self._network_index = network_index
+        self.network = None
+        self.subtensor = None
+        self._subtensor_context = None
+
+    async def connect(self):
+        if self.subtensor is not None:
+            return
+
+        network_name = self._network_names[self._network_index]
+        self.network = f"ws://subtensor-{network_name}.rizzo.network:9944"
+        logger.info("Connecting to subtensor network: %s", self.network)
+        subtensor_context = bt.AsyncSubtensor(network=self.network)
+        self.subtensor = await subtensor_context.__aenter__()
+        self._subtensor_context = subtensor_context
+
+    async def rotate(self):
+        await self.close()
+        self._network_index = (self._network_index + 1) % len(self._network_names)
+
+    async def close(self):
+        if self._subtensor_context is None:
+            return
+
+        subtensor_context = self._subtensor_context
+        self.subtensor = None
+        self._subtensor_context = None
+        try:
+            await asyncio.wait_for(
+                subtensor_context.__aexit__(None, None, None), CONNECT_TIMEOUT
+            )
+        except Exception as exc:
+            logger.warning(
+                "Error closing subtensor connection: %s: %s", type(exc).__name__, exc
+            )
+
+
+# Runs the burn code for every burn subnet in a single process. The wallets
+# are loaded once and a small pool of subtensor connections is shared by all
+# the subnets, rather than each subnet running its own process which opens a
+# new connection and loads its wallet on every run.
+#
+# Each subnet's next run time is kept in a priority queue. The engine sleeps
+# until the earliest one, then runs that subnet as a task. A run follows the
+# same steps as a burn_subnet.py iteration, through the BurnValidator static
+# methods: the weights are prepared PREPARE_BLOCKS before the weight setting
+# block and set on it, then the subnet is queued again for its next weight
+# setting block. The run times are counted on the block feed when it's on.
+class BurnEngine:
+    def __init__(
+        self, netuids, target_uids, connections, network_names, params_cache_ttl, block_feed=None
+    ):
+        self._subtensor_pool = SubtensorPool(connections, network_names)
+        self._block_feed = block_feed
+
+        self._states = {}
+        for netuid in netuids:
+            self._states[netuid] = BurnSubnetState(
+                netuid=netuid,
+                wallet=Wallet(name="RizzoNetwork", hotkey=f"rz{netuid:03d}"),
+                log=SubnetLogger(logger, {"netuid": netuid}),
+                # Shared with burn_subnet.py runs on the same subnet.
+                params_cache=SubnetParamsCache("burn", netuid, ttl=params_cache_ttl),
+                target_uid=target_uids.get(netuid),
+            )
+
+        self._deadlines = []  # heap of (deadline, netuid)
+        self._deadlines_changed = None
+        self._tasks = set()  # Running subnet tasks, referenced until done
+
+    async def run(self):
+        self._deadlines_changed = asyncio.Event()
+        logger.info(
+            "Running burn engine for %s subnets: %s",
+            len(self._states), sorted(self._states)
+        )
+
+        # Stagger the first runs so the subnets don't all query at once.
+        start_time = time.time()
+        for i, netuid in enumerate(sorted(self._states)):
+            self._schedule(netuid, start_time + i * START_STAGGER)
+
+        try:
+            while True:
+                await self._wait_for_next_deadline()
+                _, netuid = heapq.heappop(self._deadlines)
+                task = asyncio.create_task(self._run_subnet(self._states[netuid]))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+        finally:
+            await self._subtensor_pool.close()
+
+    def _schedule(self, netuid, deadline):
+        self._states[netuid].deadline = deadline
+        heapq.heappush(self._deadlines, (deadline, netuid))
+        self._deadlines_changed.set()
+
+    async def _wait_for_next_deadline(self):
+        while True:
+            self._deadlines_changed.clear()
+            if self._deadlines:
+                delay = self._deadlines[0][0] - time.time()
+                if delay <= 0:
+                    return
+            else:
+                delay = None
+
+            # Wake up early if a subnet is scheduled in the meantime.
+            try:
+                await asyncio.wait_for(self._deadlines_changed.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _run_subnet(self, state):
+        try:
+            # A subnet with its own burn_sn<N> process is left to it, so the
+            # weights aren't set twice.
+            if await asyncio.to_thread(has_burn_process, state.netuid):
+                state.log.info("burn_sn%i is running, skipping the subnet...", state.netuid)
+                wait_blocks, from_block, state.trigger_block = (
+                    BURN_PROCESS_RECHECK_BLOCKS, None, None
+                )
+            else:
+                state.runs += 1
+                wait_blocks, from_block, state.trigger_block = await self._run_with_connection(
+                    state, self._burn
+                )
+            state.last_error = None
+        except Exception as exc:
+            state.last_error = f"{type(exc).__name__}: {exc}"
+            state.log.exception("Burn run failed: %s", state.last_error)
+            wait_blocks, from_block, state.trigger_block = RETRY_BLOCKS, None, None
+
+        state.log.info(
+            "Waiting %s blocks from block %s before next weight set...", wait_blocks, from_block
+        )
+        self._schedule(state.netuid, self._get_deadline(wait_blocks, from_block))
+
+    def _get_deadline(self, wait_blocks, from_block):
+        # The wait is counted from the block it was computed at, with the
+        # block time measured by the block feed. Without the block feed, or
+        # the block, it's counted from now with the block time.
+        block = self._block_feed.get_block() if self._block_feed else None
+        if block is None or from_block is None:
+            return time.time() + wait_blocks * BLOCK_TIME + 0.1
+
+        remaining_blocks = from_block + wait_blocks - block.number
+        block_time = self._block_feed.get_block_time(BLOCK_TIME)
+        return block.receive_time + remaining_blocks * block_time + 0.1
+
+    async def _run_with_connection(self, state, func):
+        # Runs func(state, subtensor) on a pooled connection. The run is
+        # cancelled after RUN_TIMEOUT seconds so a hung call can't keep the
+        # connection from the other subnets.
+        connection = await self._subtensor_pool.acquire()
+        try:
+            result = await asyncio.wait_for(func(state, connection.subtensor), RUN_TIMEOUT)
+        except asyncio.TimeoutError:
+            await self._subtensor_pool.release(connection, failed=True)
+            raise TimeoutError(
+                f"Run took longer than {RUN_TIMEOUT} seconds on '{connection.network}'."
+            )
+        except Exception:
+            # Don't reuse a connection that may be broken.
+            await self._subtensor_pool.release(connection, failed=True)
+            raise
+        await self._subtensor_pool.release(connection)
+        return result
+
+    async def _burn(self, state, subtensor):
+        # The same steps as BurnValidator.burn. Returns the number of blocks
+        # to wait, the block they're counted from and the next weight setting
+        # block.
+        context = await self._fetch_burn_context(state, subtensor)
+
+        early_wake_wait = BurnValidator.get_early_wake_wait(
+            context, state.trigger_block, state.log
+        )
+        if early_wake_wait is not None:
+            return early_wake_wait
+
+        prepared_weights, wait_blocks = await self._prepare_weights(state, subtensor, context)
+        if prepared_weights is None:
+            return wait_blocks, context.block, None
+
+        # Otherwise the weights are set right away, e.g. on the first run.
+        blocks_to_trigger = BurnValidator.get_blocks_to_trigger(context)
+        if 0 < blocks_to_trigger <= PREPARE_BLOCKS:
+            await self._wait_for_trigger_block(state, subtensor, context.block + blocks_to_trigger)
+
+        return await self._commit_weights(state, subtensor, context, prepared_weights)
+
+    async def _prepare_weights(self, state, subtensor, context):
+        # Returns the prepared weights, or None and the number of blocks to
+        # wait if weights can't be set.
+        this_uid = BurnValidator.ensure_registered_and_validator_permit(context, state.log)
+        if this_uid is None:
+            return None, BurnValidator.get_blocks_until_next_epoch(context, state.log)
+
+        try:
+            burn_uid = await self._determine_burn_uid(state, subtensor, context)
+            if burn_uid is None:
+                return None, BurnValidator.get_blocks_until_next_epoch(context, state.log)
+
+            # The neurons are only needed to select the epsilon uids.
+            neuron_table = None
+            if context.min_allowed_weights > 1:
+                neuron_table = await self._get_neuron_table(state, subtensor, context)
+        except NeuronsUnavailableError:
+            state.log.warning("Unable to retrieve neurons, retrying shortly...")
+            return None, RETRY_BLOCKS
+
+        weights = BurnValidator.build_weight_payload(
+            neuron_table, this_uid, burn_uid, context.min_allowed_weights, context.max_weight_limit
+        )
+        state.log.info("Weights: %s", weights)
+
+        prepared_weights = PreparedWeights(
+            state.netuid, weights, BurnValidator.get_mechids(context), context.version_key
+        )
+        return prepared_weights, None
+
+    async def _wait_for_trigger_block(self, state, subtensor, trigger_block):
+        # Waits on the block feed when it's on, otherwise polls the block
+        # number on the connection the weights are set on.
+        state.log.info("Waiting for weight setting block %s...", trigger_block)
+        block = self._block_feed.get_block() if self._block_feed else None
+        if block is not None:
+            timeout = (
+                max(trigger_block - block.number, 0) * self._block_feed.get_block_time(BLOCK_TIME)
+                + BLOCK_FEED_WAIT_MARGIN
+            )
+            if await asyncio.to_thread(self._block_feed.wait_for_block, trigger_block, timeout):
+                return
+            state.log.warning(
+                "Block feed did not reach block %s in %i seconds. Polling the block number.",
+                trigger_block, timeout
+            )
+
+        while True:
+            block_hash = await subtensor.substrate.get_chain_head()
+            block_number = (await query_storage_at_async(subtensor, block_hash, {
+                "block": ("System", "Number", []),
+            }))["block"]
+            if block_number >= trigger_block:
+                return
+
+            await asyncio.sleep(
+                BLOCK_TIME if trigger_block - block_number > 1 else TRIGGER_POLL_INTERVAL
+            )
+
+    async def _commit_weights(self, state, subtensor, context, prepared_weights):
+        block_hash = await subtensor.substrate.get_chain_head()
+        values = await query_storage_at_async(
+            subtensor, block_hash, BurnValidator.get_commit_queries(state.netuid)
+        )
+        prepared_weights = BurnValidator.check_commit_values(
+            state.params_cache, context, prepared_weights, values, state.log
+        )
+
+        submitted = await self._submit_weights(state, subtensor, prepared_weights)
+        if submitted:
+            state.submissions += 1
+            state.last_submit_time = time.time()
+        return BurnValidator.get_commit_wait(context, values, submitted, state.log)
+
+    async def _fetch_burn_context(self, state, subtensor):
+        # Reads everything the run needs from storage in one request, pinned
+        # to the chain head so the values are consistent. The subnet
+        # parameters are only read, at the same block, when they aren't
+        # cached.
+        block_hash = await subtensor.substrate.get_chain_head()
+        values = await query_storage_at_async(
+            subtensor,
+            block_hash,
+            BurnContext.get_queries(state.netuid, state.wallet.hotkey.ss58_address),
+        )
+
+        cached_params = state.params_cache.get(values["block"])
+        if cached_params:
+            params_block, params = cached_params
+        else:
+            params_block = values["block"]
+            params = await query_storage_at_async(
+                subtensor, block_hash, BurnContext.get_param_queries(state.netuid)
+            )
+            state.params_cache.set(params_block, params)
+
+        context = BurnContext.from_storage(block_hash, values, params_block, params)
+        context.log(state.log)
+        return context
+
+    async def _get_neuron_table(self, state, subtensor, context):
+        # The neurons are only fetched for the epsilon uids or the owner
+        # coldkey fallback, and kept for the rest of the epoch.
+        if state.neuron_table_epoch != context.epoch_start_block:
+            try:
+                neurons = (await subtensor.subnets.metagraph(state.netuid)).neurons
+            except Exception as e:
+                state.log.exception("Error fetching neurons: %s", e)
+                neurons = None
+            if not neurons:
+                raise NeuronsUnavailableError()
+            state.neuron_table = NeuronTable.from_neurons(neurons, block=context.block)
+            state.neuron_table_epoch = context.epoch_start_block
+
+        return state.neuron_table
+
+    async def _determine_burn_uid(self, state, subtensor, context):
+        if state.target_uid is not None:
+            state.log.info("Using manually specified target UID: %s", state.target_uid)
+            return state.target_uid
+
+        if context.owner_uid is not None:
+            state.log.info("Owner UID: %i (cached)", context.owner_uid)
+            return context.owner_uid
+
+        state.log.info("Owner Hotkey: %s", context.owner_hotkey)
+        burn_uid = (await query_storage_at_async(subtensor, context.block_hash, {
+            "owner_uid": ("SubtensorModule", "Uids", [state.netuid, context.owner_hotkey]),
+        }))["owner_uid"]
+        if burn_uid is None:
+            state.log.info(
+                "Owner hotkey not registered, attempting fallback via owner coldkey lookup."
+            )
+            state.log.info("Owner Coldkey: %s", context.owner_coldkey)
+            neuron_table = await self._get_neuron_table(state, subtensor, context)
+            burn_uid = BurnValidator.get_oldest_owner_uid(neuron_table, context.owner_coldkey)
+
+        if burn_uid is None:
+            state.log.info("Could not auto-detected burn UID.")
+        else:
+            state.log.info("Auto-detected burn UID: %s", burn_uid)
+            state.params_cache.update(owner_uid=burn_uid)
+        return burn_uid
+
+    async def _submit_weights(self, state, subtensor, prepared_weights):
+        any_success = False
+
+        for mechid, call in prepared_weights.calls.items():
+            try:
+                result = (
+                    await subtensor.execute(call, state.wallet, retries=2)
+                ).raise_for_failure()
+            except bt.ChainError as exc:
+                result = exc
+
+            any_success |= BurnValidator.check_weights_result(
+                state.params_cache, mechid, result, state.log
+            )
+
+        return any_success
+
+
+def has_burn_process(netuid):
+    # Returns whether the subnet has an online burn_subnet.py pm2 process.
+    for pm2_process in get_pm2_inventory().find_by_arg("--netuid", netuid):
+        if pm2_process.script_name == "burn_subnet.py" and pm2_process.online:
+            return True
+    return False
+
+
+def write_engine_subnets_file(netuids):
+    # Written atomically so gather_burn_subnets never reads a partial file.
+    engine_subnets_file = os.path.expanduser(BURN_ENGINE_SUBNETS_FILE)
+    engine_subnets_dir = os.path.dirname(engine_subnets_file)
+    os.makedirs(engine_subnets_dir, exist_ok=True)
+    fd, tmp_file = tempfile.mkstemp(dir=engine_subnets_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as fp:
+            json.dump(netuids, fp)
+        os.replace(tmp_file, engine_subnets_file)
+    except Exception:
+        os.unlink(tmp_file)
+        raise
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Run the burn code for all the burn subnets in a single process."
+    )
+
+    parser.add_argument(
+        "--netuids",
+        type=int,
+        nargs="+",
+        help="The burn subnets. When not specified, the subnets are read from "
+             "the --netuids-file. Subnets with a running burn_sn<N> process are "
+             "skipped while it runs."
+    )
+
+    parser.add_argument(
+        "--netuids-file",
+        default=BURN_SUBNETS_FILE,
+        help="The json file listing the burn subnets, as written by "
+             f"gather_burn_subnets. Default: {BURN_SUBNETS_FILE}"
+    )
+
+    parser.add_argument(
+        "--target-uid",
+        nargs=2,
+        type=int,
+        action="append",
+        default=[],
+        metavar=("NETUID", "UID"),
+        help="Manually specify the target UID to burn weights to on a subnet "
+             "(overrides auto-detection). May be specified multiple times."
+    )
+
+    parser.add_argument(
+        "--connections",
+        type=int,
+        default=DEFAULT_CONNECTIONS,
+        help="The number of subtensor connections shared by the subnets. "
+             f"Default: {DEFAULT_CONNECTIONS}"
+    )
+
+    parser.add_argument(
+        "--local-subtensor",
+        help="Use the specified local subtensor (i.e. la, cali, titan, etc.). "
+             "When not specified, the connections rotate between all local subtensors."
+    )
+
+    parser.add_argument(
+        "--block-feed",
+        action="store_true",
+        help="Count the blocks to the next weight setting block by following the chain "
+             "head through a new heads subscription on the local subtensors, rather "
+             "than assuming 12 seconds per block."
+    )
+
+    parser.add_argument(
+        "--params-cache-ttl",
+        type=int,
+        default=SUBNET_PARAMS_CACHE_TTL,
+        help="The number of blocks to cache the subnet parameters, e.g. the weights "
+             "version key and weight limits, for. 0 disables the cache. "
+             f"Default: {SUBNET_PARAMS_CACHE_TTL}"
+    )
+
+    options = parser.parse_args()
+
+    if not options.netuids:
+        netuids_file = os.path.expanduser(options.netuids_file)
+        try:
+            with open(netuids_file, "r") as fp:
+                options.netuids = [int(netuid) for netuid in json.load(fp)]
+        except (OSError, ValueError, TypeError) as exc:
+            parser.error(f"Could not read burn subnets file {netuids_file}: {exc}")
+
+    if not options.netuids:
+        parser.error("No burn subnets.")
+
+    return options
+
+
+def main(options):
+    network_names = (
+        [options.local_subtensor] if options.local_subtensor else LOCAL_SUBTENSORS
+    )
+    netuids = sorted(set(options.netuids))
+    write_engine_subnets_file(netuids)
+
+    block_feed = None
+    if options.block_feed:
+        block_feed = get_block_feed(network_names)
+        if block_feed is None:
+            logger.warning("Could not import the websockets python module. Not using the block feed.")
+
+    engine = BurnEngine(
+        netuids,
+        dict(options.target_uid),
+        options.connections,
+        network_names,
+        options.params_cache_ttl,
+        block_feed,
+    )
+    asyncio.run(engine.run())
+
+
+if __name__ == "__main__":
+    main(parse_args())
@@ -1,8 +1,12 @@
+from __future__ import annotations
+
 # Standard imports
 import argparse
+from dataclasses import dataclass, field, replace
 import logging
 import multiprocessing
 import random
+import os
 import sys
 import time
 
@@ -10,6 +14,18 @@ import time
 import bittensor as bt
 from bittensor.wallet import Wallet
 
+# Numpy imports
+import numpy
+
+# Set path to import local modules
+sys.path = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] + sys.path
+
+# Local imports
+from restarter.block_feed import get_block_feed
+from restarter.constants import SUBNET_PARAMS_CACHE_TTL
+from restarter.neuron_table import NeuronTable
+from restarter.subnet_params_cache import SubnetParamsCache
+
 
 # Constants
 
@@ -19,6 +35,21 @@ BLOCK_TIME = 12
 # The number of blocks before the end of the tempo should the weights be set
 DELTA = 9
 
+# The number of blocks before the weight setting block to prepare the weights
+PREPARE_BLOCKS = 3
+
+# Seconds between block number checks while waiting for the weight setting
+# block in the last block before it
+TRIGGER_POLL_INTERVAL = 1
+
+# Extra seconds to wait for the block feed to reach the next weight setting
+# block before falling back to the block time
+BLOCK_FEED_WAIT_MARGIN = 60
+
+# Seconds between checks of the block feed's latest block while waiting for
+# the weight setting block in the iteration subprocess
+FEED_BLOCK_POLL_INTERVAL = 0.1
+
 # Local subtensors to rotate
 LOCAL_SUBTENSORS = [
     "cali",
@@ -43,10 +74,158 @@ logger = logging.getLogger(__name__)
 # Create Mulitprocessing queue
 mp_queue = multiprocessing.Queue()
 
+# The latest block number on the block feed, published by the main process
+# for the iteration subprocesses. 0 without the block feed.
+mp_feed_block = multiprocessing.Value("q", 0)
+
+
+def get_storage_value(value):
+    # query_multi returns decoded scale objects.
+    return getattr(value, "value", value)
+
+
+def query_storage_at(subtensor, block_hash, queries):
+    # Reads the storage for each name -> (pallet, storage function, params) in
+    # a single query_multi request at the block hash. Returns the values by
+    # name.
+    substrate = subtensor.substrate
+    storage_keys = []
+    names = {}
+    for name, (pallet, storage_function, params) in queries.items():
+        storage_key = substrate.create_storage_key(
+            pallet, storage_function, params, block_hash=block_hash
+        )
+        storage_keys.append(storage_key)
+        names[storage_key.to_hex()] = name
+
+    # The results aren't necessarily in the order of the keys.
+    values = dict.fromkeys(queries)
+    for storage_key, value in substrate.query_multi(storage_keys, block_hash=block_hash):
+        values[names[storage_key.to_hex()]] = get_storage_value(value)
+    return values
+
+
+class NeuronsUnavailableError(Exception):
+    pass
+
+
+@dataclass
+class PreparedWeights:
+    # The weight setting calls, by mechid, built before the weight setting
+    # block so only the submission is left for it.
+    netuid: int
+    weights: dict
+    mechids: list
+    version_key: int
+    calls: dict = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.calls = {
+            mechid: bt.SetWeights(
+                netuid=self.netuid,
+                weights=self.weights,
+                mechid=mechid,
+                version_key=self.version_key
+            )
+            for mechid in self.mechids
+        }
+
+
+@dataclass
+class BurnContext:
+    # The subnet state used by one burn iteration, read at a single block.
+    # The slow changing subnet parameters may come from the parameter cache,
+    # read at params_block.
+    block: int
+    block_hash: str
+    tempo: int
+    blocks_since_last_step: int
+    this_uid: int | None
+    validator_permits: list
+    params_block: int
+    version_key: int
+    mech_count: int
+    mech_split: list | None
+    owner_hotkey: str | None
+    owner_coldkey: str | None
+    min_allowed_weights: int
+    max_weight_limit: int
+    owner_uid: int | None = None  # Resolved from the owner keys and cached
+
+    @staticmethod
+    def get_queries(netuid, hotkey):
+        # The state read on every iteration. The System Number is the number
+        # of the block the storage is read at.
+        return {
+            "block": ("System", "Number", []),
+            "tempo": ("SubtensorModule", "Tempo", [netuid]),
+            "blocks_since_last_step": ("SubtensorModule", "BlocksSinceLastStep", [netuid]),
+            "this_uid": ("SubtensorModule", "Uids", [netuid, hotkey]),
+            "validator_permits": ("SubtensorModule", "ValidatorPermit", [netuid]),
+        }
+
+    @staticmethod
+    def get_param_queries(netuid):
+        # The subnet parameters, which are cached.
+        return {
+            "version_key": ("SubtensorModule", "WeightsVersionKey", [netuid]),
+            "mech_count": ("SubtensorModule", "MechanismCountCurrent", [netuid]),
+            "mech_split": ("SubtensorModule", "MechanismEmissionSplit", [netuid]),
+            "owner_hotkey": ("SubtensorModule", "SubnetOwnerHotkey", [netuid]),
+            "owner_coldkey": ("SubtensorModule", "SubnetOwner", [netuid]),
+            "min_allowed_weights": ("SubtensorModule", "MinAllowedWeights", [netuid]),
+            "max_weight_limit": ("SubtensorModule", "MaxWeightsLimit", [netuid]),
+        }
+
+    @classmethod
+    def from_storage(cls, block_hash, values, params_block, params):
+        return cls(
+            block=values["block"],
+            block_hash=block_hash,
+            tempo=values["tempo"],
+            blocks_since_last_step=values["blocks_since_last_step"],
+            this_uid=values["this_uid"],
+            validator_permits=values["validator_permits"] or [],
+            params_block=params_block,
+            version_key=params["version_key"],
+            mech_count=params["mech_count"] or 1,
+            mech_split=params["mech_split"],
+            owner_hotkey=params["owner_hotkey"],
+            owner_coldkey=params["owner_coldkey"],
+            min_allowed_weights=BurnValidator.parse_min_allowed_weights(
+                params["min_allowed_weights"]
+            ),
+            max_weight_limit=BurnValidator.parse_max_weight_limit(params["max_weight_limit"]),
+            owner_uid=params.get("owner_uid"),
+        )
+
+    @property
+    def epoch_start_block(self):
+        # Identifies the epoch the block is in.
+        return self.block - self.blocks_since_last_step
+
+    def log(self, log):
+        log.info("Block: %s (%s)", self.block, self.block_hash)
+        log.info("Tempo: %s", self.tempo)
+        log.info("Blocks Since Last Step: %s", self.blocks_since_last_step)
+        if self.params_block != self.block:
+            log.info("Using the subnet parameters cached at block %s.", self.params_block)
+        log.info("Weights Version Key: %s", self.version_key)
+        log.info("Mechanism Count: %s", self.mech_count)
+        log.info("Min Allowed Weights: %s", self.min_allowed_weights)
+        log.info("Max Weight Limit: %s", self.max_weight_limit)
+
 
 class BurnValidator:
     def __init__(self):
         self.config = self.get_config()
+        self.params_cache = SubnetParamsCache(
+            "burn", self.config.netuid, ttl=self.config.params_cache_ttl
+        )
+
+        # The neuron table, fetched on first use. Each iteration runs in a
+        # new subprocess, so it's only kept for that iteration.
+        self.neuron_table = None
 
         # Randomize local subtensor index.
         random.seed()
@@ -96,6 +275,23 @@ class BurnValidator:
                  "subtensors. When not specified, use the 'finney' network subtensor."
         )
 
+        run_command_parser.add_argument(
+            "--block-feed",
+            action="store_true",
+            help="Wait for the next weight setting block by following the chain head "
+                 "through a new heads subscription on the local subtensors, rather than "
+                 "sleeping 12 seconds per block. Requires --local-subtensor."
+        )
+
+        run_command_parser.add_argument(
+            "--params-cache-ttl",
+            type=int,
+            default=SUBNET_PARAMS_CACHE_TTL,
+            help="The number of blocks to cache the subnet parameters, e.g. the weights "
+                 "version key and weight limits, for. 0 disables the cache. "
+                 f"Default: {SUBNET_PARAMS_CACHE_TTL}"
+        )
+
         parser.add_argument(
             "--subprocess",
             action="store_true",
@@ -123,94 +319,113 @@ class BurnValidator:
         self.config.subtensor_network = \
             f"ws://subtensor-{network_name}.rizzo.network:9944"
 
-    def _get_tempo_data(self, subtensor):
-        curr_block = subtensor.block
-
-        tempo = subtensor.query(
-            bt.storage.SubtensorModule.Tempo,
-            params=[self.config.netuid],
+    def fetch_burn_context(self, subtensor, wallet):
+        # Reads everything the iteration needs from storage in one request,
+        # pinned to the chain head so the values are consistent. The subnet
+        # parameters are only read, at the same block, when they aren't
+        # cached.
+        block_hash = subtensor.substrate.get_chain_head()
+        values = query_storage_at(
+            subtensor,
+            block_hash,
+            BurnContext.get_queries(self.config.netuid, wallet.hotkey.ss58_address),
         )
-        logger.info("Tempo: %s", tempo)
 
-        blocks_since_last_step = subtensor.query(
-            bt.storage.SubtensorModule.BlocksSinceLastStep,
-            block=curr_block,
-            params=[self.config.netuid],
-        )
+        cached_params = self.params_cache.get(values["block"])
+        if cached_params:
+            params_block, params = cached_params
+        else:
+            params_block = values["block"]
+            params = query_storage_at(
+                subtensor, block_hash, BurnContext.get_param_queries(self.config.netuid)
+            )
+            self.params_cache.set(params_block, params)
 
-        logger.info("Blocks Since Last Step: %s", blocks_since_last_step)
-        return tempo, blocks_since_last_step
+        context = BurnContext.from_storage(block_hash, values, params_block, params)
+        context.log(logger)
+        return context
 
-    def get_blocks_until_next_epoch(self, subtensor):
-        tempo, blocks_since_last_step = self._get_tempo_data(subtensor)
-        blocks_until_epoch = tempo - blocks_since_last_step
-        logger.info("Blocks until next epoch, %s...", blocks_until_epoch)
-        return blocks_until_epoch
+    # The burn logic that only depends on the burn context, the prepared
+    # weights and the results read from the chain is kept in static methods
+    # taking the logger to use, so the burn engine runs the same logic on
+    # its async connections.
 
-    def get_next_perfect_weight_setting_opportunity(self, subtensor):
-        tempo, blocks_since_last_step = self._get_tempo_data(subtensor)
-        remaining_blocks_until_epoch = tempo - blocks_since_last_step
+    @staticmethod
+    def get_blocks_until_next_epoch(context, log=logger):
+        blocks_until_epoch = context.tempo - context.blocks_since_last_step
+        log.info("Blocks until next epoch, %s...", blocks_until_epoch)
+        return blocks_until_epoch
 
-        blocks_to_wait = remaining_blocks_until_epoch - DELTA
+    @staticmethod
+    def get_next_perfect_weight_setting_opportunity(tempo, blocks_since_last_step, log=logger):
+        # Returns the blocks until the next block at tempo - DELTA, after
+        # weights were set at blocks_since_last_step.
+        blocks_to_wait = tempo - DELTA - blocks_since_last_step
         if blocks_to_wait < 1:
-            # the moment has passed, it's too late to submit weights . Wait until the next one.
             blocks_to_wait += tempo
-        elif blocks_to_wait <= DELTA:
-            # oh, now is the time to act!
-            return 0
 
-        logger.info("The next perfect weight setting opportunity is in %s blocks...", blocks_to_wait)
+        log.info("The next perfect weight setting opportunity is in %s blocks...", blocks_to_wait)
         return blocks_to_wait
 
-    def ensure_registered_and_validator_permit(self, subtensor, wallet):
-        try:
-            this_uid = subtensor.neurons.uid(
-                hotkey_ss58=wallet.hotkey.ss58_address,
-                netuid=self.config.netuid
-            )
-        except ValueError:
-            logger.info("Not registered, wait until next epoch...")
+    @staticmethod
+    def get_scheduling_error(tempo, blocks_since_last_step):
+        # The blocks the weights are set after the tempo - DELTA block.
+        return blocks_since_last_step - (tempo - DELTA)
+
+    @staticmethod
+    def get_blocks_to_trigger(context):
+        # The blocks until the weight setting block of this tempo. Negative
+        # once it has passed.
+        return context.tempo - DELTA - context.blocks_since_last_step
+
+    @classmethod
+    def get_early_wake_wait(cls, context, trigger_block, log=logger):
+        # Waking up early for a scheduled weight setting block, e.g. when the
+        # block time is off, waits again rather than setting the weights
+        # early. Returns the wait, or None if the weights are set now.
+        blocks_to_trigger = cls.get_blocks_to_trigger(context)
+        if trigger_block is None or blocks_to_trigger <= PREPARE_BLOCKS:
             return None
 
+        log.info("The weight setting block is still %s blocks away...", blocks_to_trigger)
+        return blocks_to_trigger - PREPARE_BLOCKS, context.block, trigger_block
+
+    @staticmethod
+    def ensure_registered_and_validator_permit(context, log=logger):
+        this_uid = context.this_uid
         if this_uid is None:
-            logger.info("Not registered, wait until next epoch...")
+            log.info("Not registered, wait until next epoch...")
             return None
 
-        logger.info("Validator UID: %i", this_uid)
-
-        validator_permits = subtensor.query(
-            bt.storage.SubtensorModule.ValidatorPermit,
-            params=[self.config.netuid],
-        )
+        log.info("Validator UID: %i", this_uid)
 
         try:
-            permit_granted = validator_permits[this_uid]
+            permit_granted = context.validator_permits[this_uid]
         except (IndexError, KeyError, TypeError) as e:
-            logger.error("Error accessing validator permit for UID %i: %s", this_uid, e)
+            log.error("Error accessing validator permit for UID %i: %s", this_uid, e)
             return None
 
-        logger.info("Validator Permit: %s", permit_granted)
+        log.info("Validator Permit: %s", permit_granted)
 
         if permit_granted:
             return this_uid
 
-        logger.info("No Validator Permit, wait until next epoch...")
+        log.info("No Validator Permit, wait until next epoch...")
         return None
 
-    def get_weights_version_key(self, subtensor):
-        version_key = subtensor.query(
-            bt.storage.SubtensorModule.WeightsVersionKey,
-            params=[self.config.netuid],
-        )
-        logger.info("Weights Version Key: %s", version_key)
-        return version_key
-
-    def get_mechids(self, subtensor):
-        mech_count = subtensor.subnets.mechanism_count(self.config.netuid)
-        if mech_count == 1:
+    @classmethod
+    def get_mechids(cls, context):
+        if context.mech_count == 1:
             return [0]
 
-        mech_split = subtensor.subnets.mechanism_emission_split(self.config.netuid)
+        return cls.order_mechids(context.mech_count, context.mech_split)
+
+    @staticmethod
+    def order_mechids(mech_count, mech_split):
+        # Highest emission first. The emission is split evenly when no split
+        # is set.
+        if not mech_split:
+            return list(range(mech_count))
         return sorted(range(mech_count), key=lambda m: bt.settings.U16_MAX - mech_split[m])
 
     def fetch_neurons(self, subtensor):
@@ -225,45 +440,52 @@ class BurnValidator:
 
         return neurons
 
+    def get_neuron_table(self, subtensor, context):
+        # Most iterations don't need the neurons, which are the largest
+        # download, so they're only fetched for the epsilon uids or the owner
+        # coldkey fallback, and kept for the rest of this iteration.
+        if self.neuron_table is None:
+            neurons = self.fetch_neurons(subtensor)
+            if not neurons:
+                raise NeuronsUnavailableError()
+            self.neuron_table = NeuronTable.from_neurons(neurons, block=context.block)
+
+        return self.neuron_table
+
     # TODO: Clean this method up.
-    def get_burn_uid(self, subtensor, neurons):
-        owner_hotkey = subtensor.query(
-            bt.storage.SubtensorModule.SubnetOwnerHotkey,
-            params=[self.config.netuid],
-        )
+    def get_burn_uid(self, subtensor, context):
+        if context.owner_uid is not None:
+            logger.info("Owner UID: %i (cached)", context.owner_uid)
+            return context.owner_uid
+
+        owner_uid = self.resolve_owner_uid(subtensor, context)
+        if owner_uid is not None:
+            self.params_cache.update(owner_uid=owner_uid)
+        return owner_uid
+
+    def resolve_owner_uid(self, subtensor, context):
+        owner_hotkey = context.owner_hotkey
         logger.info("Owner Hotkey: %s", owner_hotkey)
-    
-        try:
-            owner_uid = subtensor.neurons.uid(
-                hotkey_ss58=owner_hotkey,
-                netuid=self.config.netuid
-            )
-        except ValueError:
+
+        owner_uid = query_storage_at(subtensor, context.block_hash, {
+            "owner_uid": ("SubtensorModule", "Uids", [self.config.netuid, owner_hotkey]),
+        })["owner_uid"]
+        if owner_uid is None:
             # TODO - Decide what to do here. Find the owner coldkey uid that registered the earliest?
 
             # logger.info("Owner hotkey not registered. Could not find owner uid.")
             # return None
 
             logger.info("Owner hotkey not registered, attempting fallback via owner coldkey lookup.")
-            owner_coldkey = subtensor.query(
-                bt.storage.SubtensorModule.SubnetOwner,
-                params=[self.config.netuid],
-            )
+            owner_coldkey = context.owner_coldkey
             logger.info("Owner Coldkey: %s", owner_coldkey)
 
-            owner_neurons = [
-                neuron for neuron in neurons if neuron.coldkey == owner_coldkey
-            ]
-            if not owner_neurons:
+            neuron_table = self.get_neuron_table(subtensor, context)
+            owner_uid = self.get_oldest_owner_uid(neuron_table, owner_coldkey)
+            if owner_uid is None:
                 logger.info("Owner coldkey not registered. Could not find owner uid.")
                 return None
 
-            oldest_owner_neuron = min(
-                owner_neurons,
-                key=lambda neuron: neuron.block_at_registration
-            )
-            owner_uid = oldest_owner_neuron.uid
-
         logger.info("Owner UID: %i", owner_uid)
         return owner_uid
 
@@ -372,118 +594,82 @@ class BurnValidator:
         # logger.info("Selected burn UID %s from owner coldkey %s", burn_uid, owner_coldkey)
         # return burn_uid
 
-    def determine_burn_uid(self, subtensor, neurons):
+    @staticmethod
+    def get_oldest_owner_uid(neuron_table, owner_coldkey):
+        return neuron_table.get_oldest_uid(neuron_table.get_coldkey_mask(owner_coldkey))
+
+    def determine_burn_uid(self, subtensor, context):
         if self.config.target_uid is not None:
             logger.info("Using manually specified target UID: %s", self.config.target_uid)
             return self.config.target_uid
 
-        burn_uid = self.get_burn_uid(subtensor, neurons)
+        burn_uid = self.get_burn_uid(subtensor, context)
         if burn_uid is None:
             logger.info("Could not auto-detected burn UID.")
         else:
             logger.info("Auto-detected burn UID: %s", burn_uid)
         return burn_uid
 
-    def get_min_allowed_weights(self, subtensor):
-        try:
-            value = subtensor.query(
-                bt.storage.SubtensorModule.MinAllowedWeights,
-                params=[self.config.netuid],
-            )
-        except Exception as e:
-            logger.error("Error fetching MinAllowedWeights: %s", e)
-            return 1
-
+    @staticmethod
+    def parse_min_allowed_weights(value):
         try:
             return max(int(value), 1)
         except (TypeError, ValueError):
             logger.warning("Unexpected MinAllowedWeights value: %s", value)
             return 1
 
-    def get_max_weight_limit(self, subtensor):
-        try:
-            value = subtensor.query(
-                bt.storage.SubtensorModule.MaxWeightsLimit,
-                params=[self.config.netuid],
-            )
-        except Exception as e:
-            logger.error("Error fetching MaxWeightsLimit: %s", e)
-            return bt.settings.U16_MAX
-
+    @staticmethod
+    def parse_max_weight_limit(value):
         try:
             return max(int(value), 1)
         except (TypeError, ValueError):
             logger.warning("Unexpected MaxWeightsLimit value: %s", value)
             return bt.settings.U16_MAX
 
-    def select_epsilon_uids(self, neurons, this_uid, burn_uid, min_allowed_weights):
+    @staticmethod
+    def select_epsilon_uids(neuron_table, this_uid, burn_uid, min_allowed_weights):
         epsilon_target = max(min_allowed_weights - 1, 0)
         if epsilon_target <= 0:
             return []
 
         epsilon_uids = []
-        excluded = {burn_uid}
+        excluded = [burn_uid]
 
         if this_uid is not None and this_uid != burn_uid:
             epsilon_uids.append(this_uid)
-            excluded.add(this_uid)
+            excluded.append(this_uid)
 
         remaining_required = epsilon_target - len(epsilon_uids)
         if remaining_required <= 0:
             return epsilon_uids
 
-        validator_candidates = [
-            neuron for neuron in neurons if neuron.validator_permit
-        ]
-
-        validator_candidates.sort(
-            key=lambda neuron: neuron.total_stake.amount,
-            reverse=True,
+        # The validators other than the burn uid, highest stake first.
+        ordered_candidate_uids = neuron_table.get_top_stake_uids(
+            neuron_table.validator_permit & (neuron_table.uid != burn_uid)
         )
-
-        ordered_candidate_uids = []
-        my_index = None
-        for candidate in validator_candidates:
-            candidate_uid = candidate.uid
-            if candidate_uid is None or candidate_uid == burn_uid:
-                continue
-            if candidate_uid not in ordered_candidate_uids:
-                ordered_candidate_uids.append(candidate_uid)
-            if candidate_uid == this_uid and my_index is None:
-                my_index = len(ordered_candidate_uids) - 1
-
-        if not ordered_candidate_uids:
+        if not ordered_candidate_uids.size:
             return epsilon_uids
 
-        candidate_count = len(ordered_candidate_uids)
-        start_index = ((my_index or 0) * remaining_required) % candidate_count
+        # Each validator starts at a different point of the candidates, by
+        # its own position in them, so the epsilon weights are spread out.
+        my_index = numpy.flatnonzero(ordered_candidate_uids == this_uid)
+        my_index = int(my_index[0]) if my_index.size else 0
+        start_index = (my_index * remaining_required) % ordered_candidate_uids.size
 
-        offset = 0
-        while len(epsilon_uids) < epsilon_target and offset < candidate_count * 2:
-            idx = (start_index + offset) % candidate_count
-            candidate_uid = ordered_candidate_uids[idx]
-            if candidate_uid not in excluded:
-                epsilon_uids.append(candidate_uid)
-                excluded.add(candidate_uid)
-            offset += 1
+        candidate_uids = numpy.roll(ordered_candidate_uids, -start_index)
+        candidate_uids = candidate_uids[~numpy.isin(candidate_uids, excluded)]
+        epsilon_uids.extend(candidate_uids[:remaining_required].tolist())
 
+        # Fill up with any other neurons in uid order.
         if len(epsilon_uids) < epsilon_target:
-            for neuron in neurons:
-                candidate_uid = neuron.uid
-                if (
-                    candidate_uid is None
-                    or candidate_uid in excluded
-                    or candidate_uid == burn_uid
-                ):
-                    continue
-                epsilon_uids.append(candidate_uid)
-                excluded.add(candidate_uid)
-                if len(epsilon_uids) >= epsilon_target:
-                    break
+            candidate_uids = neuron_table.uid[
+                ~numpy.isin(neuron_table.uid, excluded + epsilon_uids)
+            ]
+            epsilon_uids.extend(candidate_uids[:epsilon_target - len(epsilon_uids)].tolist())
 
         return epsilon_uids
 
-    def prepare_weight_payload(self, subtensor, neurons, burn_uid, this_uid):
+    def prepare_weight_payload(self, subtensor, context, burn_uid, this_uid):
         # Commenting this. It doesn't seem like it's needed.
         # subnet_n = subtensor.query(
         #     bt.storage.SubtensorModule.SubnetworkN,
@@ -491,17 +677,22 @@ class BurnValidator:
         # )
         # logger.info("Subnet N: %s", subnet_n)
 
-        min_allowed_weights = self.get_min_allowed_weights(subtensor)
-        logger.info("Min Allowed Weights: %s", min_allowed_weights)
+        # The neurons are only needed to select the epsilon uids.
+        neuron_table = None
+        if context.min_allowed_weights > 1:
+            neuron_table = self.get_neuron_table(subtensor, context)
+
+        return self.build_weight_payload(
+            neuron_table, this_uid, burn_uid, context.min_allowed_weights, context.max_weight_limit
+        )
 
+    @classmethod
+    def build_weight_payload(cls, neuron_table, this_uid, burn_uid, min_allowed_weights, max_weight_limit):
         if min_allowed_weights == 1:
             return {burn_uid: 1}
 
-        max_weight_limit = self.get_max_weight_limit(subtensor)
-        logger.info("Max Weight Limit: %s", max_weight_limit)
-
-        epsilon_uids = self.select_epsilon_uids(
-            neurons=neurons,
+        epsilon_uids = cls.select_epsilon_uids(
+            neuron_table=neuron_table,
             this_uid=this_uid,
             burn_uid=burn_uid,
             min_allowed_weights=min_allowed_weights,
@@ -514,38 +705,50 @@ class BurnValidator:
         weights.update({u: 1 for u in epsilon_uids})
         return weights
 
-    def submit_weights(self, subtensor, wallet, weights, mechids, version_key):
+    @staticmethod
+    def invalidate_params_cache(params_cache, error, log=logger):
+        # A cached parameter may have changed on chain, so it's read again on
+        # the next iteration.
+        if params_cache.invalidate_on_error(error):
+            log.warning("Subnet parameters cache invalidated by the weight setting error.")
+
+    @classmethod
+    def check_weights_result(cls, params_cache, mechid, result, log=logger):
+        # Logs the result of setting the weights on a mechanism, either the
+        # execute result or the ChainError it raised. Returns whether the
+        # weights were set.
+        if isinstance(result, bt.ChainError):
+            log.error(
+                "Error setting weights on mechanism %i: %s: %s",
+                mechid, type(result).__name__, result)
+            cls.invalidate_params_cache(params_cache, result, log)
+            return False
+
+        if not result.success:
+            log.error("Error setting weights on mechanism %i: %s", mechid, result.message)
+            cls.invalidate_params_cache(params_cache, result.message, log)
+            return False
+
+        log.info("Weights set on mechanism %i.", mechid)
+        return True
+
+    def submit_weights(self, subtensor, wallet, prepared_weights):
         any_success = False
 
-        for mechid in mechids:
+        for mechid, call in prepared_weights.calls.items():
             try:
-                result = subtensor.execute(
-                    bt.SetWeights(
-                        netuid=self.config.netuid,
-                        weights=weights,
-                        mechid=mechid,
-                        version_key=version_key
-                    ),
-                    wallet,
-                    retries=2
-                ).raise_for_failure()
-
+                result = subtensor.execute(call, wallet, retries=2).raise_for_failure()
             except bt.ChainError as exc:
-                logger.error(
-                    "Error setting weights on mechanism %i: %s: %s",
-                    mechid, type(exc).__name__, exc)
-
-            else:
-                if not result.success:
-                    logger.error("Error setting weights on mechanism %i: %s", mechid, result.message)
-                else:
-                    logger.info("Weights set on mechanism %i.", mechid)
+                result = exc
 
-                any_success |= result.success
+            any_success |= self.check_weights_result(self.params_cache, mechid, result)
 
         return any_success
 
-    def run_burn_code(self):
+    def run_burn_code(self, trigger_block):
+        # Returns the number of blocks to wait, the block they're counted
+        # from and the next weight setting block, if known.
+
         # Initialize wallet.
         # Must initialize it here rather than making it an object variable
         # when running in subprocess mode. Must run in subprocess mode to
@@ -557,62 +760,220 @@ class BurnValidator:
         with bt.Subtensor(network=self.config.subtensor_network) as subtensor:
             logger.info("Subtensor: %s", subtensor)
 
-            # Check if registered and has validator permit
-            this_uid = self.ensure_registered_and_validator_permit(subtensor, wallet)
-            if this_uid is None:
-                return self.get_blocks_until_next_epoch(subtensor)
+            # Get the subnet state for this iteration.
+            context = self.fetch_burn_context(subtensor, wallet)
 
-            # Get the weights version key.
-            version_key = self.get_weights_version_key(subtensor)
+            return self.burn(subtensor, wallet, context, trigger_block)
 
-            # Get the mechids.
-            mechids = self.get_mechids(subtensor)
+    def burn(self, subtensor, wallet, context, trigger_block):
+        # Prepares the weights, then sets them at the weight setting block
+        # if it's within PREPARE_BLOCKS. Returns the number of blocks to wait,
+        # the block they're counted from and the next weight setting block.
+        early_wake_wait = self.get_early_wake_wait(context, trigger_block)
+        if early_wake_wait is not None:
+            return early_wake_wait
 
-            # Get neurons
-            neurons = self.fetch_neurons(subtensor)
-            if not neurons:
-                logger.warning("Unable to retrieve neurons, retrying shortly...")
-                return 5  # Wait 5 blocks (1 minute) before trying again.
+        prepared_weights, wait_blocks = self.prepare_weights(subtensor, context)
+        if prepared_weights is None:
+            return wait_blocks, context.block, None
+
+        # Otherwise the weights are set right away, e.g. on the first run.
+        blocks_to_trigger = self.get_blocks_to_trigger(context)
+        if 0 < blocks_to_trigger <= PREPARE_BLOCKS:
+            self.wait_for_trigger_block(subtensor, context.block + blocks_to_trigger)
+
+        return self.commit_weights(subtensor, wallet, context, prepared_weights)
+
+    def prepare_weights(self, subtensor, context):
+        # Returns the prepared weights, or None and the number of blocks to
+        # wait if weights can't be set.
 
-            # Get the burn uid
-            burn_uid = self.determine_burn_uid(subtensor, neurons)
+        # Check if registered and has validator permit
+        this_uid = self.ensure_registered_and_validator_permit(context)
+        if this_uid is None:
+            return None, self.get_blocks_until_next_epoch(context)
+
+        # Get the mechids.
+        mechids = self.get_mechids(context)
+
+        # Get the burn uid and the weights to set. The neurons are fetched
+        # here if they're needed.
+        try:
+            burn_uid = self.determine_burn_uid(subtensor, context)
             if burn_uid is None:
-                return self.get_blocks_until_next_epoch(subtensor)
+                return None, self.get_blocks_until_next_epoch(context)
 
-            # Get the weights to set
-            weights = self.prepare_weight_payload(subtensor, neurons, burn_uid, this_uid)
+            weights = self.prepare_weight_payload(subtensor, context, burn_uid, this_uid)
+        except NeuronsUnavailableError:
+            logger.warning("Unable to retrieve neurons, retrying shortly...")
+            return None, 5  # Wait 5 blocks (1 minute) before trying again.
+
+        prepared_weights = PreparedWeights(
+            self.config.netuid, weights, mechids, context.version_key
+        )
+        return prepared_weights, None
+
+    def wait_for_trigger_block(self, subtensor, trigger_block):
+        # Waits on the block feed when it's on, otherwise polls the block
+        # number on the open subtensor connection, so setting the weights
+        # doesn't wait on a new connection.
+        logger.info("Waiting for weight setting block %s...", trigger_block)
+        if self.wait_for_feed_block(trigger_block):
+            return
 
-            # Set weights
-            if self.submit_weights(subtensor, wallet, weights, mechids, version_key):
-                pause = BLOCK_TIME * DELTA
-                logger.info("sleeping %i seconds after setting weights", pause)
-                time.sleep(pause)
-            else:
-                return self.get_blocks_until_next_epoch(subtensor)
+        while True:
+            block = query_storage_at(subtensor, subtensor.substrate.get_chain_head(), {
+                "block": ("System", "Number", []),
+            })["block"]
+            if block >= trigger_block:
+                return
+
+            time.sleep(BLOCK_TIME if trigger_block - block > 1 else TRIGGER_POLL_INTERVAL)
+
+    @staticmethod
+    def get_commit_queries(netuid):
+        # Only the weights version key is checked again before setting the
+        # prepared weights, in the same request as the tempo position.
+        return {
+            "block": ("System", "Number", []),
+            "blocks_since_last_step": ("SubtensorModule", "BlocksSinceLastStep", [netuid]),
+            "version_key": ("SubtensorModule", "WeightsVersionKey", [netuid]),
+        }
+
+    @classmethod
+    def check_commit_values(cls, params_cache, context, prepared_weights, values, log=logger):
+        # Returns the prepared weights to set with the commit query values.
+        if values["version_key"] != prepared_weights.version_key:
+            log.info(
+                "Weights Version Key changed from %s to %s.",
+                prepared_weights.version_key, values["version_key"]
+            )
+            prepared_weights = replace(prepared_weights, version_key=values["version_key"])
+            params_cache.update(version_key=values["version_key"])
 
-            return self.get_next_perfect_weight_setting_opportunity(subtensor)
+        log.info(
+            "Scheduling error: %+i blocks from the perfect weight setting block.",
+            cls.get_scheduling_error(context.tempo, values["blocks_since_last_step"])
+        )
+        return prepared_weights
+
+    @classmethod
+    def get_commit_wait(cls, context, values, submitted, log=logger):
+        # Returns the number of blocks to wait after the commit, the block
+        # they're counted from and the next weight setting block.
+        if not submitted:
+            return cls.get_blocks_until_next_epoch(context, log), context.block, None
+
+        # The next opportunity is counted from the block the weights were set
+        # at, so they aren't set twice in the same opportunity. The weights
+        # are prepared PREPARE_BLOCKS before it.
+        wait_blocks = cls.get_next_perfect_weight_setting_opportunity(
+            context.tempo, values["blocks_since_last_step"], log
+        )
+        trigger_block = values["block"] + wait_blocks
+        return max(wait_blocks - PREPARE_BLOCKS, 0), values["block"], trigger_block
 
-    def run_in_subprocess(self):
-        wait_blocks = self.run_burn_code()
-        mp_queue.put(wait_blocks)
+    def commit_weights(self, subtensor, wallet, context, prepared_weights):
+        block_hash = subtensor.substrate.get_chain_head()
+        values = query_storage_at(
+            subtensor, block_hash, self.get_commit_queries(self.config.netuid)
+        )
+        prepared_weights = self.check_commit_values(
+            self.params_cache, context, prepared_weights, values
+        )
+
+        # Set weights
+        submitted = self.submit_weights(subtensor, wallet, prepared_weights)
+        return self.get_commit_wait(context, values, submitted)
+
+    def wait_for_feed_block(self, trigger_block):
+        # Waits for the block feed's latest block, published by the main
+        # process, to reach the trigger block. Returns False without the
+        # block feed, or if it didn't get there in time, e.g. it stalled.
+        feed_block = mp_feed_block.value
+        if not feed_block:
+            return False
+
+        timeout = max(trigger_block - feed_block, 0) * BLOCK_TIME + BLOCK_FEED_WAIT_MARGIN
+        deadline = time.time() + timeout
+        while mp_feed_block.value < trigger_block:
+            if time.time() >= deadline:
+                logger.warning(
+                    "Block feed did not reach block %s in %i seconds. Polling the block number.",
+                    trigger_block, timeout
+                )
+                return False
+            time.sleep(FEED_BLOCK_POLL_INTERVAL)
+
+        return True
+
+    @staticmethod
+    def publish_feed_block(block):
+        # Called from the block feed thread with each new block.
+        mp_feed_block.value = block.number
+
+    def get_block_feed(self):
+        if not self.config.block_feed:
+            return None
+
+        # The block feed subscribes on the local subtensors.
+        if self.config.local_subtensor is False:
+            logger.warning("The block feed requires --local-subtensor. Not using the block feed.")
+            return None
+
+        network_names = (
+            [self.config.local_subtensor] if self.config.local_subtensor else LOCAL_SUBTENSORS
+        )
+        block_feed = get_block_feed(network_names)
+        if block_feed is None:
+            logger.warning("Could not import the websockets python module. Not using the block feed.")
+        return block_feed
+
+    def wait_for_blocks(self, block_feed, wait_blocks, from_block):
+        # Waits until the chain reaches the target block on the block feed,
+        # falling back to the block time without it.
+        block = block_feed.get_block() if block_feed else None
+        if block is None:
+            time.sleep(wait_blocks * BLOCK_TIME + 0.1)
+            return
+
+        # The target is counted from the block the wait was computed at, so
+        # the time taken by the iteration isn't waited on top of it.
+        target_block = from_block + wait_blocks
+        remaining_blocks = max(target_block - block.number, 0)
+        logger.info("Waiting for block %s, %s blocks from now...", target_block, remaining_blocks)
+        timeout = remaining_blocks * block_feed.get_block_time(BLOCK_TIME) + BLOCK_FEED_WAIT_MARGIN
+        if block_feed.wait_for_block(target_block, timeout) is None:
+            logger.warning(
+                "Block feed did not reach block %s in %i seconds. Not waiting any longer.",
+                target_block, timeout
+            )
+
+    def run_in_subprocess(self, trigger_block):
+        mp_queue.put(self.run_burn_code(trigger_block))
 
     def run(self):
         logger.info("Running validator for subnet %s...", self.config.netuid)
 
+        block_feed = self.get_block_feed()
+        if block_feed:
+            block_feed.add_listener(self.publish_feed_block)
+        trigger_block = None
+
         while True:
             logger.info("Running validator loop...")
             self.rotate_local_subtensor()
 
-            args = []
+            args = [trigger_block]
             with multiprocessing.Pool(processes=1) as pool:
                 pool.apply(self.run_in_subprocess, args)
 
             # Wait for next time to set weights.
-            wait_blocks = mp_queue.get()
+            wait_blocks, from_block, trigger_block = mp_queue.get()
             logger.info(
-                "Waiting %s blocks before next weight set...", wait_blocks
+                "Waiting %s blocks from block %s before next weight set...", wait_blocks, from_block
             )
-            time.sleep(wait_blocks * BLOCK_TIME + 0.1)
+            self.wait_for_blocks(block_feed, wait_blocks, from_block)
 
 
 if __name__ == "__main__":
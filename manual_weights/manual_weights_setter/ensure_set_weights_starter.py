@@ -1,12 +1,12 @@
 # standard imports
 import argparse
-import json
 import os
 import shlex
 import subprocess
 import tempfile
 
 # local imports
+from restarter.pm2_inventory import get_pm2_inventory
 from .common import parse_ensure_set_weights_args
 
 
@@ -44,26 +44,18 @@ class EnsureSetWeightsStarter:
         """ Find the existing ensure_set_weights pm2 process. If an
         existing process exists then get the existing args for it."""
 
-        # Loop through each pm2 process to find and existing ensure_set_weights process. 
-        process = subprocess.run(["pm2", "jlist"], stdout=subprocess.PIPE)
-        pm2_output = json.loads(process.stdout)
-        for pm2_process in pm2_output:
-            pm2_env = pm2_process["pm2_env"]
-
-            script_path = pm2_env["pm_exec_path"]
-            script_name = os.path.basename(script_path)
-            if script_name != SCRIPT_NAME:
-                continue
+        # Look up the existing ensure_set_weights process by its script name.
+        existing_processes = get_pm2_inventory().find_by_script_name(SCRIPT_NAME)
+        if not existing_processes:
+            return
 
-            # The existing process was found. Get the current process args
-            # and name so it can be safely deleted before restarting, then
-            # break out of the loop.
-            self._existing_process = pm2_process["name"]
-            if "args" in pm2_env:
-                script_args = pm2_env["args"]
-                self._process_args = \
-                    parse_ensure_set_weights_args(script_args)
-            break
+        # The existing process was found. Get the current process args
+        # and name so it can be safely deleted before restarting.
+        pm2_process = existing_processes[0]
+        self._existing_process = pm2_process.name
+        if pm2_process.args:
+            self._process_args = \
+                parse_ensure_set_weights_args(pm2_process.args)
 
     def _update_process_args(self):
         """ Add and remove netuids to the existing process args based on the
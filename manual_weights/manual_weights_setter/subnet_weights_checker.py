@@ -1,8 +1,6 @@
 # standard imports
 import asyncio
-import json
 import random
-import subprocess
 import time
 
 # bittensor imports
@@ -10,6 +8,8 @@ import bittensor
 from bittensor.wallet import Wallet
 
 # Local imports
+from restarter.neuron_table import NeuronTable
+from restarter.notifier import get_notification_dispatcher
 from .common import logger
 
 
@@ -156,14 +156,14 @@ class SubnetWeightsChecker:
             self._log_info("")
             self._log_info("Checking subnet %i", netuid)
 
-            metagraph = metagraphs[ni]
+            neuron_table = NeuronTable.from_metagraph(metagraphs[ni])
             rizzo_hotkey = self._wallets[netuid].hotkey.ss58_address
-            rizzo_uid = self._get_rizzo_uid(metagraph, rizzo_hotkey)
+            rizzo_uid = self._get_rizzo_uid(netuid, neuron_table, rizzo_hotkey)
             if rizzo_uid is None:
                 self._log_warning("Rizzo validator is not running on subnet %i.", netuid)
                 continue
 
-            rizzo_updated = metagraph.block - metagraph.neurons[rizzo_uid].last_update
+            rizzo_updated = int(neuron_table.block - neuron_table.last_update[rizzo_uid])
             self._log_info("Rizzo Updated is %i blocks.", rizzo_updated)
 
             # If the rizzo updated value is greater than the weights threshold
@@ -178,19 +178,18 @@ class SubnetWeightsChecker:
                 self._log_info("Updated value %i < %i", rizzo_updated, self._updated_threshold)
                 self._log_info("Not setting weights on subnet %i.", netuid)
 
-    def _get_rizzo_uid(self, metagraph, rizzo_hotkey):
-        try:
-            uid = metagraph.hotkeys.index(rizzo_hotkey)
-        except ValueError:
+    def _get_rizzo_uid(self, netuid, neuron_table, rizzo_hotkey):
+        uid = neuron_table.get_hotkey_uid(rizzo_hotkey)
+        if uid is None:
             self._log_warning(
-                "Rizzo hotkey %s is not found on subnet %i.", rizzo_hotkey, metagraph.netuid
+                "Rizzo hotkey %s is not found on subnet %i.", rizzo_hotkey, netuid
             )
             return None
 
-        if not metagraph.neurons[uid].validator_permit:
+        if not neuron_table.validator_permit[uid]:
             self._log_warning(
                 "Rizzo hotkey %s does not have a validator permit on subnet %i.",
-                rizzo_hotkey, metagraph.netuid
+                rizzo_hotkey, netuid
             )
             return None
 
@@ -299,17 +298,10 @@ class SubnetWeightsChecker:
             return
 
         text = f"{self._script_name}: " + message
-        payload = json.dumps({"content": text})
-        monitor_cmd = [
-            "curl", "-H", "Content-Type: application/json",
-            "-d", payload, self._discord_monitor_url
-        ]
-        monitor_cmd_str = " ".join(monitor_cmd)
-        self._log_info("Running command: '%s'", monitor_cmd_str)
-        try:
-            subprocess.run(monitor_cmd, check=True)
-        except subprocess.CalledProcessError as exc:
-            self._log_error("Failed to send discord monitor notification.")
-            self._log_error("'%s' command failed with error %s", monitor_cmd_str, exc)
-        else:
-            self._log_info("Discord monitor notification successfully sent.")
+        # Sent from the notification dispatcher's thread so setting weights
+        # doesn't wait on discord.
+        self._log_info("Queuing discord monitor notification: %s", text)
+        get_notification_dispatcher().send(
+            self._discord_monitor_url, text,
+            log_info=self._log_info, log_error=self._log_error
+        )
@@ -1,5 +1,7 @@
 # Standard imports
 import argparse
+import json
+import os
 
 # Local imports
 from .constants import (
@@ -8,11 +10,17 @@ from .constants import (
     DEFAULT_MEM_THRESHOLD,
     DEFAULT_STOPPED_LOGS_THRESHOLD,
     DEFAULT_LOG_ERRORS_RESTART_WAIT_TIME,
+    DEFAULT_RESTART_TIMEOUT,
+    DEFAULT_SUBTENSOR_WORKER_MAX_RSS,
+    DEFAULT_SUBTENSOR_WORKER_MAX_REQUESTS,
+    HOST_CONFIG_FILE,
+    SUBTENSOR_DAEMON_INTERVAL,
+    SUBTENSOR_DAEMON_SOCKET,
     )
 
 
-def parse_args():
-    parser = argparse.ArgumentParser()
+def _get_parser(exit_on_error=True):
+    parser = argparse.ArgumentParser(exit_on_error=exit_on_error)
 
     parser.add_argument(
         "-n",
@@ -30,6 +38,14 @@ def parse_args():
         "--restart-venv",
         help="The restart venv path.")
 
+    parser.add_argument(
+        "--restart-timeout",
+        type=float,
+        default=DEFAULT_RESTART_TIMEOUT,
+        help="The number of minutes after which the restart script is killed and the "
+             "restart is reported as failed. 0 means no timeout. "
+             f"Default: {DEFAULT_RESTART_TIMEOUT}")
+
     parser.add_argument(
         "--pm2-process", # Keeping arg name singular to avoid confusion.
         nargs="+",
@@ -58,10 +74,52 @@ def parse_args():
     parser.add_argument(
         "--use-pickle-file",
         action="store_true",
-        help="By default, a multiprocessing queue is used to communicate the metagraph data "
-             "between the subprocess and the main process for the Updated and vTrust checkers. "
-             "When this arg is specified, a pickle file is used instead. This gets around an "
-             "issue that some VMs have where writing to the multiprocessing queue just hangs.")
+        help="By default, the Updated and vTrust checkers get the metagraph data from the "
+             "subtensor worker subprocess over its pipe. When this arg is specified, the "
+             "worker writes it to a pickle file instead. This was added to get around an "
+             "issue that some VMs have where writing to a multiprocessing queue just hangs.")
+
+    parser.add_argument(
+        "--subtensor-daemon-socket",
+        default=SUBTENSOR_DAEMON_SOCKET,
+        help="The unix socket of the subtensor snapshot daemon. When the daemon is "
+             "running, the Updated and vTrust checkers read the subtensor data from it "
+             "and only fetch the subtensor data directly if the daemon is unavailable. "
+             "Pass an empty string to always fetch directly. "
+             f"Default: {SUBTENSOR_DAEMON_SOCKET}")
+
+    parser.add_argument(
+        "--storage-only-fetch",
+        action="store_true",
+        help="When specified, the Updated and vTrust checkers don't download the "
+             "metagraph. The rizzo uid is resolved once and cached, and each check only "
+             "reads the LastUpdate and ValidatorTrust storage. Requires bittensor >= 11.")
+
+    parser.add_argument(
+        "--subtensor-worker-max-rss",
+        type=int,
+        default=DEFAULT_SUBTENSOR_WORKER_MAX_RSS,
+        help="The subtensor data is fetched in a long-lived worker subprocess. "
+             "The worker is recycled when its memory usage in MB reaches this value. "
+             "0 means no limit. "
+             f"Default: {DEFAULT_SUBTENSOR_WORKER_MAX_RSS}")
+
+    parser.add_argument(
+        "--subtensor-worker-max-requests",
+        type=int,
+        default=DEFAULT_SUBTENSOR_WORKER_MAX_REQUESTS,
+        help="The subtensor worker subprocess is recycled after this many requests. "
+             "0 means no limit. "
+             f"Default: {DEFAULT_SUBTENSOR_WORKER_MAX_REQUESTS}")
+
+    parser.add_argument(
+        "--block-feed",
+        action="store_true",
+        help="When specified, the Updated checker follows the chain head through a "
+             "single new heads subscription on the local subtensors and schedules its "
+             "next check from the latest block and the measured block time, rather than "
+             "from the block the subtensor data was fetched at, e.g. an older daemon "
+             "snapshot, and 12 second blocks. Requires the websockets python module.")
 
     parser.add_argument(
         "--updated-threshold",
@@ -125,6 +183,14 @@ def parse_args():
              "latest tag is checked out. When not specified, this will check for the "
              "latest commit.")
 
+    parser.add_argument(
+        "--code-check-ls-remote",
+        action="store_true",
+        help="When specified, the latest commit check uses git ls-remote to find the "
+             "upstream branch commit and only pulls when it has changed since the last "
+             "check. When not specified, the repo is pulled on every check. This has no "
+             "effect with --code-check-tags.")
+
     parser.add_argument(
         "--do-vtrust-check",
         action="store_true",
@@ -193,4 +259,211 @@ def parse_args():
              "rather than opt-out. WARNING: This check currentl requires that the "
              "restarter be run from the base git repo folder.")
 
+    parser.add_argument(
+        "--async-runtime",
+        action="store_true",
+        help="When specified, all checkers run on a single asyncio event loop "
+             "using async subprocesses and the async subtensor instead of threads. "
+             "Not supported in the multi-subnet host restarter.")
+
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="When specified, the log output checker and restart metrics are served in the "
+             "Prometheus text format on this port on localhost. Default: None")
+
+    parser.add_argument(
+        "--metrics-socket",
+        help="When specified, the log output checker and restart metrics are served in the "
+             "Prometheus text format on this unix socket path. Default: None")
+
+    return parser
+
+
+def parse_args():
+    return _get_parser().parse_args()
+
+
+def parse_host_args():
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "--config",
+        default=HOST_CONFIG_FILE,
+        help="The host config json file listing the subnets to supervise. The file "
+             "contains a \"subnets\" list with one entry per subnet and an optional "
+             "\"defaults\" object applied to every subnet. Each entry uses the "
+             "restart_bad_validator option names, e.g. {\"netuid\": 1, "
+             "\"restart_script\": \"~/rsn1.sh\", \"pm2_processes\": [\"sn1\"], "
+             "\"updated_threshold\": 1000}. The restart script defaults to "
+             f"~/rsn<netuid>.sh. Default: {HOST_CONFIG_FILE}")
+
+    parser.add_argument(
+        "--skip-restarter-code-check",
+        action="store_false",
+        dest="do_check_restarter_code",
+        help="When specified, this will skip checking for restarter code updates.")
+
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="When specified, the log output checker and restart metrics are served in the "
+             "Prometheus text format on this port on localhost. Default: None")
+
+    parser.add_argument(
+        "--metrics-socket",
+        help="When specified, the log output checker and restart metrics are served in the "
+             "Prometheus text format on this unix socket path. Default: None")
+
+    options = parser.parse_args()
+
+    config_file = os.path.expanduser(options.config)
+    try:
+        with open(config_file, "r") as fp:
+            host_config = json.load(fp)
+    except (OSError, ValueError) as exc:
+        parser.error(f"Could not read host config file {config_file}: {exc}")
+
+    try:
+        options.netuid_options = _get_host_netuid_options(host_config)
+    except (KeyError, TypeError, ValueError) as exc:
+        parser.error(f"Bad host config file {config_file}: {exc}")
+
+    if not options.netuid_options:
+        parser.error(f"No subnets in host config file {config_file}")
+
+    return options
+
+
+def _get_host_netuid_options(host_config):
+    # Bad values raise argparse.ArgumentError rather than exiting.
+    netuid_parser = _get_parser(exit_on_error=False)
+    defaults = host_config.get("defaults", {})
+
+    netuid_options = []
+    netuids = set()
+    for subnet_config in host_config["subnets"]:
+        subnet_config = {**defaults, **subnet_config}
+        netuid = int(subnet_config.pop("netuid"))
+        if netuid in netuids:
+            raise ValueError(f"Subnet {netuid} is listed more than once.")
+        netuids.add(netuid)
+
+        restart_script = subnet_config.pop("restart_script", f"~/rsn{netuid}.sh")
+        args = ["-n", str(netuid), "--restart-script", restart_script]
+        for option, value in subnet_config.items():
+            args += _get_host_config_option_args(netuid_parser, netuid, option, value)
+
+        try:
+            options = netuid_parser.parse_args(args)
+        except argparse.ArgumentError as exc:
+            raise ValueError(f"Bad option for subnet {netuid}: {exc}")
+
+        netuid_options.append(options)
+
+    return netuid_options
+
+
+def _get_host_config_option_args(netuid_parser, netuid, option, value):
+    # Converts a host config option to the restarter's command line args, so
+    # the value gets the same typing and validation as on the command line.
+    actions = [action for action in netuid_parser._actions if action.dest == option]
+    if not actions or not actions[0].option_strings:
+        raise ValueError(f"Unknown option '{option}' for subnet {netuid}.")
+
+    if value is None:
+        return []
+
+    # Flags are set with true or false. Only the flag that changes the
+    # default is passed.
+    flag_actions = [action for action in actions if action.nargs == 0]
+    if flag_actions:
+        if not isinstance(value, bool):
+            raise ValueError(f"Option '{option}' for subnet {netuid} must be true or false.")
+        for action in flag_actions:
+            if action.const == value:
+                return [action.option_strings[0]]
+        return []
+
+    action = actions[0]
+    option_string = action.option_strings[0]
+    values = value if isinstance(value, list) else [value]
+    if isinstance(action, argparse._AppendAction):
+        return [arg for value in values for arg in (option_string, str(value))]
+    if action.nargs is None:
+        if isinstance(value, list):
+            raise ValueError(f"Option '{option}' for subnet {netuid} takes a single value.")
+        return [option_string, str(value)]
+    return [option_string, *[str(value) for value in values]]
+
+
+def parse_subtensor_daemon_args():
+    class NetuidMechidsAction(argparse.Action):
+        def __call__(self, parser, namespace, values, option_string=None):
+            value = {}
+            for token in values:
+                parts = token.split(":")
+                try:
+                    netuid = int(parts[0])
+                    mechids = [int(m) for m in parts[1:]]
+                except ValueError:
+                    raise argparse.ArgumentError(
+                        argument=self,
+                        message=f"Badly formed arg: {token}"
+                    )
+                if len(parts) > 2:
+                    raise argparse.ArgumentError(
+                        argument=self,
+                        message=f"Badly formed arg: {token}"
+                    )
+                # Mechanism 0 is always fetched since the vTrust checker uses it.
+                netuid_mechids = value.setdefault(netuid, [0])
+                for mechid in mechids:
+                    if mechid not in netuid_mechids:
+                        netuid_mechids.append(mechid)
+
+            setattr(namespace, self.dest, value)
+
+    parser = argparse.ArgumentParser()
+
+    parser.add_argument(
+        "-n",
+        nargs="+",
+        required=True,
+        action=NetuidMechidsAction,
+        dest="netuid_mechids",
+        help="The uids of the subnets to fetch. The arguments should be of the "
+             "form netuid or netuid:mechid when the Updated checker for that subnet "
+             "uses a mechid other than 0.")
+
+    parser.add_argument(
+        "--socket",
+        default=SUBTENSOR_DAEMON_SOCKET,
+        help="The unix socket on which to serve the subtensor data. "
+             f"Default: {SUBTENSOR_DAEMON_SOCKET}")
+
+    parser.add_argument(
+        "--interval",
+        type=float,
+        default=SUBTENSOR_DAEMON_INTERVAL,
+        help="The number of seconds between subtensor data fetches. "
+             f"Default: {SUBTENSOR_DAEMON_INTERVAL}")
+
+    parser.add_argument(
+        "--subtensor-worker-max-rss",
+        type=int,
+        default=DEFAULT_SUBTENSOR_WORKER_MAX_RSS,
+        help="The subtensor data is fetched in a long-lived worker subprocess. "
+             "The worker is recycled when its memory usage in MB reaches this value. "
+             "0 means no limit. "
+             f"Default: {DEFAULT_SUBTENSOR_WORKER_MAX_RSS}")
+
+    parser.add_argument(
+        "--subtensor-worker-max-requests",
+        type=int,
+        default=DEFAULT_SUBTENSOR_WORKER_MAX_REQUESTS,
+        help="The subtensor worker subprocess is recycled after this many requests. "
+             "0 means no limit. "
+             f"Default: {DEFAULT_SUBTENSOR_WORKER_MAX_REQUESTS}")
+
     return parser.parse_args()
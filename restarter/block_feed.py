@@ -0,0 +1,220 @@
+from __future__ import annotations
+
+# Standard imports
+import collections
+from dataclasses import dataclass
+import hashlib
+import json
+import random
+import threading
+import time
+
+# Local imports
+from .constants import (
+    BLOCK_FEED_BLOCK_TIME_WINDOW,
+    BLOCK_FEED_OPEN_TIMEOUT,
+    BLOCK_FEED_RECONNECT_INTERVAL,
+    BLOCK_FEED_STALL_TIMEOUT,
+    LOCAL_SUBTENSORS,
+)
+from .utils import logger
+
+_block_feeds = {}
+_block_feeds_lock = threading.Lock()
+
+
+def get_local_subtensor_network(network_name):
+    return f"ws://subtensor-{network_name}.rizzo.network:9944"
+
+
+def get_block_feed(network_names=LOCAL_SUBTENSORS):
+    # Returns the shared block feed for the local subtensors, starting it on
+    # first use, or None if the websockets python module isn't installed.
+    try:
+        from websockets.sync.client import connect
+    except ImportError:
+        return None
+
+    key = tuple(network_names)
+    with _block_feeds_lock:
+        block_feed = _block_feeds.get(key)
+        if block_feed is None:
+            block_feed = BlockFeed(connect, [get_local_subtensor_network(name) for name in key])
+            block_feed.start()
+            _block_feeds[key] = block_feed
+        return block_feed
+
+
+def _encode_compact(value):
+    # SCALE compact integer encoding.
+    if value < 1 << 6:
+        return (value << 2).to_bytes(1, "little")
+    if value < 1 << 14:
+        return ((value << 2) | 1).to_bytes(2, "little")
+    if value < 1 << 30:
+        return ((value << 2) | 2).to_bytes(4, "little")
+    value_bytes = value.to_bytes((value.bit_length() + 7) // 8, "little")
+    return bytes([((len(value_bytes) - 4) << 2) | 3]) + value_bytes
+
+
+def _get_header_hash(header):
+    # The block hash is the blake2b-256 hash of the SCALE encoded header. The
+    # digest logs are already SCALE encoded in the json header.
+    logs = header["digest"]["logs"]
+    encoded_header = b"".join([
+        bytes.fromhex(header["parentHash"][2:]),
+        _encode_compact(int(header["number"], 16)),
+        bytes.fromhex(header["stateRoot"][2:]),
+        bytes.fromhex(header["extrinsicsRoot"][2:]),
+        _encode_compact(len(logs)),
+        *(bytes.fromhex(log[2:]) for log in logs),
+    ])
+    return "0x" + hashlib.blake2b(encoded_header, digest_size=32).hexdigest()
+
+
+@dataclass(frozen=True)
+class BlockHeader:
+    number: int
+    hash: str
+    parent_hash: str
+    receive_time: float
+
+
+# Holds a single new heads subscription on a local subtensor and publishes
+# each new block to the rest of the process, so block dependent logic can
+# follow the chain clock instead of querying the block number or assuming
+# 12 second blocks.
+#
+# The latest block is kept in memory. Listeners are called from the feed
+# thread with each new BlockHeader, and wait_for_block() blocks until the
+# chain reaches a block number. The block hash is computed from the header,
+# so no request is made per block. The block time is measured from the
+# arrival of the recent blocks.
+#
+# The local subtensor is only rotated when the subscription fails, or when
+# no new head arrives within the stall timeout, e.g. the node stopped
+# syncing.
+class BlockFeed:
+    log_prefix = "BLOCK FEED"
+
+    def __init__(self, connect, networks):
+        self._connect = connect
+        self._networks = networks
+        self._listeners = []
+        self._block = None
+        self._block_condition = threading.Condition()
+
+        # (block number, receive time) of the recent blocks.
+        self._recent_blocks = collections.deque(maxlen=BLOCK_FEED_BLOCK_TIME_WINDOW)
+
+        # Randomize local subtensor.
+        random.seed()
+        self._network_index = random.randint(0, len(self._networks) - 1)
+
+    @classmethod
+    def log_info(cls, message):
+        logger.info(f"{cls.log_prefix}: {message}")
+
+    @classmethod
+    def log_warning(cls, message):
+        logger.warning(f"{cls.log_prefix}: {message}")
+
+    def add_listener(self, listener):
+        # The listener is called from the feed thread with each BlockHeader.
+        with self._block_condition:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._block_condition:
+            self._listeners.remove(listener)
+
+    def get_block(self):
+        # Returns the latest BlockHeader, or None if no block has been
+        # received yet.
+        with self._block_condition:
+            return self._block
+
+    def get_block_time(self, default=12):
+        # Returns the measured seconds per block, or the default until a few
+        # blocks have been received.
+        with self._block_condition:
+            if len(self._recent_blocks) < 2:
+                return default
+            first_number, first_time = self._recent_blocks[0]
+            last_number, last_time = self._recent_blocks[-1]
+            if last_number <= first_number:
+                return default
+            return (last_time - first_time) / (last_number - first_number)
+
+    def wait_for_block(self, block_number, timeout=None):
+        # Waits until the chain reaches the block number. Returns the latest
+        # BlockHeader, or None if the timeout passed first.
+        with self._block_condition:
+            if self._block_condition.wait_for(
+                lambda: self._block is not None and self._block.number >= block_number,
+                timeout,
+            ):
+                return self._block
+            return None
+
+    def start(self):
+        feed_thread = threading.Thread(target=self._run, daemon=True)
+        feed_thread.start()
+
+    def _run(self):
+        while True:
+            network = self._networks[self._network_index]
+            try:
+                self._follow_heads(network)
+            except Exception as exc:
+                self.log_warning(f"New heads subscription on '{network}' failed: {type(exc).__name__}: {exc}")
+
+            self._network_index = (self._network_index + 1) % len(self._networks)
+            self.log_info(
+                f"Resubscribing on '{self._networks[self._network_index]}' in "
+                f"{BLOCK_FEED_RECONNECT_INTERVAL} seconds."
+            )
+            time.sleep(BLOCK_FEED_RECONNECT_INTERVAL)
+
+    def _follow_heads(self, network):
+        with self._connect(network, open_timeout=BLOCK_FEED_OPEN_TIMEOUT) as websocket:
+            websocket.send(json.dumps({
+                "jsonrpc": "2.0",
+                "id": 1,
+                "method": "chain_subscribeNewHeads",
+                "params": [],
+            }))
+            self.log_info(f"Subscribed to new heads on '{network}'.")
+
+            while True:
+                try:
+                    message = json.loads(websocket.recv(timeout=BLOCK_FEED_STALL_TIMEOUT))
+                except TimeoutError:
+                    raise TimeoutError(f"No new head in {BLOCK_FEED_STALL_TIMEOUT} seconds.")
+
+                if "error" in message:
+                    raise ValueError(f"Subscription error: {message['error']}")
+
+                if message.get("method") == "chain_newHead":
+                    self._publish_header(message["params"]["result"])
+
+    def _publish_header(self, header):
+        block = BlockHeader(
+            number=int(header["number"], 16),
+            hash=_get_header_hash(header),
+            parent_hash=header["parentHash"],
+            receive_time=time.time(),
+        )
+
+        with self._block_condition:
+            # Restart the measurement when the blocks aren't consecutive,
+            # e.g. after resubscribing, so the gap isn't counted.
+            if self._block and block.number != self._block.number + 1:
+                self._recent_blocks.clear()
+            self._recent_blocks.append((block.number, block.receive_time))
+            self._block = block
+            self._block_condition.notify_all()
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            listener(block)
@@ -0,0 +1,873 @@
+# Standard imports
+import asyncio
+import json
+import os
+import pickle
+import random
+import shlex
+import subprocess
+import time
+
+# Local imports
+from .checker_base import ValidatorChecker
+from .checker_git_repo import (
+    GitUpdateError,
+    ValidatorCheckerGitUpdateCommits,
+    ValidatorCheckerGitUpdateTags,
+)
+from .checker_log_output import (
+    ValidatorCheckerDockerLogOutput,
+    ValidatorCheckerPm2LogOutput,
+)
+from .checker_stopped_logs import (
+    ValidatorCheckerDockerStoppedLogs,
+    ValidatorCheckerPm2StoppedLogs,
+)
+from .checker_subtensor import (
+    SubtensorData,
+    ValidatorCheckerSubtensor,
+)
+from .checker_system import ValidatorCheckerSystemMemory
+from .constants import (
+    LOG_READ_CHUNK_SIZE,
+    LOG_TAILER_POLL_INTERVAL,
+    MULTI_UID_HOTKEYS,
+    RESTART_OUTPUT_DRAIN_TIMEOUT,
+    RIZZO_COLDKEY,
+    RIZZO_HOTKEYS,
+    SCHEDULER_START_JITTER,
+)
+from .docker_stream import get_docker_log_stream
+from .log_tailer import (
+    LogFileTailer,
+    LogLineBatcher,
+)
+from .metrics import LOG_PROCESS_LAUNCHES
+from .pm2_inventory import get_pm2_inventory
+from .utils import (
+    get_pm2_log_output_wait_timer,
+    get_restart_lock,
+    logger,
+)
+
+async def _get_netuid_data_from_bt_11_async(subtensor, netuid, mechids):
+    import bittensor
+
+    def _index(netuid, mechid):
+        return mechid * bittensor.settings.GLOBAL_MAX_SUBNET_COUNT + netuid
+
+    metagraph = await subtensor.subnets.metagraph(netuid=netuid)
+    validator_trust = await subtensor.query(
+        bittensor.storage.SubtensorModule.ValidatorTrust,
+        params=[netuid]
+    )
+    validator_trust = [(vt / bittensor.settings.U16_MAX) for vt in validator_trust]
+
+    netuid_data = {}
+    for mechid in mechids:
+        last_update = await subtensor.query(
+            bittensor.storage.SubtensorModule.LastUpdate,
+            params=[_index(netuid, mechid)]
+        )
+
+        netuid_data[mechid] = SubtensorData(
+            netuid=metagraph.netuid,
+            hotkeys=metagraph.hotkeys,
+            coldkeys=metagraph.coldkeys,
+            block=metagraph.block,
+            last_update=last_update,
+            validator_trust=validator_trust,
+        )
+
+    return netuid_data
+
+
+async def _get_netuid_data_from_bt_10_async(subtensor, netuid, mechids):
+    metagraph = await subtensor.metagraph(netuid)
+
+    netuid_data = {}
+    for mechid in mechids:
+        metagraph_info = await subtensor.get_metagraph_info(netuid, mechid=mechid)
+
+        netuid_data[mechid] = SubtensorData(
+            netuid=metagraph.netuid,
+            hotkeys=metagraph.hotkeys,
+            coldkeys=metagraph.coldkeys,
+            block=int(metagraph.block),
+            last_update=metagraph_info.last_update,
+            validator_trust=metagraph.Tv,
+        )
+
+    return netuid_data
+
+
+def _get_netuid_data_async_func():
+    import bittensor
+
+    if int(bittensor.__version__.split(".")[0]) >= 11:
+        return _get_netuid_data_from_bt_11_async
+    else:
+        return _get_netuid_data_from_bt_10_async
+
+
+async def _resolve_rizzo_uid_from_bt_11_async(subtensor, netuid, block):
+    # Async version of checker_subtensor._resolve_rizzo_uid_from_bt_11.
+    import bittensor
+
+    if netuid in MULTI_UID_HOTKEYS:
+        hotkeys = [RIZZO_HOTKEYS[netuid]]
+    else:
+        hotkeys = await subtensor.query(
+            bittensor.storage.SubtensorModule.OwnedHotkeys,
+            params=[RIZZO_COLDKEY],
+            block=block,
+        ) or []
+
+    rizzo_uid = None
+    rizzo_hotkey = None
+    for hotkey in hotkeys:
+        uid = await subtensor.query(
+            bittensor.storage.SubtensorModule.Uids,
+            params=[netuid, hotkey],
+            block=block,
+        )
+        if uid is not None and (rizzo_uid is None or uid < rizzo_uid):
+            rizzo_uid = uid
+            rizzo_hotkey = hotkey
+
+    return rizzo_uid, rizzo_hotkey
+
+
+async def _get_rizzo_data_from_bt_11_async(
+    log_prefix, subtensor, netuid, mechid, rizzo_uid, rizzo_hotkey
+):
+    # Async version of checker_subtensor._get_rizzo_data_from_bt_11, the
+    # storage-only fetch.
+    import bittensor
+
+    block = await subtensor.block
+
+    if rizzo_uid is not None:
+        uid_hotkey = await subtensor.query(
+            bittensor.storage.SubtensorModule.Keys,
+            params=[netuid, rizzo_uid],
+            block=block,
+        )
+        if uid_hotkey != rizzo_hotkey:
+            logger.info(
+                f"{log_prefix}: Hotkey for uid {rizzo_uid} changed. Resolving rizzo uid again."
+            )
+            rizzo_uid = None
+
+    if rizzo_uid is None:
+        rizzo_uid, rizzo_hotkey = await _resolve_rizzo_uid_from_bt_11_async(
+            subtensor, netuid, block
+        )
+        logger.info(f"{log_prefix}: Resolved rizzo uid: {rizzo_uid}")
+
+    subtensor_data = SubtensorData(
+        netuid=netuid,
+        hotkeys=[],
+        coldkeys=[],
+        block=block,
+        last_update=[],
+        validator_trust=[],
+        rizzo_uid=rizzo_uid,
+        rizzo_hotkey=rizzo_hotkey,
+    )
+    if rizzo_uid is None:
+        return subtensor_data
+
+    validator_trust = await subtensor.query(
+        bittensor.storage.SubtensorModule.ValidatorTrust,
+        params=[netuid],
+        block=block,
+    )
+    subtensor_data.validator_trust = [
+        (vt / bittensor.settings.U16_MAX) for vt in validator_trust
+    ]
+    subtensor_data.last_update = await subtensor.query(
+        bittensor.storage.SubtensorModule.LastUpdate,
+        params=[mechid * bittensor.settings.GLOBAL_MAX_SUBNET_COUNT + netuid],
+        block=block,
+    )
+
+    return subtensor_data
+
+
+async def get_subtensor_data_async(
+    log_prefix, subtensor, netuid, mechid, storage_only=False, rizzo_uid=None, rizzo_hotkey=None
+):
+    import bittensor
+
+    if storage_only and int(bittensor.__version__.split(".")[0]) < 11:
+        logger.warning(
+            f"{log_prefix}: Storage-only fetch requires bittensor >= 11. "
+            "Fetching the metagraph instead."
+        )
+        storage_only = False
+
+    if storage_only:
+        return await _get_rizzo_data_from_bt_11_async(
+            log_prefix, subtensor, netuid, mechid, rizzo_uid, rizzo_hotkey
+        )
+
+    get_netuid_data = _get_netuid_data_async_func()
+    return (await get_netuid_data(subtensor, netuid, [mechid]))[mechid]
+
+
+async def get_subtensor_data_from_daemon_async(socket_path, netuid, mechid, timeout=10):
+    # Async version of get_subtensor_data_from_daemon. Returns a
+    # (snapshot_time, subtensor_data) tuple from the subtensor snapshot daemon.
+    # Raises OSError if the daemon is unavailable.
+    request = json.dumps({"netuid": netuid, "mechid": mechid}) + "\n"
+
+    try:
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_unix_connection(socket_path), timeout
+        )
+        try:
+            writer.write(request.encode())
+            await writer.drain()
+            writer.write_eof()
+            response = await asyncio.wait_for(reader.read(), timeout)
+        finally:
+            writer.close()
+            await writer.wait_closed()
+    except asyncio.TimeoutError:
+        raise OSError("Timed out reading from subtensor daemon.")
+
+    try:
+        return pickle.loads(response)
+    except (pickle.UnpicklingError, EOFError) as exc:
+        raise OSError(f"Bad response from subtensor daemon: {exc}")
+
+
+# Async versions of the checkers. These are mixed into the regular checker
+# classes (see get_async_checker_class) so they share the checkers' setup and
+# restart decisions, but run their I/O with asyncio subprocesses and the async
+# subtensor so every checker can be multiplexed on a single event loop.
+class AsyncValidatorChecker(ValidatorChecker):
+    def run(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        raise NotImplementedError("Must be implemented in subclasses.")
+
+    async def _run_command(self, command, capture_output=True, merge_stderr=False, check=True):
+        # Returns the return code and the decoded stdout, if captured.
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=subprocess.PIPE if capture_output else None,
+            stderr=subprocess.STDOUT if merge_stderr else None,
+        )
+        stdout, _ = await process.communicate()
+
+        if check and process.returncode:
+            raise subprocess.CalledProcessError(process.returncode, command)
+
+        return process.returncode, (stdout.decode() if stdout is not None else None)
+
+    async def _async_restart_validator(
+        self, description, force_notify=False, git_update_notify=False
+    ):
+        # Same as _restart_validator. The checkers all run on the event loop
+        # thread so the restart lock is only ever checked, never waited on.
+        restart_lock = get_restart_lock(self._netuid)
+        if restart_lock.locked():
+            self.log_info(f"Subnet {self._netuid} is currently restarting. "
+                          f"Skipping retart for: {description}.")
+            return
+
+        with restart_lock:
+            pm2_log_output_wait_timer = get_pm2_log_output_wait_timer(self._netuid)
+            if pm2_log_output_wait_timer:
+                pm2_log_output_wait_timer.start_wait_timer()
+            await self._async_do_restart(description, force_notify, git_update_notify)
+
+    async def _async_do_restart(self, description, force_notify, git_update_notify):
+        restart_cmd = self._get_restart_command(description)
+        restart_cmd_str = " ".join(restart_cmd)
+        self.log_info(f"Running command: '{restart_cmd_str}'")
+
+        start_time = time.monotonic()
+        try:
+            returncode = await self._async_run_restart_command(restart_cmd)
+        except OSError as exc:
+            self.log_error(f"'{restart_cmd_str}' command failed with error: {exc}")
+            restart_result = "failed"
+        else:
+            restart_result = self._get_restart_result(restart_cmd_str, returncode)
+        self._record_restart_duration(restart_result, time.monotonic() - start_time)
+
+        if restart_result != "succeeded":
+            self._restart_failed(description, force_notify)
+            return False
+
+        self._restart_succeeded(description, force_notify, git_update_notify)
+        return True
+
+    async def _async_run_restart_command(self, restart_cmd):
+        # Same as _run_restart_command.
+        process = await asyncio.create_subprocess_exec(
+            *restart_cmd,
+            env=self._restart_env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+        output_task = asyncio.create_task(self._async_log_restart_output(process.stdout))
+
+        try:
+            returncode = await asyncio.wait_for(process.wait(), self._restart_timeout)
+        except asyncio.TimeoutError:
+            self._kill_restart_process(process.pid)
+            await process.wait()
+            returncode = None
+
+        try:
+            await asyncio.wait_for(output_task, RESTART_OUTPUT_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        return returncode
+
+    async def _async_log_restart_output(self, restart_output):
+        try:
+            async for output_line in restart_output:
+                self.log_info(f"[restart] {output_line.decode(errors='replace').rstrip()}")
+        except ValueError:
+            # The stream reader can't split lines longer than its buffer limit.
+            self.log_warning("Restart output line too long. Not logging the rest of the output.")
+
+
+class AsyncValidatorPeriodicChecker(AsyncValidatorChecker):
+    async def _run(self):
+        if not await self._async_start():
+            return
+
+        try:
+            while True:
+                sleep_interval = await self._async_check()
+                self.log_info(f"Sleeping for {sleep_interval} seconds.")
+                await asyncio.sleep(sleep_interval)
+        finally:
+            await self._async_stop()
+
+    async def _async_start(self):
+        return self._start()
+
+    async def _async_check(self):
+        raise NotImplementedError("Must be implemented in subclasses.")
+
+    async def _async_stop(self):
+        self._stop()
+
+
+class AsyncValidatorCheckerSystemMemory(AsyncValidatorPeriodicChecker):
+
+    async def _async_check(self):
+        memory_used = self._psutil.virtual_memory().percent
+        restart_description = self._check_memory_used(memory_used)
+        if restart_description:
+            await self._async_restart_validator(restart_description)
+
+        return 600  # 10 minutes
+
+
+class AsyncValidatorCheckerDockerStoppedLogs(AsyncValidatorPeriodicChecker):
+
+    async def _async_check(self):
+        # Reading the last log line time from the log stream doesn't block.
+        restart_description, sleep_interval = self._check_log_stream()
+        if restart_description:
+            await self._async_restart_validator(restart_description)
+
+        return sleep_interval
+
+
+class AsyncValidatorCheckerPm2StoppedLogs(AsyncValidatorPeriodicChecker):
+
+    async def _async_check(self):
+        if self._is_watching_log_files():
+            restart_description, sleep_interval = self._check_last_write_time()
+        else:
+            pm2_process = await asyncio.to_thread(get_pm2_inventory().get_process, self._pm2_process)
+            restart_description, sleep_interval = self._check_pm2_process(pm2_process)
+        if restart_description:
+            await self._async_restart_validator(restart_description)
+
+        return sleep_interval
+
+
+class AsyncValidatorCheckerGitUpdateBase(AsyncValidatorPeriodicChecker):
+
+    async def _async_check(self):
+        repo_commands = []
+        for code_repo_path in self._code_repo_paths:
+            git_command = self._get_git_command(code_repo_path)
+            if git_command:
+                repo_commands.append((code_repo_path, git_command))
+
+        results = await asyncio.gather(*[
+            self._async_try_check_code_repo(code_repo_path, git_command)
+            for code_repo_path, git_command in repo_commands
+        ])
+
+        if any(results):
+            await self._async_restart_validator(
+                "Pulled new code from git repo.",
+                force_notify=True,
+                git_update_notify=True
+            )
+
+        return 900  # 15 minutes
+
+    async def _async_try_check_code_repo(self, code_repo_path, git_command):
+        try:
+            return await self._async_check_code_repo(code_repo_path, git_command)
+        except GitUpdateError:
+            self._send_git_update_error()
+            return False
+
+    async def _git(self, git_cmd, capture_output=True, check=True):
+        try:
+            _, stdout = await self._run_command(shlex.split(git_cmd), capture_output=capture_output)
+        except subprocess.CalledProcessError as exc:
+            if not check:
+                return None
+            self.log_error(f"'{git_cmd}' command failed with error: {exc}")
+            raise GitUpdateError
+
+        return stdout.strip() if capture_output else None
+
+    async def _async_check_code_repo(self, code_repo_path, git_command):
+        raise NotImplementedError
+
+
+class AsyncValidatorCheckerGitUpdateCommits(AsyncValidatorCheckerGitUpdateBase):
+
+    async def _async_check_code_repo(self, code_repo_path, git_command):
+        remote_commit = None
+        if self._check_ls_remote:
+            remote_commit = await self._async_get_remote_commit(git_command)
+            if remote_commit:
+                last_remote_commit = (
+                    self._remote_commits.get(git_command)
+                    or await self._git(f"{git_command} rev-parse HEAD")
+                )
+                if not self._has_remote_changed(
+                    code_repo_path, git_command, remote_commit, last_remote_commit
+                ):
+                    return False
+
+        do_restart = await self._async_pull_code_repo(code_repo_path, git_command)
+        if remote_commit:
+            self._remote_commits[git_command] = remote_commit
+        return do_restart
+
+    async def _async_get_remote_commit(self, git_command):
+        branch = await self._git(f"{git_command} symbolic-ref -q --short HEAD", check=False)
+        remote = merge_ref = None
+        if branch:
+            remote = await self._git(f"{git_command} config branch.{branch}.remote", check=False)
+            merge_ref = await self._git(f"{git_command} config branch.{branch}.merge", check=False)
+
+        ls_remote_cmd = self._get_ls_remote_command(git_command, branch, remote, merge_ref)
+        if not ls_remote_cmd:
+            return None
+        return self._parse_ls_remote_output(await self._git(ls_remote_cmd))
+
+    async def _async_pull_code_repo(self, code_repo_path, git_command):
+        get_cmd = f"{git_command} rev-parse HEAD"
+        pull_cmd = f"{git_command} pull --autostash"
+
+        current_commit = await self._git(get_cmd)
+        await self._git(pull_cmd, capture_output=False)
+        new_commit = await self._git(get_cmd)
+
+        self.log_info("")
+        self.log_info(f"{code_repo_path}: Current commit: {current_commit}")
+        self.log_info(f"{code_repo_path}: New commit: {new_commit}")
+        if current_commit != new_commit:
+            self.log_info(f"{code_repo_path}: Commits changed.")
+            return True
+
+        self.log_info(f"{code_repo_path}: Commits are the same. Doing nothing.")
+        return False
+
+
+class AsyncValidatorCheckerGitUpdateTags(AsyncValidatorCheckerGitUpdateBase):
+
+    async def _async_check_code_repo(self, code_repo_path, git_command):
+        fetch_cmd = f"{git_command} fetch"
+        get_cmd = f"{git_command} describe --tags"
+        current_cmd = f"{git_command} rev-parse HEAD"
+        latest_cmd = f"{git_command} rev-list --tags --max-count=1"
+        pull_cmd = f"{git_command} checkout"
+        stash_check_cmd = f"{git_command} status --porcelain --untracked-files=no"
+        stash_push_cmd = f"{git_command} stash push"
+        stash_pop_cmd = f"{git_command} stash pop"
+
+        await self._git(fetch_cmd, capture_output=False)
+        current_rev = await self._git(current_cmd)
+        current_tag = await self._git(f"{get_cmd} {current_rev}")
+        latest_rev = await self._git(latest_cmd)
+        latest_tag = await self._git(f"{get_cmd} {latest_rev}")
+
+        self.log_info("")
+        self.log_info(f"{code_repo_path}: Current tag: {current_tag}")
+        self.log_info(f"{code_repo_path}: Latest tag: {latest_tag}")
+        if latest_tag.endswith("-rc"):
+            self.log_info("Latest tag is not a release. Doing nothing.")
+            return False
+
+        if current_tag == latest_tag:
+            self.log_info("Tags are the same. Doing nothing.")
+            return False
+
+        self.log_info("Tags are different.")
+
+        # If there are local changes then we need to stash the changes
+        # before checking out latest tag and unstash them after.
+        do_stash = bool(await self._git(stash_check_cmd))
+        if do_stash:
+            await self._git(stash_push_cmd, capture_output=False)
+
+        await self._git(f"{pull_cmd} {latest_tag}", capture_output=False)
+
+        if do_stash:
+            await self._git(stash_pop_cmd, capture_output=False)
+
+        self.log_info("Pulled latest tag.")
+        return True
+
+
+class AsyncValidatorCheckerSubtensor(AsyncValidatorPeriodicChecker):
+
+    def _init_setup(self, options):
+        super()._init_setup(options)
+
+        # The async subtensor connection is kept open between checks and
+        # only reconnected on failure.
+        self._async_subtensor = None
+        self._async_subtensor_context = None
+        self._async_subtensor_network = None
+
+    async def _async_stop(self):
+        await self._close_async_subtensor()
+        self._stop()
+
+    async def _async_check(self):
+        subtensor_data = await self._async_fetch_subtensor_data()
+        restart_description, sleep_interval = self._check_subtensor_data(subtensor_data)
+        if restart_description:
+            await self._async_restart_validator(restart_description)
+
+        return sleep_interval
+
+    async def _async_fetch_subtensor_data(self):
+        subtensor_data = await self._async_get_subtensor_data_from_daemon()
+        if subtensor_data is not None:
+            return subtensor_data
+
+        subtensor_data = await self._async_get_subtensor_data()
+        if subtensor_data and self._storage_only_fetch:
+            self._rizzo_uid = subtensor_data.rizzo_uid
+            self._rizzo_hotkey = subtensor_data.rizzo_hotkey
+
+        return subtensor_data
+
+    async def _async_get_subtensor_data(self):
+        # Loop until we get a subtensor connection. The subtensor is only
+        # rotated on failure.
+        while True:
+            network_name = self._local_subtensors[self._local_subtensor_index]
+            network = f"ws://subtensor-{network_name}.rizzo.network:9944"
+
+            try:
+                subtensor = await self._get_async_subtensor(network)
+                return await get_subtensor_data_async(
+                    self.log_prefix, subtensor, self._netuid, self._mechid,
+                    **self._get_fetch_kwargs()
+                )
+            except (TypeError, ValueError):
+                raise
+            except Exception as err:
+                self.log_error("")
+                self.log_error(f"Subtensor connection failed on '{network}'")
+                self.log_error(f"{type(err).__name__}: {err}")
+                self.log_error("")
+                self.log_error("Rotating subtensors and trying again.")
+                await self._close_async_subtensor()
+                self._local_subtensor_index = \
+                    (self._local_subtensor_index + 1) % len(self._local_subtensors)
+                await asyncio.sleep(1)
+
+    async def _async_get_subtensor_data_from_daemon(self):
+        if not self._subtensor_daemon_socket:
+            return None
+
+        if not os.path.exists(self._subtensor_daemon_socket):
+            self.log_debug(
+                f"Subtensor daemon socket {self._subtensor_daemon_socket} does not exist."
+            )
+            return None
+
+        try:
+            snapshot_time, subtensor_data = await get_subtensor_data_from_daemon_async(
+                self._subtensor_daemon_socket, self._netuid, self._mechid
+            )
+        except OSError as exc:
+            self.log_warning(f"Subtensor daemon is unavailable: {exc}")
+            self.log_warning("Falling back to fetching the subtensor data directly.")
+            return None
+
+        return self._check_subtensor_daemon_data(snapshot_time, subtensor_data)
+
+    async def _get_async_subtensor(self, network):
+        import bittensor
+
+        if self._async_subtensor is not None and self._async_subtensor_network == network:
+            self.log_info(f"Reusing subtensor connection: {network}")
+            return self._async_subtensor
+
+        await self._close_async_subtensor()
+
+        self.log_info(f"Connecting to subtensor network: {network}")
+        subtensor_context = bittensor.AsyncSubtensor(network=network)
+        self._async_subtensor = await subtensor_context.__aenter__()
+        self._async_subtensor_context = subtensor_context
+        self._async_subtensor_network = network
+
+        return self._async_subtensor
+
+    async def _close_async_subtensor(self):
+        if self._async_subtensor_context is None:
+            return
+
+        subtensor_context = self._async_subtensor_context
+        self._async_subtensor = None
+        self._async_subtensor_context = None
+        self._async_subtensor_network = None
+        try:
+            await subtensor_context.__aexit__(None, None, None)
+        except Exception as exc:
+            self.log_warning(f"Error closing subtensor connection: {type(exc).__name__}: {exc}")
+
+
+class AsyncValidatorCheckerLogOutput(AsyncValidatorChecker):
+
+    async def _read_log_batches(self, command):
+        # Yields the command's output in blocks of complete lines until it exits.
+        command_str = " ".join(command)
+        self.log_info(f"Launching process: \"{command_str}\"")
+        LOG_PROCESS_LAUNCHES.inc(self._metric_labels)
+
+        process = await asyncio.create_subprocess_exec(
+            *command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        batcher = LogLineBatcher()
+        try:
+            while True:
+                chunk = await process.stdout.read(LOG_READ_CHUNK_SIZE)
+                if not chunk:
+                    # The process exited.
+                    self.log_info(f"Process exited: \"{command_str}\"")
+                    batch = batcher.flush()
+                    if batch:
+                        yield batch
+                    return
+
+                batch = batcher.add(chunk)
+                if batch:
+                    yield batch
+
+        finally:
+            self.log_info(f"Killing process: \"{command_str}\"")
+            if process.returncode is None:
+                process.kill()
+            await process.wait()
+
+
+class AsyncValidatorCheckerDockerLogOutput(AsyncValidatorCheckerLogOutput):
+
+    async def _run(self):
+        if not self._start_log_checks(f"container: {self._docker_container}"):
+            return
+
+        log_matcher = self._get_log_matcher()
+
+        log_stream = get_docker_log_stream(self._docker_container)
+        if log_stream is None:
+            self.log_warning(
+                "Could not import the docker python module. Falling back to \"docker logs\"."
+            )
+            await self._run_docker_logs(log_matcher)
+            return
+
+        # The log stream runs in its own thread and hands the batches over to
+        # the event loop.
+        loop = asyncio.get_running_loop()
+        log_batches = asyncio.Queue()
+        log_stream.add_listener(
+            lambda batch: loop.call_soon_threadsafe(log_batches.put_nowait, batch)
+        )
+        while True:
+            batch = await log_batches.get()
+            pattern = self._get_restart_pattern(batch, log_matcher)
+            if pattern:
+                await self._async_restart_validator(
+                    f"Docker log output matches a restart pattern: \"{pattern}\""
+                )
+
+                # Skip the log output from while the validator was restarting.
+                sleep_time = 60
+                self.log_info(f"Sleeping {sleep_time} seconds.")
+                await asyncio.sleep(sleep_time)
+                self._clear_log_batches(log_batches)
+
+    async def _run_docker_logs(self, log_matcher):
+        command = ["docker", "logs", self._docker_container, "--since", "15s", "--follow"]
+
+        while True:
+            log_batches = self._read_log_batches(command)
+            try:
+                async for batch in log_batches:
+                    pattern = self._get_restart_pattern(batch, log_matcher)
+                    if pattern:
+                        await self._async_restart_validator(
+                            f"Docker log output matches a restart pattern: \"{pattern}\""
+                        )
+                        break
+            finally:
+                await log_batches.aclose()
+
+            sleep_time = 60
+            self.log_info(f"Sleeping {sleep_time} seconds.")
+            await asyncio.sleep(sleep_time)
+
+    @staticmethod
+    def _clear_log_batches(log_batches):
+        while True:
+            try:
+                log_batches.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+
+
+class AsyncValidatorCheckerPm2LogOutput(AsyncValidatorCheckerLogOutput):
+
+    async def _run(self):
+        if not self._start_log_checks(f"process: {self._pm2_process}"):
+            return
+
+        self._create_pm2_log_output_wait_timer(self._netuid, self._restart_wait_time)
+
+        log_matcher = self._get_log_matcher()
+
+        log_files = await asyncio.to_thread(self._get_pm2_log_files)
+        if not log_files:
+            self.log_warning(
+                f"Could not find the log files for pm2 process {self._pm2_process}. "
+                "Falling back to \"pm2 log\"."
+            )
+            await self._run_pm2_log(log_matcher)
+            return
+
+        self.log_info(f"Following log files: {', '.join(log_files)}")
+        with LogFileTailer(log_files) as log_tailer:
+            self.log_info("Starting log patterns check.")
+            await self._follow_log_files(log_tailer, log_matcher)
+
+    async def _follow_log_files(self, log_tailer, log_matcher):
+        # Wake up on the tailer's inotify events, or on the poll interval.
+        loop = asyncio.get_running_loop()
+        log_files_changed = asyncio.Event()
+        inotify_fd = log_tailer.fileno()
+        if inotify_fd is not None:
+            loop.add_reader(inotify_fd, log_files_changed.set)
+
+        try:
+            while True:
+                for batch in log_tailer.read_batches():
+                    for pattern in self._check_log_batch(batch, log_matcher):
+                        await self._async_restart_validator(
+                            f"Pm2 log output matches a restart pattern: \"{pattern}\""
+                        )
+
+                try:
+                    await asyncio.wait_for(log_files_changed.wait(), LOG_TAILER_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                log_files_changed.clear()
+                log_tailer.drain_events()
+        finally:
+            if inotify_fd is not None:
+                loop.remove_reader(inotify_fd)
+
+    async def _run_pm2_log(self, log_matcher):
+        command = ["pm2", "log", self._pm2_process, "--raw"]
+
+        while True:
+            initial_log_lines = 0
+            log_batches = self._read_log_batches(command)
+            try:
+                async for batch in log_batches:
+                    # pm2 log outputs the last lines of the log files first.
+                    # Restart patterns aren't checked in those lines.
+                    initial_batch, batch, initial_log_lines = self._split_initial_log_lines(
+                        batch, initial_log_lines
+                    )
+                    for lines, check_errors in ((initial_batch, False), (batch, True)):
+                        for pattern in self._check_log_batch(lines, log_matcher, check_errors):
+                            await self._async_restart_validator(
+                                f"Pm2 log output matches a restart pattern: \"{pattern}\""
+                            )
+            finally:
+                await log_batches.aclose()
+
+            sleep_time = 15
+            self.log_info(f"Sleeping {sleep_time} seconds.")
+            await asyncio.sleep(sleep_time)
+
+
+# Maps each checker class to the async mixin that replaces its blocking I/O.
+_ASYNC_CHECKER_CLASSES = (
+    (ValidatorCheckerDockerLogOutput, AsyncValidatorCheckerDockerLogOutput),
+    (ValidatorCheckerPm2LogOutput, AsyncValidatorCheckerPm2LogOutput),
+    (ValidatorCheckerDockerStoppedLogs, AsyncValidatorCheckerDockerStoppedLogs),
+    (ValidatorCheckerPm2StoppedLogs, AsyncValidatorCheckerPm2StoppedLogs),
+    (ValidatorCheckerSubtensor, AsyncValidatorCheckerSubtensor),
+    (ValidatorCheckerSystemMemory, AsyncValidatorCheckerSystemMemory),
+    (ValidatorCheckerGitUpdateCommits, AsyncValidatorCheckerGitUpdateCommits),
+    (ValidatorCheckerGitUpdateTags, AsyncValidatorCheckerGitUpdateTags),
+)
+
+
+def get_async_checker_class(checker_class, options):
+    # Resolve the class the factory checker classes would create, then mix the
+    # matching async class into it so subnet specific subclasses (e.g. the log
+    # patterns) are kept.
+    concrete_class = type(checker_class.__new__(checker_class, options))
+
+    for sync_class, async_class in _ASYNC_CHECKER_CLASSES:
+        if issubclass(concrete_class, sync_class):
+            return type(f"Async{concrete_class.__name__}", (async_class, concrete_class), {})
+
+    raise ValueError(f"No async checker for {concrete_class.__name__}")
+
+
+async def run_async_checker(checker_obj, on_error, start_jitter=SCHEDULER_START_JITTER):
+    # Start at a random offset so the checkers don't all start at once.
+    await asyncio.sleep(random.uniform(0, start_jitter))
+
+    try:
+        await checker_obj._run()
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        checker_obj.log_error(f"Error: {exc}")
+        on_error(checker_obj)
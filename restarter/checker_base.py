@@ -1,14 +1,20 @@
 # Standard imports
 import os
+import signal
 import subprocess
-import tempfile
+import threading
+import time
 
 # Local imports
-from .constants import RED_QM
+from .constants import (
+    RED_QM,
+    RESTART_OUTPUT_DRAIN_TIMEOUT,
+)
+from .metrics import RESTART_DURATION_SECONDS
 from .utils import (
     get_pm2_log_output_wait_timer,
+    get_restart_lock,
     logger,
-    restart_lock,
     send_monitor_notification,
 )
 
@@ -51,76 +57,143 @@ class ValidatorChecker:
         self._restart_venv = (
             os.path.expanduser(options.restart_venv)
             if options.restart_venv else None)
-
-        self._restart_dir = os.path.expanduser(
-            f"~/restart_scripts_sn{options.netuid}")
-        os.makedirs(self._restart_dir, exist_ok=True)
-
-        for restart_file in os.listdir(self._restart_dir):
-            restart_file_path = os.path.join(self._restart_dir, restart_file)
-            if os.path.isfile(restart_file_path):
-                os.unlink(restart_file_path)
+        self._restart_timeout = options.restart_timeout * 60 or None
+        self._restart_env = self._get_restart_env()
+
+    def _get_restart_env(self):
+        # Returns the environment to run the restart script in. With a venv
+        # this is what "deactivate" then "source <venv>/bin/activate" would
+        # leave, so the script can be run directly without a wrapper script.
+        if not self._restart_venv:
+            return None
+
+        restart_env = dict(os.environ)
+        path_dirs = restart_env.get("PATH", "").split(os.pathsep)
+        current_venv = restart_env.pop("VIRTUAL_ENV", None)
+        if current_venv:
+            current_venv_bin = os.path.join(current_venv, "bin")
+            path_dirs = [path_dir for path_dir in path_dirs if path_dir != current_venv_bin]
+
+        restart_env["PATH"] = os.pathsep.join(
+            [os.path.join(self._restart_venv, "bin")] + [path_dir for path_dir in path_dirs if path_dir]
+        )
+        restart_env["VIRTUAL_ENV"] = self._restart_venv
+        restart_env.pop("PYTHONHOME", None)
+        return restart_env
 
     def _restart_validator(self, description, force_notify=False, git_update_notify=False):
-        # If the restart_lock is currently acquired then another thread is
+        # If the subnet's restart lock is currently acquired then another thread is
         # currently running a restart so just return.
-        # Otherwise aquire the restart_lock and run a restart.
+        # Otherwise aquire the restart lock and run a restart.
+        restart_lock = get_restart_lock(self._netuid)
         if restart_lock.locked():
             self.log_info(f"Subnet {self._netuid} is currently restarting. "
                           f"Skipping retart for: {description}.")
             return
 
         with restart_lock:
-            pm2_log_output_wait_timer = get_pm2_log_output_wait_timer()
+            pm2_log_output_wait_timer = get_pm2_log_output_wait_timer(self._netuid)
             if pm2_log_output_wait_timer:
                 pm2_log_output_wait_timer.start_wait_timer()
             self._do_restart(description, force_notify, git_update_notify)
 
     def _do_restart(self, description, force_notify, git_update_notify):
-        self.log_info(f"Restarting subnet {self._netuid}: {description}.")
-        self.log_info(f"Running script: {self._restart_script}")
+        restart_cmd = self._get_restart_command(description)
+        restart_cmd_str = " ".join(restart_cmd)
+        self.log_info(f"Running command: '{restart_cmd_str}'")
 
-        if self._restart_venv:
-            self.log_info(f"Running in venv: {self._restart_venv}")
+        start_time = time.monotonic()
+        try:
+            returncode = self._run_restart_command(restart_cmd)
+        except OSError as exc:
+            self.log_error(f"'{restart_cmd_str}' command failed with error: {exc}")
+            restart_result = "failed"
+        else:
+            restart_result = self._get_restart_result(restart_cmd_str, returncode)
+        self._record_restart_duration(restart_result, time.monotonic() - start_time)
 
-            fd, restart_script = tempfile.mkstemp(dir=self._restart_dir,
-                prefix = f"restart_{self._netuid}_", suffix=".sh")
-            os.close(fd)
-            os.chmod(restart_script, 0o700)
-
-            self.log_info(f"Packaging venv and script into {restart_script}")
-            with open(restart_script, "w") as fd:
-                venv_activate = os.path.join(self._restart_venv, "bin/activate")
-                fd.write("#!/bin/bash\n"
-                            "\n"
-                            "deactivate\n"
-                            f"source {venv_activate}\n"
-                            f"{self._restart_script}\n")
-            restart_cmd = [restart_script]
+        if restart_result != "succeeded":
+            self._restart_failed(description, force_notify)
+            return False
 
-        else:
-            restart_cmd = [self._restart_script]
-            restart_script = None
+        self._restart_succeeded(description, force_notify, git_update_notify)
+        return True
 
-        restart_cmd_str = " ".join(restart_cmd)
-        self.log_info(f"Running command: '{restart_cmd_str}'")
+    def _run_restart_command(self, restart_cmd):
+        # Runs the restart command, logging its output as it's written.
+        # Returns the return code, or None if the command timed out.
+        process = subprocess.Popen(
+            restart_cmd,
+            env=self._restart_env,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+        # The output is read in its own thread since a process left running
+        # in the background by the restart script can keep the pipe open
+        # after the script exits.
+        output_thread = threading.Thread(
+            target=self._log_restart_output, args=(process.stdout,), daemon=True
+        )
+        output_thread.start()
 
         try:
-            subprocess.run(restart_cmd, check=True)
+            returncode = process.wait(timeout=self._restart_timeout)
+        except subprocess.TimeoutExpired:
+            self._kill_restart_process(process.pid)
+            process.wait()
+            returncode = None
+
+        output_thread.join(RESTART_OUTPUT_DRAIN_TIMEOUT)
+        return returncode
+
+    def _log_restart_output(self, restart_output):
+        for output_line in restart_output:
+            self.log_info(f"[restart] {output_line.decode(errors='replace').rstrip()}")
+
+    def _kill_restart_process(self, pid):
+        # Kill the restart script's process group so nothing it started,
+        # e.g. a hung pm2 command, is left running.
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+    def _get_restart_result(self, restart_cmd_str, returncode):
+        if returncode is None:
+            self.log_error(
+                f"'{restart_cmd_str}' command timed out after {self._restart_timeout} seconds."
+            )
+            return "timeout"
 
-        except subprocess.CalledProcessError as exc:
+        if returncode:
+            exc = subprocess.CalledProcessError(returncode, restart_cmd_str)
             self.log_error(f"'{restart_cmd_str}' command failed with error: {exc}")
-            self._send_restart_monitor_notification(
-                f"{RED_QM} Possibly failed to restart subnet {self._netuid} - {description}",
-                force_notify,
-                False
-            )
-            return False
+            return "failed"
 
-        finally:
-            if restart_script:
-                os.unlink(restart_script)
+        return "succeeded"
+
+    def _record_restart_duration(self, restart_result, restart_duration):
+        self.log_info(f"Restart {restart_result} after {restart_duration:.1f} seconds.")
+        RESTART_DURATION_SECONDS.observe((self._netuid, restart_result), restart_duration)
 
+    def _get_restart_command(self, description):
+        self.log_info(f"Restarting subnet {self._netuid}: {description}.")
+        self.log_info(f"Running script: {self._restart_script}")
+        if self._restart_venv:
+            self.log_info(f"Running in venv: {self._restart_venv}")
+
+        return [self._restart_script]
+
+    def _restart_failed(self, description, force_notify):
+        self._send_restart_monitor_notification(
+            f"{RED_QM} Possibly failed to restart subnet {self._netuid} - {description}",
+            force_notify,
+            False
+        )
+
+    def _restart_succeeded(self, description, force_notify, git_update_notify):
         self.log_info(f"Subnet '{self._netuid}' successfully restarted.")
         self._send_restart_monitor_notification(
             f"Successfully restarted on subnet {self._netuid} - {description}",
@@ -128,11 +201,46 @@ class ValidatorChecker:
             git_update_notify
         )
 
-        return True
-
     def _send_restart_monitor_notification(self, message, force_notify, git_update_notify):
         if not force_notify and not self._discord_notify:
             self.log_info("Not sending discord monitor notification.")
             return
 
         send_monitor_notification(self.log_prefix, message, git_update_notify=git_update_notify)
+
+
+# Base class for the checkers that do their work periodically rather than
+# streaming log output. _start() does any one-time setup and returns False if
+# the checker can't run, and _check() runs a single check and returns the number
+# of seconds until the next one. This lets a scheduler drive all of the periodic
+# checkers instead of each checker sleeping in its own thread.
+class ValidatorPeriodicChecker(ValidatorChecker):
+    def start(self):
+        return self._start()
+
+    def check(self):
+        return self._check()
+
+    def stop(self):
+        self._stop()
+
+    def _start(self):
+        return True
+
+    def _check(self):
+        raise NotImplementedError("Must be implemented in subclasses.")
+
+    def _stop(self):
+        pass
+
+    def _run(self):
+        if not self._start():
+            return
+
+        try:
+            while True:
+                sleep_interval = self._check()
+                self.log_info(f"Sleeping for {sleep_interval} seconds.")
+                time.sleep(sleep_interval)
+        finally:
+            self._stop()
@@ -1,14 +1,17 @@
 # Standard imports
-import json
+from concurrent.futures import ThreadPoolExecutor
 import os
 import re
 import shlex
 import subprocess
-import time
 
 # Local imports
-from .checker_base import ValidatorChecker
-from .constants import RED_X
+from .checker_base import ValidatorPeriodicChecker
+from .constants import (
+    GIT_COMMAND_TIMEOUT,
+    RED_X,
+)
+from .pm2_inventory import get_pm2_inventory
 from .utils import send_monitor_notification
 
 
@@ -16,7 +19,7 @@ class GitUpdateError(Exception):
     pass
 
 
-class ValidatorCheckerGitUpdateBase(ValidatorChecker):
+class ValidatorCheckerGitUpdateBase(ValidatorPeriodicChecker):
     log_prefix = "CHECK CODE UPDATE"
 
     def _init_setup(self, options):
@@ -71,21 +74,20 @@ class ValidatorCheckerGitUpdateBase(ValidatorChecker):
 
         repo_paths = set()
 
-        process = subprocess.run(["pm2", "jlist"], stdout=subprocess.PIPE)
-        pm2_output = json.loads(process.stdout)
-
-        for pm2_process in pm2_output:
-            pm2_name = pm2_process["name"]
-            if pm2_name in options.pm2_processes:
-                pm2_cwd = pm2_process["pm2_env"]["pm_cwd"]
-                git_cmd = f"git -C {pm2_cwd} rev-parse --show-toplevel"
-                try:
-                    process = subprocess.run(shlex.split(git_cmd), check=True, stdout=subprocess.PIPE)
-                except subprocess.CalledProcessError:
-                    continue
-                repo_path = process.stdout.decode().strip()
-                self.log_info(f"Found repo path from '{pm2_name}' pm2 process: {repo_path}")
-                repo_paths.add(repo_path)
+        pm2_inventory = get_pm2_inventory()
+        for pm2_name in options.pm2_processes:
+            pm2_process = pm2_inventory.get_process(pm2_name)
+            if not pm2_process:
+                continue
+
+            git_cmd = f"git -C {pm2_process.cwd} rev-parse --show-toplevel"
+            try:
+                process = subprocess.run(shlex.split(git_cmd), check=True, stdout=subprocess.PIPE)
+            except subprocess.CalledProcessError:
+                continue
+            repo_path = process.stdout.decode().strip()
+            self.log_info(f"Found repo path from '{pm2_name}' pm2 process: {repo_path}")
+            repo_paths.add(repo_path)
 
         return list(repo_paths)
 
@@ -117,48 +119,87 @@ class ValidatorCheckerGitUpdateBase(ValidatorChecker):
 
         return list(repo_paths)
 
-    def _run(self):
+    def _start(self):
         self.log_info("")
         self.log_info("Checking for code updates.")
         self.log_info("")
         
         if not self._code_repo_paths:
             self.log_error("No valid git repo path. Not checking for code updates.")
-            return
-
-        while True:
-            do_restart = False
-            for code_repo_path in self._code_repo_paths:
-                self.log_info("")
-                self.log_info(f"Checking repo path: {code_repo_path}")
-                self.log_info("")
-                if not os.path.isdir(code_repo_path):
-                    self.log_error(f"Repo directory path does not exist: {code_repo_path}")
-                    continue
-
-                git_command = (
-                    f"git -C {code_repo_path}"
-                    if code_repo_path != os.getcwd()
-                    else "git"
-                )
-                try:
-                    do_restart |= self._check_code_repo(git_command)
-                except GitUpdateError:
-                    send_monitor_notification(
-                        self.log_prefix,
-                        f"{RED_X} Failed to update git repo on subnet {self._netuid}"
-                    )
-
-            if do_restart:
-                self._restart_validator(
-                    "Pulled new code from git repo.",
-                    force_notify=True,
-                    git_update_notify=True
-                )
+            return False
 
-            sleep_interval = 900  # 15 minutes
-            self.log_info(f"Sleeping for {sleep_interval} seconds.")
-            time.sleep(sleep_interval)
+        return True
+
+    def _check(self):
+        # The repos are checked concurrently since each check waits on the
+        # network.
+        code_repo_paths = []
+        git_commands = []
+        for code_repo_path in self._code_repo_paths:
+            git_command = self._get_git_command(code_repo_path)
+            if git_command:
+                code_repo_paths.append(code_repo_path)
+                git_commands.append(git_command)
+
+        with ThreadPoolExecutor(max_workers=max(len(git_commands), 1)) as executor:
+            do_restart = any(list(
+                executor.map(self._try_check_code_repo, code_repo_paths, git_commands)
+            ))
+
+        if do_restart:
+            self._restart_validator(
+                "Pulled new code from git repo.",
+                force_notify=True,
+                git_update_notify=True
+            )
+
+        return 900  # 15 minutes
+
+    def _get_git_command(self, code_repo_path):
+        self.log_info("")
+        self.log_info(f"Checking repo path: {code_repo_path}")
+        self.log_info("")
+        if not os.path.isdir(code_repo_path):
+            self.log_error(f"Repo directory path does not exist: {code_repo_path}")
+            return None
+
+        return (
+            f"git -C {code_repo_path}"
+            if code_repo_path != os.getcwd()
+            else "git"
+        )
+
+    def _try_check_code_repo(self, code_repo_path, git_command):
+        try:
+            return self._check_code_repo(code_repo_path, git_command)
+        except GitUpdateError:
+            self._send_git_update_error()
+            return False
+
+    def _run_git(self, git_cmd, check=True, capture_output=True):
+        # Returns the command's stripped stdout, or None if the output isn't
+        # captured. If the command fails or times out this raises
+        # GitUpdateError, or returns None when check is False.
+        try:
+            process = subprocess.run(
+                shlex.split(git_cmd),
+                check=True,
+                stdout=subprocess.PIPE if capture_output else None,
+                timeout=GIT_COMMAND_TIMEOUT,
+            )
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired) as exc:
+            if not check:
+                return None
+            self.log_error(f"'{git_cmd}' command failed with error: {exc}")
+            raise GitUpdateError
+
+        return process.stdout.decode().strip() if capture_output else None
+
+    def _send_git_update_error(self):
+        send_monitor_notification(
+            self.log_prefix,
+            f"{RED_X} Failed to update git repo on subnet {self._netuid}"
+        )
 
     def _check_code_repo(self, *args, **kwargs):
         raise NotImplementedError
@@ -166,49 +207,105 @@ class ValidatorCheckerGitUpdateBase(ValidatorChecker):
 
 class ValidatorCheckerGitUpdateCommits(ValidatorCheckerGitUpdateBase):
 
-    def _check_code_repo(self, git_command):
+    def _init_setup(self, options):
+        super()._init_setup(options)
+
+        # With ls-remote checks the repo is only pulled when the upstream
+        # branch has moved since the last check.
+        self._check_ls_remote = options.code_check_ls_remote
+        self._remote_commits = {}  # git command -> upstream commit at the last pull
+
+    def _check_code_repo(self, code_repo_path, git_command):
+        remote_commit = None
+        if self._check_ls_remote:
+            remote_commit = self._get_remote_commit(git_command)
+            if remote_commit:
+                last_remote_commit = (
+                    self._remote_commits.get(git_command)
+                    or self._run_git(f"{git_command} rev-parse HEAD")
+                )
+                if not self._has_remote_changed(
+                    code_repo_path, git_command, remote_commit, last_remote_commit
+                ):
+                    return False
+
+        do_restart = self._pull_code_repo(code_repo_path, git_command)
+        if remote_commit:
+            self._remote_commits[git_command] = remote_commit
+        return do_restart
+
+    def _get_remote_commit(self, git_command):
+        # Returns the commit the upstream branch points to on the remote, or
+        # None if there's no upstream branch, e.g. the HEAD is detached.
+        branch = self._run_git(f"{git_command} symbolic-ref -q --short HEAD", check=False)
+        remote = merge_ref = None
+        if branch:
+            remote = self._run_git(f"{git_command} config branch.{branch}.remote", check=False)
+            merge_ref = self._run_git(f"{git_command} config branch.{branch}.merge", check=False)
+
+        ls_remote_cmd = self._get_ls_remote_command(git_command, branch, remote, merge_ref)
+        if not ls_remote_cmd:
+            return None
+        return self._parse_ls_remote_output(self._run_git(ls_remote_cmd))
+
+    def _get_ls_remote_command(self, git_command, branch, remote, merge_ref):
+        if not branch:
+            self.log_warning("HEAD is not on a branch. Pulling to check for updates.")
+            return None
+
+        if not remote or not merge_ref:
+            self.log_warning(f"Branch '{branch}' has no upstream. Pulling to check for updates.")
+            return None
+
+        return f"{git_command} ls-remote {remote} {merge_ref}"
+
+    def _parse_ls_remote_output(self, ls_remote_output):
+        # The output is "<commit>\t<ref>" for the matching ref.
+        remote_commit = ls_remote_output.split("\t", 1)[0].strip()
+        if not remote_commit:
+            self.log_warning("Upstream branch not found on the remote. Pulling to check for updates.")
+            return None
+        return remote_commit
+
+    def _has_remote_changed(self, code_repo_path, git_command, remote_commit, last_remote_commit):
+        # The upstream commit at the last pull works like an ETag. Before the
+        # first pull it's the local HEAD.
+        self.log_info("")
+        self.log_info(f"{code_repo_path}: Last remote commit: {last_remote_commit}")
+        self.log_info(f"{code_repo_path}: Remote commit: {remote_commit}")
+        if remote_commit == last_remote_commit:
+            self.log_info(f"{code_repo_path}: Remote commit unchanged. Doing nothing.")
+            self._remote_commits[git_command] = remote_commit
+            return False
+
+        self.log_info(f"{code_repo_path}: Remote commit changed. Pulling.")
+        return True
+
+    def _pull_code_repo(self, code_repo_path, git_command):
         get_cmd = f"{git_command} rev-parse HEAD"
         pull_cmd = f"{git_command} pull --autostash"
 
         # Get commit then pull then get commit again. First get commit is in case
         # the code was manually pulled while we were waiting. This ensures that
         # we are always comparing the correct commits.
-        try:
-            process = subprocess.run(shlex.split(get_cmd), check=True, stdout=subprocess.PIPE)
-        except subprocess.CalledProcessError as exc:
-            self.log_error(f"'{get_cmd}' command failed with error: {exc}")
-            raise GitUpdateError
-
-        current_commit = process.stdout.decode().strip()
-
-        try:
-            subprocess.run(shlex.split(pull_cmd), check=True)
-        except subprocess.CalledProcessError as exc:
-            self.log_error(f"'{pull_cmd}' command failed with error: {exc}")
-            raise GitUpdateError
-
-        try:
-            process = subprocess.run(shlex.split(get_cmd), check=True, stdout=subprocess.PIPE)
-        except subprocess.CalledProcessError as exc:
-            self.log_error(f"'{get_cmd}' command failed with error: {exc}")
-            raise GitUpdateError
-
-        new_commit = process.stdout.decode().strip()
+        current_commit = self._run_git(get_cmd)
+        self._run_git(pull_cmd, capture_output=False)
+        new_commit = self._run_git(get_cmd)
 
         self.log_info("")
-        self.log_info(f"Current commit: {current_commit}")
-        self.log_info(f"New commit: {new_commit}")
+        self.log_info(f"{code_repo_path}: Current commit: {current_commit}")
+        self.log_info(f"{code_repo_path}: New commit: {new_commit}")
         if current_commit != new_commit:
-            self.log_info("Commits changed.")
+            self.log_info(f"{code_repo_path}: Commits changed.")
             return True
 
-        self.log_info("Commits are the same. Doing nothing.")
+        self.log_info(f"{code_repo_path}: Commits are the same. Doing nothing.")
         return False
 
 
 class ValidatorCheckerGitUpdateTags(ValidatorCheckerGitUpdateBase):
 
-    def _check_code_repo(self, git_command):
+    def _check_code_repo(self, code_repo_path, git_command):
         fetch_cmd = f"{git_command} fetch"
         get_cmd = f"{git_command} describe --tags"
         current_cmd = f"{git_command} rev-parse HEAD"
@@ -218,49 +315,15 @@ class ValidatorCheckerGitUpdateTags(ValidatorCheckerGitUpdateBase):
         stash_push_cmd = f"{git_command} stash push"
         stash_pop_cmd = f"{git_command} stash pop"
 
-        try:
-            subprocess.run(shlex.split(fetch_cmd), check=True)
-        except subprocess.CalledProcessError as exc:
-            self.log_error(f"'{fetch_cmd}' command failed with error: {exc}")
-            raise GitUpdateError
-
-        try:
-            process = subprocess.run(shlex.split(current_cmd), check=True, stdout=subprocess.PIPE)
-        except subprocess.CalledProcessError as exc:
-            self.log_error(f"'{current_cmd}' command failed with error: {exc}")
-            raise GitUpdateError
-
-        current_rev = process.stdout.decode().strip()
-
-        try:
-            get_current_cmd = f"{get_cmd} {current_rev}"
-            process = subprocess.run(shlex.split(get_current_cmd), check=True, stdout=subprocess.PIPE)
-        except subprocess.CalledProcessError as exc:
-            self.log_error(f"'{get_current_cmd}' command failed with error: {exc}")
-            raise GitUpdateError
-
-        current_tag = process.stdout.decode().strip()
-
-        try:
-            process = subprocess.run(shlex.split(latest_cmd), check=True, stdout=subprocess.PIPE)
-        except subprocess.CalledProcessError as exc:
-            self.log_error(f"'{latest_cmd}' command failed with error: {exc}")
-            raise GitUpdateError
-
-        latest_rev = process.stdout.decode().strip()
-
-        try:
-            get_latest_cmd = f"{get_cmd} {latest_rev}"
-            process = subprocess.run(shlex.split(get_latest_cmd), check=True, stdout=subprocess.PIPE)
-        except subprocess.CalledProcessError as exc:
-            self.log_error(f"'{get_latest_cmd}' command failed with error: {exc}")
-            raise GitUpdateError
-
-        latest_tag = process.stdout.decode().strip()
+        self._run_git(fetch_cmd, capture_output=False)
+        current_rev = self._run_git(current_cmd)
+        current_tag = self._run_git(f"{get_cmd} {current_rev}")
+        latest_rev = self._run_git(latest_cmd)
+        latest_tag = self._run_git(f"{get_cmd} {latest_rev}")
 
         self.log_info("")
-        self.log_info(f"Current tag: {current_tag}")
-        self.log_info(f"Latest tag: {latest_tag}")
+        self.log_info(f"{code_repo_path}: Current tag: {current_tag}")
+        self.log_info(f"{code_repo_path}: Latest tag: {latest_tag}")
         if latest_tag.endswith("-rc"):
             self.log_info("Latest tag is not a release. Doing nothing.")
             return False
@@ -271,39 +334,16 @@ class ValidatorCheckerGitUpdateTags(ValidatorCheckerGitUpdateBase):
 
         self.log_info("Tags are different.")
 
-        # Check if there are local changes.
-        try:
-            process = subprocess.run(shlex.split(stash_check_cmd), check=True, stdout=subprocess.PIPE)
-        except subprocess.CalledProcessError as exc:
-            self.log_error(f"'{stash_check_cmd}' command failed with error: {exc}")
-            raise GitUpdateError
-
-        do_stash = bool(process.stdout.decode().strip())
-
         # If there are local changes then we need to stash the changes
-        # before checking out latest tag.
+        # before checking out latest tag and unstash them after.
+        do_stash = bool(self._run_git(stash_check_cmd))
         if do_stash:
-            try:
-                subprocess.run(shlex.split(stash_push_cmd), check=True)
-            except subprocess.CalledProcessError as exc:
-                self.log_error(f"'{stash_push_cmd}' command failed with error: {exc}")
-                raise GitUpdateError
+            self._run_git(stash_push_cmd, capture_output=False)
 
-        try:
-            pull_latest_cmd = f"{pull_cmd} {latest_tag}"
-            subprocess.run(shlex.split(pull_latest_cmd), check=True)
-        except subprocess.CalledProcessError as exc:
-            self.log_error(f"'{pull_latest_cmd}' command failed with error: {exc}")
-            raise GitUpdateError
+        self._run_git(f"{pull_cmd} {latest_tag}", capture_output=False)
 
-        # If there are local changes then we need to unstash the changes
-        # after checking out latest tag.
         if do_stash:
-            try:
-                subprocess.run(shlex.split(stash_pop_cmd), check=True)
-            except subprocess.CalledProcessError as exc:
-                self.log_error(f"'{stash_pop_cmd}' command failed with error: {exc}")
-                raise GitUpdateError
+            self._run_git(stash_pop_cmd, capture_output=False)
 
         self.log_info("Pulled latest tag.")
         return True
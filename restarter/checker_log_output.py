@@ -1,7 +1,7 @@
 # Standard imports
 import os
 import pty
-import re
+import queue
 import subprocess
 import threading
 import time
@@ -9,15 +9,28 @@ import time
 
 # Local imports
 from .checker_base import ValidatorChecker
+from .docker_stream import get_docker_log_stream
 from .constants import (
+    DEBUG,
+    LOG_MATCHER_BENCHMARK_LINES,
+    LOG_READ_CHUNK_SIZE,
     RED_EP,
     RIZZO_COLDKEY,
     RIZZO_HOTKEYS,
-    BLACKLIST_REGEXES,
-    BLACKLIST_EXCLUDE_SEARCH_REGEXES,
-    BLACKLIST_EXCLUDE_MATCH_REGEXES,
-    BLACKLIST_EXCLUDE_HOTKEY_REGEXES,
 )
+from .log_matcher import LogLineMatcher
+from .log_tailer import (
+    LogFileTailer,
+    LogLineBatcher,
+)
+from .metrics import (
+    LOG_BATCH_MATCH_SECONDS,
+    LOG_PROCESS_LAUNCHES,
+    LOG_RESTART_WAIT_SECONDS,
+    LOG_RESTART_WAITING,
+    record_log_batch,
+)
+from .pm2_inventory import get_pm2_inventory
 from .utils import (
     get_pm2_log_output_wait_timer,
     set_pm2_log_output_wait_timer,
@@ -67,26 +80,139 @@ class ValidatorCheckerLogOutput(ValidatorCheckerLogOutputFactory):
         # determine an exclude pattern for these verbose logs.
         self._blacklist_log_max_length = 500
 
-        self._blacklist_regexes = [
-            re.compile(match_string, flags=flags) for match_string, flags in BLACKLIST_REGEXES
-        ]
-        self._blacklist_exclude_search_regexes = [
-            re.compile(exclude_string) for exclude_string in BLACKLIST_EXCLUDE_SEARCH_REGEXES
-        ]
-        self._blacklist_exclude_match_regexes = [
-            re.compile(f"^{exclude_string}$") for exclude_string in BLACKLIST_EXCLUDE_MATCH_REGEXES
-        ]
-
-        # Used for excluding blacklist patterns that list a key being blacklisted that is not ours.
-        self._blacklist_exclude_hotkey_regexes = [
-            re.compile(exclude_string) for exclude_string in BLACKLIST_EXCLUDE_HOTKEY_REGEXES
-        ]
-
         self._blacklist_wait_time = 86400  # 1 day
         self._blacklist_notify_time = None
         self._process_name = process_name
+        self._metric_labels = (str(self._netuid), process_name)
+
+        # A typical log line that doesn't match anything, for measuring the
+        # matching throughput in debug mode.
+        self._benchmark_log_line = (
+            "2025-01-01 00:00:00.000 | INFO | Scored response from uid 123 "
+            "in 1.234s with reward 0.56789\n"
+        )
+
+    def _start_log_checks(self, description):
+        # Returns False if there is nothing to check.
+        self.log_info("")
+        self.log_info(f"Checking log output for {description}.")
+        self.log_info("")
+
+        if not self._do_check_errors and not self._do_check_blacklist:
+            self.log_warning(
+                "Restart patterns and blacklising checks are both False. Nothing to do."
+            )
+            return False
+
+        if self._do_check_errors:
+            self.log_info("Checking for errors.")
+        if self._do_check_blacklist:
+            self.log_info("Checking for miner blacklisting.")
+
+        return True
+
+    def _get_log_matcher(self):
+        log_matcher = LogLineMatcher(
+            self._generic_patterns + self._subnet_patterns,
+            check_restart=self._do_check_errors,
+            check_blacklist=self._do_check_blacklist,
+        )
+
+        if DEBUG:
+            lines_per_second = log_matcher.measure_throughput(
+                self._benchmark_log_line, LOG_MATCHER_BENCHMARK_LINES
+            )
+            self.log_debug(f"Log line matching throughput: {lines_per_second:,.0f} lines/sec per core.")
+
+        return log_matcher
+
+    def _read_log_batches(self, command):
+        # Runs the command on a pty and yields its output in blocks of
+        # complete lines until it exits.
+        command_str = " ".join(command)
+        self.log_info(f"Launching process: \"{command_str}\"")
+        LOG_PROCESS_LAUNCHES.inc(self._metric_labels)
+
+        mfd, sfd = pty.openpty()
+        process = subprocess.Popen(
+            command, stdout=sfd, stderr=subprocess.STDOUT)
+        os.close(sfd)
+        batcher = LogLineBatcher(translate_crlf=True)
+        try:
+            while True:
+                try:
+                    chunk = os.read(mfd, LOG_READ_CHUNK_SIZE)
+                except OSError:
+                    chunk = b""
+                if not chunk:
+                    # The process exited.
+                    self.log_info(f"Process exited: \"{command_str}\"")
+                    batch = batcher.flush()
+                    if batch:
+                        yield batch
+                    return
+
+                batch = batcher.add(chunk)
+                if batch:
+                    yield batch
+        finally:
+            self.log_info(f"Killing process: \"{command_str}\"")
+            process.kill()
+            process.wait()
+            os.close(mfd)
+
+    def _check_log_batch(self, batch, log_matcher, check_errors=True):
+        # Yields the matched restart patterns in a block of log lines.
+        if not batch:
+            return
+
+        line_count = batch.count(b"\n")
+        record_log_batch(self._metric_labels, batch, line_count)
+
+        # The match time doesn't include the restarts done while suspended.
+        match_time = 0
+        start_time = time.perf_counter()
+        for log_line, line_match in log_matcher.match_batch(batch):
+            pattern = self._check_log_line(log_line, line_match, log_matcher, check_errors)
+            if pattern:
+                match_time += time.perf_counter() - start_time
+                yield pattern
+                start_time = time.perf_counter()
+        match_time += time.perf_counter() - start_time
+
+        LOG_BATCH_MATCH_SECONDS.observe(self._metric_labels, match_time)
+
+    def _get_restart_pattern(self, batch, log_matcher):
+        # Checks the whole batch and returns the first matched restart
+        # pattern, if any, for the callers that restart once per batch.
+        restart_pattern = None
+        for pattern in self._check_log_batch(batch, log_matcher):
+            if restart_pattern is None:
+                restart_pattern = pattern
+        return restart_pattern
+
+    def _check_log_line(self, log_line, line_match, log_matcher, check_errors=True):
+        # Returns the matched restart pattern if a restart is needed.
+        if self._do_check_blacklist:
+            # Check if we're being blacklisted
+            self._check_for_blacklist(log_line, line_match, log_matcher)
+
+        if not self._do_check_errors or not check_errors:
+            return None
+
+        # Check for restart patterns
+        return self._match_restart_pattern(log_line, line_match)
 
-    def _check_for_blacklist(self, log_line):
+    def _match_restart_pattern(self, log_line, line_match):
+        # Returns the matched restart pattern, if any.
+        pattern = line_match.restart_pattern
+        if pattern:
+            self.log_info(
+                f"Log line matches a restart pattern: \"{pattern}\"\n"
+                f"{log_line}\n")
+        return pattern
+
+    def _check_for_blacklist(self, log_line, line_match, log_matcher):
         current_time = time.time()
         if (
             self._blacklist_notify_time and 
@@ -98,55 +224,42 @@ class ValidatorCheckerLogOutput(ValidatorCheckerLogOutputFactory):
             )
             return
 
-        for blacklist_regex in self._blacklist_regexes:
-            if blacklist_regex.search(log_line):
-                self.log_info(f"Log line matches a blacklist pattern:\n{log_line}\n")
+        if not line_match.blacklisted:
+            return
 
-                if len(log_line) > self._blacklist_log_max_length:
-                    self.log_info(
-                        f"Log line is longer than {self._blacklist_log_max_length} "
-                        "characters. Not sending a discord notification.",
-                    )
-                    return
+        self.log_info(f"Log line matches a blacklist pattern:\n{log_line}\n")
 
-                for exclude_regex in self._blacklist_exclude_search_regexes:
-                    if exclude_regex.search(log_line):
-                        self.log_info(
-                            "Log line matches a blacklist exclude pattern. "
-                            "Not sending a discord notification."
-                        )
-                        return
+        if len(log_line) > self._blacklist_log_max_length:
+            self.log_info(
+                f"Log line is longer than {self._blacklist_log_max_length} "
+                "characters. Not sending a discord notification.",
+            )
+            return
 
-                for exclude_regex in self._blacklist_exclude_match_regexes:
-                    if exclude_regex.match(log_line):
-                        self.log_info(
-                            "Log line matches a blacklist exclude pattern. "
-                            "Not sending a discord notification."
-                        )
-                        return
-
-                for exclude_regex in self._blacklist_exclude_hotkey_regexes:
-                    key_match = exclude_regex.search(log_line)
-                    if key_match:
-                        key = key_match.group("key")
-                        if key not in (RIZZO_COLDKEY, RIZZO_HOTKEYS[self._netuid],):
-                            self.log_info(
-                                "Log line is blacklisting a hotkey that is not ours. "
-                                "Not sending a discord notification."
-                            )
-                            return
-                        break
+        if log_matcher.matches_blacklist_exclude(log_line):
+            self.log_info(
+                "Log line matches a blacklist exclude pattern. "
+                "Not sending a discord notification."
+            )
+            return
 
-                self.log_info(
-                        "Log line does not match any blacklist exclude patterns. "
-                        "Sending a discord notification."
-                    )
-                send_monitor_notification(
-                    self.log_prefix,
-                    f"{RED_EP} We're being blacklisted on subnet {self._netuid}"
-                )
-                self._blacklist_notify_time = current_time
-                return
+        key = log_matcher.get_blacklisted_key(log_line)
+        if key and key not in (RIZZO_COLDKEY, RIZZO_HOTKEYS[self._netuid],):
+            self.log_info(
+                "Log line is blacklisting a hotkey that is not ours. "
+                "Not sending a discord notification."
+            )
+            return
+
+        self.log_info(
+                "Log line does not match any blacklist exclude patterns. "
+                "Sending a discord notification."
+            )
+        send_monitor_notification(
+            self.log_prefix,
+            f"{RED_EP} We're being blacklisted on subnet {self._netuid}"
+        )
+        self._blacklist_notify_time = current_time
 
 
 class ValidatorCheckerDockerLogOutput(ValidatorCheckerLogOutput):
@@ -160,74 +273,64 @@ class ValidatorCheckerDockerLogOutput(ValidatorCheckerLogOutput):
         self._docker_container = options.docker_container
 
     def _run(self):
-        self.log_info("")
-        self.log_info(f"Checking log output for container: {self._docker_container}.")
-        self.log_info("")
+        if not self._start_log_checks(f"container: {self._docker_container}"):
+            return
 
-        if not self._do_check_errors and not self._do_check_blacklist:
+        log_matcher = self._get_log_matcher()
+
+        log_stream = get_docker_log_stream(self._docker_container)
+        if log_stream is None:
             self.log_warning(
-                "Restart patterns and blacklising checks are both False. Nothing to do."
+                "Could not import the docker python module. Falling back to \"docker logs\"."
             )
+            self._run_docker_logs(log_matcher)
             return
 
-        if self._do_check_errors:
-            self.log_info("Checking for errors.")
-        if self._do_check_blacklist:
-            self.log_info("Checking for miner blacklisting.")
+        # The container's log stream is shared with the stopped logs checker.
+        log_batches = queue.Queue()
+        log_stream.add_listener(log_batches.put)
+        while True:
+            batch = log_batches.get()
+            pattern = self._get_restart_pattern(batch, log_matcher)
+            if pattern:
+                self._restart_validator(
+                    f"Docker log output matches a restart pattern: \"{pattern}\""
+                )
+
+                # Skip the log output from while the validator was restarting.
+                sleep_time = 60
+                self.log_info(f"Sleeping {sleep_time} seconds.")
+                time.sleep(sleep_time)
+                self._clear_log_batches(log_batches)
 
-        log_regexes = []
-        for log_pattern in self._generic_patterns + self._subnet_patterns:
-            log_regexes.append(re.compile(log_pattern))
+    def _run_docker_logs(self, log_matcher):
         command = ["docker", "logs", self._docker_container, "--since", "15s", "--follow"]
-        command_str = " ".join(command)
 
         while True:
-            self.log_info(f"Launching process: \"{command_str}\"")
-
-            mfd, sfd = pty.openpty()
-            process = subprocess.Popen(
-                command, stdout=sfd, stderr=subprocess.STDOUT)
-            os.close(sfd)
-            master = os.fdopen(mfd)
-            while True:
-                try:
-                    log_line = master.readline()
-                except:
-                    # The process exited.
-                    self.log_info(f"Process exited: \"{command_str}\"")
-                    break
-                else:
-                    if self._do_check_blacklist:
-                        # Check if we're being blacklisted
-                        self._check_for_blacklist(log_line)
-
-                    if not self._do_check_errors:
-                        continue
-
-                    # Check for restart patterns
-                    do_restart = False
-                    for log_regex in log_regexes:
-                        match = log_regex.search(log_line)
-                        if match:
-                            do_restart = True
-                            pattern = match.group()
-                            self.log_info(
-                                f"Log line matches a restart pattern: \"{pattern}\"\n"
-                                f"{log_line}\n")
-                            self._restart_validator(
-                                f"Docker log output matches a restart pattern: \"{pattern}\""
-                            )
-                            break
-                    if do_restart:
+            log_batches = self._read_log_batches(command)
+            try:
+                for batch in log_batches:
+                    pattern = self._get_restart_pattern(batch, log_matcher)
+                    if pattern:
+                        self._restart_validator(
+                            f"Docker log output matches a restart pattern: \"{pattern}\""
+                        )
                         break
+            finally:
+                log_batches.close()
 
-            self.log_info(f"Killing process: \"{command_str}\"")
-            process.kill()
-            master.close()
             sleep_time = 60
             self.log_info(f"Sleeping {sleep_time} seconds.")
             time.sleep(sleep_time)
 
+    @staticmethod
+    def _clear_log_batches(log_batches):
+        while True:
+            try:
+                log_batches.get_nowait()
+            except queue.Empty:
+                return
+
 
 class ValidatorCheckerPm2LogOutput(ValidatorCheckerLogOutput):
     log_prefix = "CHECK PM2 LOG OUTPUT"
@@ -237,11 +340,13 @@ class ValidatorCheckerPm2LogOutput(ValidatorCheckerLogOutput):
 
     # Inline wait timer class
     class ErrorLogsWaitTimer:
-        def __init__(self, wait_time):
+        def __init__(self, wait_time, netuid):
             self._timer_lock = threading.Lock()
             self._wait_timer = None
             self._wait_event = threading.Event()
             self._wait_time = wait_time
+            self._wait_start_time = None
+            self._metric_labels = (str(netuid),)
 
         def get_waiting_status(self):
             return self._wait_event.is_set()
@@ -249,6 +354,9 @@ class ValidatorCheckerPm2LogOutput(ValidatorCheckerLogOutput):
         def start_wait_timer(self):
             with self._timer_lock:
                 self._wait_event.set()
+                if self._wait_start_time is None:
+                    self._wait_start_time = time.time()
+                    LOG_RESTART_WAITING.set(self._metric_labels, 1)
                 if self._wait_timer:
                     self._wait_timer.cancel()
                 self._wait_timer = threading.Timer(
@@ -263,6 +371,11 @@ class ValidatorCheckerPm2LogOutput(ValidatorCheckerLogOutput):
         def _unset_wait_event(self):
             with self._timer_lock:
                 self._wait_event.clear()
+                LOG_RESTART_WAIT_SECONDS.inc(
+                    self._metric_labels, time.time() - self._wait_start_time
+                )
+                LOG_RESTART_WAITING.set(self._metric_labels, 0)
+                self._wait_start_time = None
                 ValidatorCheckerPm2LogOutput.log_info(
                     "Continuing pm2 log patterns check."
                 )
@@ -274,96 +387,106 @@ class ValidatorCheckerPm2LogOutput(ValidatorCheckerLogOutput):
         self._restart_wait_time = options.log_errors_restart_wait_time * 60
 
     def _run(self):
-        self.log_info("")
-        self.log_info(f"Checking log output for process: {self._pm2_process}.")
-        self.log_info("")
+        if not self._start_log_checks(f"process: {self._pm2_process}"):
+            return
 
-        if not self._do_check_errors and not self._do_check_blacklist:
+        self._create_pm2_log_output_wait_timer(self._netuid, self._restart_wait_time)
+
+        log_matcher = self._get_log_matcher()
+
+        log_files = self._get_pm2_log_files()
+        if not log_files:
             self.log_warning(
-                "Restart patterns and blacklising checks are both False. Nothing to do."
+                f"Could not find the log files for pm2 process {self._pm2_process}. "
+                "Falling back to \"pm2 log\"."
             )
+            self._run_pm2_log(log_matcher)
             return
 
-        if self._do_check_errors:
-            self.log_info("Checking for errors.")
-        if self._do_check_blacklist:
-            self.log_info("Checking for miner blacklisting.")
-
-        self._create_pm2_log_output_wait_timer(self._restart_wait_time)
+        # Follow the pm2 log files directly. This doesn't need a pm2 client
+        # process and doesn't miss any lines while relaunching one.
+        self.log_info(f"Following log files: {', '.join(log_files)}")
+        with LogFileTailer(log_files) as log_tailer:
+            self.log_info("Starting log patterns check.")
+            for batch in log_tailer.batches():
+                for pattern in self._check_log_batch(batch, log_matcher):
+                    self._restart_validator(
+                        f"Pm2 log output matches a restart pattern: \"{pattern}\""
+                    )
 
-        log_regexes = []
-        for log_pattern in self._generic_patterns + self._subnet_patterns:
-            log_regexes.append(re.compile(log_pattern))
+    def _run_pm2_log(self, log_matcher):
         command = ["pm2", "log", self._pm2_process, "--raw"]
-        command_str = " ".join(command)
 
         while True:
-            _initial_log_lines = 0
-            self.log_info(f"Launching process: \"{command_str}\"")
-
-            mfd, sfd = pty.openpty()
-            process = subprocess.Popen(
-                command, stdout=sfd, stderr=subprocess.STDOUT)
-            os.close(sfd)
-            master = os.fdopen(mfd)
-            while True:
-                try:
-                    log_line = master.readline()
-                except:
-                    # The process exited.
-                    self.log_info(f"Process exited: \"{command_str}\"")
-                    break
-                else:
-                    if self._do_check_blacklist:
-                        # Check if we're being blacklisted
-                        self._check_for_blacklist(log_line)
-
-                    if not self._do_check_errors:
-                        continue
-
-                    # Check whether or not restart patterns should be checked
-                    if _initial_log_lines < self._skip_initial_log_lines:
-                        _initial_log_lines += 1
-                        self.log_debug(f"{_initial_log_lines=}")
-                        continue
-                    elif _initial_log_lines == self._skip_initial_log_lines:
-                        _initial_log_lines += 1
-                        self.log_info("Starting log patterns check.")
-
-                    if get_pm2_log_output_wait_timer().get_waiting_status():
-                        self.log_debug(
-                            f"({self._pm2_process}) Log line skipped. "
-                            "In waiting mode."
-                        )
-                        continue
-
-                    # Check for restart patterns
-                    for log_regex in log_regexes:
-                        match = log_regex.search(log_line)
-                        if match:
-                            pattern = match.group()
-                            self.log_info(
-                                f"Log line matches a restart pattern: \"{pattern}\"\n"
-                                f"{log_line}\n")
+            initial_log_lines = 0
+            log_batches = self._read_log_batches(command)
+            try:
+                for batch in log_batches:
+                    # pm2 log outputs the last lines of the log files first.
+                    # Restart patterns aren't checked in those lines.
+                    initial_batch, batch, initial_log_lines = self._split_initial_log_lines(
+                        batch, initial_log_lines
+                    )
+                    for lines, check_errors in ((initial_batch, False), (batch, True)):
+                        for pattern in self._check_log_batch(lines, log_matcher, check_errors):
                             self._restart_validator(
                                 f"Pm2 log output matches a restart pattern: \"{pattern}\""
                             )
-                            break
+            finally:
+                log_batches.close()
 
-            self.log_info(f"Killing process: \"{command_str}\"")
-            process.kill()
-            master.close()
             sleep_time = 15
             self.log_info(f"Sleeping {sleep_time} seconds.")
             time.sleep(sleep_time)
 
+    def _split_initial_log_lines(self, batch, initial_log_lines):
+        # Splits off the lines of the batch that are still within the initial
+        # log lines output by pm2 log. Returns the initial lines, the rest of
+        # the batch and the updated count of initial lines.
+        if not self._do_check_errors or initial_log_lines > self._skip_initial_log_lines:
+            return b"", batch, initial_log_lines
+
+        split_position = 0
+        while initial_log_lines < self._skip_initial_log_lines and split_position < len(batch):
+            split_position = batch.index(b"\n", split_position) + 1
+            initial_log_lines += 1
+            self.log_debug(f"{initial_log_lines=}")
+
+        if initial_log_lines == self._skip_initial_log_lines:
+            initial_log_lines += 1
+            self.log_info("Starting log patterns check.")
+
+        return batch[:split_position], batch[split_position:], initial_log_lines
+
+    def _get_pm2_log_files(self):
+        # Returns the pm2 process out and error log file paths.
+        try:
+            pm2_process = get_pm2_inventory().get_process(self._pm2_process)
+        except ValueError:
+            return None
+
+        return pm2_process.log_files if pm2_process else None
+
+    def _check_log_line(self, log_line, line_match, log_matcher, check_errors=True):
+        if (
+            self._do_check_errors and check_errors and
+            get_pm2_log_output_wait_timer(self._netuid).get_waiting_status()
+        ):
+            self.log_debug(
+                f"({self._pm2_process}) Log line skipped. "
+                "In waiting mode."
+            )
+            check_errors = False
+
+        return super()._check_log_line(log_line, line_match, log_matcher, check_errors)
+
     @classmethod
-    def _create_pm2_log_output_wait_timer(cls, wait_time):
-        if not get_pm2_log_output_wait_timer():
+    def _create_pm2_log_output_wait_timer(cls, netuid, wait_time):
+        if not get_pm2_log_output_wait_timer(netuid):
             pm2_log_output_wait_timer = (
-                cls.ErrorLogsWaitTimer(wait_time)
+                cls.ErrorLogsWaitTimer(wait_time, netuid)
             )
-            set_pm2_log_output_wait_timer(pm2_log_output_wait_timer)
+            set_pm2_log_output_wait_timer(netuid, pm2_log_output_wait_timer)
 
 
 class ValidatorCheckerDockerLogOutputSn52(ValidatorCheckerDockerLogOutput):
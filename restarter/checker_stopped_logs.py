@@ -1,153 +1,197 @@
 # Standard imports
-import json
 import os
-import subprocess
 import time
 
 # Local imports
-from .checker_base import ValidatorChecker
+from .checker_base import ValidatorPeriodicChecker
+from .docker_stream import (
+    STREAM_CONTAINER_NOT_FOUND,
+    STREAM_DISCONNECTED,
+    get_docker_log_stream,
+)
+from .log_watcher import get_log_write_watcher
+from .pm2_inventory import get_pm2_inventory
 
 
-class ValidatorCheckerDockerStoppedLogs(ValidatorChecker):
+class ValidatorCheckerStoppedLogs(ValidatorPeriodicChecker):
+
+    def _init_setup(self, options):
+        self._restart_threshold = int(round(options.stopped_logs_threshold * 60))
+
+    def _check_time_diff(self, time_diff):
+        # Returns the restart description, if a restart is needed, and the
+        # number of seconds until the next check.
+        restart_description = None
+        if time_diff >= self._restart_threshold:
+            self.log_info(f"Time difference {time_diff} seconds "
+                           f">= {self._restart_threshold} seconds")
+            log_minutes = time_diff / 60
+            restart_description = f"No log output in {log_minutes:.1f} minutes."
+        else:
+            self.log_info(f"Time difference {time_diff} seconds "
+                           f"< {self._restart_threshold} seconds")
+            self.log_info("Doing nothing.")
+
+        seconds_until_threshold = \
+            (self._restart_threshold - time_diff)
+        sleep_interval = (seconds_until_threshold
+                          if seconds_until_threshold > 0
+                          else self._restart_threshold)
+
+        return restart_description, sleep_interval
+
+
+class ValidatorCheckerDockerStoppedLogs(ValidatorCheckerStoppedLogs):
     log_prefix = "CHECK DOCKER LOGS STOPPED"
 
     def _init_setup(self, options):
+        super()._init_setup(options)
+
         self._docker_container = options.docker_container
-        self._restart_threshold = int(round(options.stopped_logs_threshold * 60))
 
-    def _run(self):
-        from datetime import datetime
-        try:
-            import docker
-        except ImportError:
+    def _start(self):
+        # The last log line time comes from the container's shared log
+        # stream, which is also read by the docker log output checker.
+        self._log_stream = get_docker_log_stream(self._docker_container)
+        if self._log_stream is None:
             self.log_error("Could not import the docker python module. Not checking for stopped logs.")
-            return
+            return False
 
         self.log_info("")
         self.log_info(f"Checking for stopped logs for container: {self._docker_container}.")
         self.log_info("")
 
-        client = docker.from_env()
-        try:
-            while True:
-                # Get the docker container each time in case it was restarted
-                # since the previous time.
-                try:
-                    container = client.containers.get(self._docker_container)
-                except docker.errors.NotFound:
-                    sleep_time = 60
-                    self.log_warning(f"Could not find '{self._docker_container}' docker container.")
-                    self.log_info(f"Sleeping {sleep_time} seconds.")
-                    time.sleep(sleep_time)
-                    continue
-
-                try:
-                    log_line = container.logs(timestamps=True, tail=1).decode()
-                except docker.errors.APIError:
-                    sleep_time = 60
-                    self.log_warning(f"Could not obtain logs from '{self._docker_container}' docker container.")
-                    self.log_info(f"Sleeping {sleep_time} seconds.")
-                    time.sleep(sleep_time)
-                    continue
-
-                timestamp = log_line.split()[0].split(".")[0]
-                log_time = datetime.fromisoformat(timestamp)
-                log_ctime = log_time.strftime("%a %b %d %H:%M:%S %Y")
-
-                current_time = datetime.now()
-                current_ctime = current_time.strftime("%a %b %d %H:%M:%S %Y")
-
-                self.log_info("")
-                self.log_info(f"Docker container: {self._docker_container}")
-                self.log_info(f"Last log output: {log_ctime}")
-                self.log_info(f"Current time: {current_ctime}")
-
-                time_diff = int((current_time - log_time).total_seconds())
-                if time_diff >= self._restart_threshold:
-                    self.log_info(f"Time difference {time_diff} seconds "
-                                f">= {self._restart_threshold} seconds")
-                    log_minutes = time_diff / 60
-                    self._restart_validator(f"No log output in {log_minutes:.1f} minutes.")
-                else:
-                    self.log_info(f"Time difference {time_diff} seconds "
-                                f"< {self._restart_threshold} seconds")
-                    self.log_info("Doing nothing.")
-
-                seconds_until_threshold = \
-                    (self._restart_threshold - time_diff)
-                sleep_interval = (seconds_until_threshold
-                                if seconds_until_threshold > 0
-                                else self._restart_threshold)
-                self.log_info(f"Sleeping for {sleep_interval} seconds.")
-                time.sleep(sleep_interval)
-        finally:
-            client.close()
-
-
-class ValidatorCheckerPm2StoppedLogs(ValidatorChecker):
+        return True
+
+    def _check(self):
+        restart_description, sleep_interval = self._check_log_stream()
+        if restart_description:
+            self._restart_validator(restart_description)
+
+        return sleep_interval
+
+    def _check_log_stream(self):
+        # The time the container is missing isn't counted as time without log
+        # output. Neither is a disconnected stream, until it's been down for
+        # the restart threshold, e.g. the container keeps exiting.
+        state, down_time = self._log_stream.get_state()
+        if state == STREAM_CONTAINER_NOT_FOUND:
+            self.log_warning(f"Could not find '{self._docker_container}' docker container.")
+            return None, 60
+
+        if state == STREAM_DISCONNECTED and time.time() - down_time < self._restart_threshold:
+            self.log_warning(f"Could not obtain logs from '{self._docker_container}' docker container.")
+            return None, 60
+
+        log_time = self._log_stream.get_last_log_time()
+        if log_time is None:
+            self.log_warning(f"No log output received from '{self._docker_container}' docker container yet.")
+            return None, 60
+
+        return self._check_log_time(log_time)
+
+    def _check_log_time(self, log_time):
+        current_time = time.time()
+
+        self.log_info("")
+        self.log_info(f"Docker container: {self._docker_container}")
+        self.log_info(f"Last log output: {time.ctime(log_time)}")
+        self.log_info(f"Current time: {time.ctime(current_time)}")
+
+        time_diff = int(current_time - log_time)
+        return self._check_time_diff(time_diff)
+
+
+class ValidatorCheckerPm2StoppedLogs(ValidatorCheckerStoppedLogs):
     log_prefix = "CHECK PM2 LOGS STOPPED"
 
     def _init_setup(self, options):
+        super()._init_setup(options)
+
         self._pm2_process = options.pm2_process
-        self._restart_threshold = int(round(options.stopped_logs_threshold * 60))
 
-    def _run(self):
+    def _start(self):
         self.log_info("")
         self.log_info(f"Checking for stopped logs for process: {self._pm2_process}.")
         self.log_info("")
 
-        while True:
-            out_log_file = None
-            error_log_file = None
-
-            process = subprocess.run(["pm2", "jlist"], stdout=subprocess.PIPE)
-            pm2_output = json.loads(process.stdout)
-            for pm2_process in pm2_output:
-                if pm2_process["name"] == self._pm2_process:
-                    out_log_file = pm2_process["pm2_env"]["pm_out_log_path"]
-                    error_log_file = pm2_process["pm2_env"]["pm_err_log_path"]
-                    break
-
-            if not out_log_file:
-                raise Exception(f"Could not find out log file for pm2 process {self._pm2_process}")
-            if not error_log_file:
-                raise Exception(f"Could not find error log file for pm2 process {self._pm2_process}")
-
-            if not os.path.isfile(out_log_file):
-                raise Exception(f"Out log file does not exist: {out_log_file}")
-            if not os.path.isfile(error_log_file):
-                raise Exception(f"Error log file does not exist: {error_log_file}")
-
-            self.log_info("")
-            self.log_info(f"Out log file: {out_log_file}")
-            self.log_info(f"Error log file: {error_log_file}")
-
-            out_log_file_mtime = int(os.path.getmtime(out_log_file))
-            error_log_file_mtime = int(os.path.getmtime(error_log_file))
-            current_time = int(time.time())
-            out_log_file_ctime = time.ctime(out_log_file_mtime)
-            error_log_file_ctime = time.ctime(error_log_file_mtime)
-            current_ctime = time.ctime(current_time)
-            self.log_info("")
-            self.log_info(f"Out Log file last modified: {out_log_file_ctime}")
-            self.log_info(f"Error Log file last modified: {error_log_file_ctime}")
-            self.log_info(f"Current time: {current_ctime}")
-
-            time_diff = current_time - max(out_log_file_mtime, error_log_file_mtime)
-            if time_diff >= self._restart_threshold:
-                self.log_info(f"Time difference {time_diff} seconds "
-                               f">= {self._restart_threshold} seconds")
-                log_minutes = time_diff / 60
-                self._restart_validator(f"No log output in {log_minutes:.1f} minutes.")
+        # Once the log files are found their writes are tracked with inotify,
+        # so the checks don't need pm2 jlist or the file mtimes.
+        self._log_watcher = get_log_write_watcher()
+        if self._log_watcher is None:
+            self.log_warning("inotify is unavailable. Checking the log file modification times.")
+
+        return True
+
+    def _check(self):
+        if self._is_watching_log_files():
+            restart_description, sleep_interval = self._check_last_write_time()
+        else:
+            pm2_process = get_pm2_inventory().get_process(self._pm2_process)
+            restart_description, sleep_interval = self._check_pm2_process(pm2_process)
+
+        if restart_description:
+            self._restart_validator(restart_description)
+
+        return sleep_interval
+
+    def _is_watching_log_files(self):
+        return self._log_watcher is not None and self._log_watcher.is_watched(self._pm2_process)
+
+    def _check_last_write_time(self):
+        last_write_time = self._log_watcher.get_last_write_time(self._pm2_process)
+        current_time = time.time()
+
+        self.log_info("")
+        self.log_info(f"Log files last written: {time.ctime(last_write_time)}")
+        self.log_info(f"Current time: {time.ctime(current_time)}")
+
+        time_diff = int(current_time - last_write_time)
+        restart_description, sleep_interval = self._check_time_diff(time_diff)
+        if restart_description:
+            # Look up the log files again after the restart in case pm2 moved them.
+            self._log_watcher.unwatch(self._pm2_process)
+
+        return restart_description, sleep_interval
+
+    def _check_pm2_process(self, pm2_process):
+        out_log_file = None
+        error_log_file = None
+
+        if pm2_process:
+            out_log_file = pm2_process.out_log_path
+            error_log_file = pm2_process.err_log_path
+
+        if not out_log_file:
+            raise Exception(f"Could not find out log file for pm2 process {self._pm2_process}")
+        if not error_log_file:
+            raise Exception(f"Could not find error log file for pm2 process {self._pm2_process}")
+
+        if not os.path.isfile(out_log_file):
+            raise Exception(f"Out log file does not exist: {out_log_file}")
+        if not os.path.isfile(error_log_file):
+            raise Exception(f"Error log file does not exist: {error_log_file}")
+
+        self.log_info("")
+        self.log_info(f"Out log file: {out_log_file}")
+        self.log_info(f"Error log file: {error_log_file}")
+
+        out_log_file_mtime = int(os.path.getmtime(out_log_file))
+        error_log_file_mtime = int(os.path.getmtime(error_log_file))
+        current_time = int(time.time())
+        out_log_file_ctime = time.ctime(out_log_file_mtime)
+        error_log_file_ctime = time.ctime(error_log_file_mtime)
+        current_ctime = time.ctime(current_time)
+        self.log_info("")
+        self.log_info(f"Out Log file last modified: {out_log_file_ctime}")
+        self.log_info(f"Error Log file last modified: {error_log_file_ctime}")
+        self.log_info(f"Current time: {current_ctime}")
+
+        if self._log_watcher is not None:
+            if self._log_watcher.watch(self._pm2_process, [out_log_file, error_log_file]):
+                self.log_info("Watching the log files for writes.")
             else:
-                self.log_info(f"Time difference {time_diff} seconds "
-                               f"< {self._restart_threshold} seconds")
-                self.log_info("Doing nothing.")
-
-            seconds_until_threshold = \
-                (self._restart_threshold - time_diff)
-            sleep_interval = (seconds_until_threshold
-                              if seconds_until_threshold > 0
-                              else self._restart_threshold)
-            self.log_info(f"Sleeping for {sleep_interval} seconds.")
-            time.sleep(sleep_interval)
+                self.log_warning("Could not watch the log files. Checking their modification times.")
+
+        time_diff = current_time - max(out_log_file_mtime, error_log_file_mtime)
+        return self._check_time_diff(time_diff)
@@ -1,23 +1,32 @@
 from __future__ import annotations
 
 # Standard imports
+import contextlib
 from dataclasses import dataclass
-import multiprocessing
+import json
 import os
 import pickle
 import random
+import socket
 import tempfile
+import threading
 import time
 from typing import TYPE_CHECKING
 
 # Local imports
-from .checker_base import ValidatorChecker
+from .block_feed import get_block_feed
+from .checker_base import ValidatorPeriodicChecker
 from .constants import (
+    LOCAL_SUBTENSORS,
+    SHARED_SUBTENSOR_SNAPSHOT_MAX_AGE,
+    SUBTENSOR_DAEMON_MAX_AGE,
+    SUBTENSOR_FETCH_TIMEOUT,
     RIZZO_COLDKEY,
     RIZZO_HOTKEYS,
     MULTI_UID_HOTKEYS,
     RED_X,
 )
+from .subtensor_worker import SubtensorWorker
 from .utils import (
     logger,
     send_monitor_notification
@@ -26,9 +35,13 @@ from .utils import (
 if TYPE_CHECKING:
     import numpy
 
-# Multiprocessing Queues
-UPDATED_MP_QUEUE = None
-VTRUST_MP_QUEUE = None
+# When running in a persistent subtensor worker process the subtensor
+# connection is kept open between fetches rather than reconnecting every time.
+_keep_subtensor_connection = False
+_persistent_subtensor = None
+
+# Set when a single restarter process supervises multiple subnets.
+_shared_subtensor_snapshot = None
 
 
 @dataclass
@@ -39,99 +52,370 @@ class SubtensorData:
     block: int
     last_update: numpy.ndarray | list[int]
     validator_trust: numpy.ndarray | list[float]
+    # Only set by the storage-only fetch, which doesn't get the hotkeys/coldkeys.
+    rizzo_uid: int | None = None
+    rizzo_hotkey: str | None = None
 
 
-def get_subtensor_data_from_bt_11(log_prefix, network, netuid, mechid):
+def _get_netuid_data_from_bt_11(subtensor, netuid, mechids):
     import bittensor
 
     def _index(netuid, mechid):
         return mechid * bittensor.settings.GLOBAL_MAX_SUBNET_COUNT + netuid
 
-    logger.info(f"{log_prefix}: Connecting to subtensor network: {network}")
-    with bittensor.Subtensor(network=network) as subtensor:
-        metagraph = subtensor.subnets.metagraph(netuid=netuid)
-        validator_trust = subtensor.query(
-            bittensor.storage.SubtensorModule.ValidatorTrust,
-            params=[netuid]
-        )
+    metagraph = subtensor.subnets.metagraph(netuid=netuid)
+    validator_trust = subtensor.query(
+        bittensor.storage.SubtensorModule.ValidatorTrust,
+        params=[netuid]
+    )
+    validator_trust = [(vt / bittensor.settings.U16_MAX) for vt in validator_trust]
+
+    netuid_data = {}
+    for mechid in mechids:
         last_update = subtensor.query(
             bittensor.storage.SubtensorModule.LastUpdate,
             params=[_index(netuid, mechid)]
         )
 
-    validator_trust = [(vt / bittensor.settings.U16_MAX) for vt in validator_trust]
+        netuid_data[mechid] = SubtensorData(
+            netuid=metagraph.netuid,
+            hotkeys=metagraph.hotkeys,
+            coldkeys=metagraph.coldkeys,
+            block=metagraph.block,
+            last_update=last_update,
+            validator_trust=validator_trust,
+        )
 
-    subtensor_data = SubtensorData(
-        netuid=metagraph.netuid,
-        hotkeys=metagraph.hotkeys,
-        coldkeys=metagraph.coldkeys,
-        block=metagraph.block,
-        last_update=last_update,
-        validator_trust=validator_trust,
-    )
+    return netuid_data
 
-    return subtensor_data
 
+def _get_netuid_data_from_bt_10(subtensor, netuid, mechids):
+    metagraph = subtensor.metagraph(netuid)
 
-def get_subtensor_data_from_bt_10(log_prefix, network, netuid, mechid):
+    netuid_data = {}
+    for mechid in mechids:
+        metagraph_info = subtensor.get_metagraph_info(netuid, mechid=mechid)
+
+        netuid_data[mechid] = SubtensorData(
+            netuid=metagraph.netuid,
+            hotkeys=metagraph.hotkeys,
+            coldkeys=metagraph.coldkeys,
+            block=int(metagraph.block),
+            last_update=metagraph_info.last_update,
+            validator_trust=metagraph.Tv,
+        )
+
+    return netuid_data
+
+
+def _resolve_rizzo_uid_from_bt_11(subtensor, netuid, block):
     import bittensor
 
-    logger.info(f"{log_prefix}: Connecting to subtensor network: {network}")
-    with bittensor.Subtensor(network=network) as subtensor:
-        metagraph = subtensor.metagraph(netuid)
-        metagraph_info = subtensor.get_metagraph_info(netuid, mechid=mechid)
+    if netuid in MULTI_UID_HOTKEYS:
+        hotkeys = [RIZZO_HOTKEYS[netuid]]
+    else:
+        hotkeys = subtensor.query(
+            bittensor.storage.SubtensorModule.OwnedHotkeys,
+            params=[RIZZO_COLDKEY],
+            block=block,
+        ) or []
+
+    # Matches the metagraph lookup, which finds the lowest uid for the coldkey.
+    rizzo_uid = None
+    rizzo_hotkey = None
+    for hotkey in hotkeys:
+        uid = subtensor.query(
+            bittensor.storage.SubtensorModule.Uids,
+            params=[netuid, hotkey],
+            block=block,
+        )
+        if uid is not None and (rizzo_uid is None or uid < rizzo_uid):
+            rizzo_uid = uid
+            rizzo_hotkey = hotkey
+
+    return rizzo_uid, rizzo_hotkey
+
+
+def _get_rizzo_data_from_bt_11(log_prefix, subtensor, netuid, mechid, rizzo_uid, rizzo_hotkey):
+    # Storage-only fetch. Rather than downloading the whole metagraph this reads
+    # the Keys entry for the cached rizzo uid and only resolves the uid again
+    # when the hotkey at that uid changed (i.e. deregistered or re-registered).
+    import bittensor
+
+    block = subtensor.block
+
+    if rizzo_uid is not None:
+        uid_hotkey = subtensor.query(
+            bittensor.storage.SubtensorModule.Keys,
+            params=[netuid, rizzo_uid],
+            block=block,
+        )
+        if uid_hotkey != rizzo_hotkey:
+            logger.info(
+                f"{log_prefix}: Hotkey for uid {rizzo_uid} changed. Resolving rizzo uid again."
+            )
+            rizzo_uid = None
+
+    if rizzo_uid is None:
+        rizzo_uid, rizzo_hotkey = _resolve_rizzo_uid_from_bt_11(subtensor, netuid, block)
+        logger.info(f"{log_prefix}: Resolved rizzo uid: {rizzo_uid}")
 
     subtensor_data = SubtensorData(
-        netuid=metagraph.netuid,
-        hotkeys=metagraph.hotkeys,
-        coldkeys=metagraph.coldkeys,
-        block=int(metagraph.block),
-        last_update=metagraph_info.last_update,
-        validator_trust=metagraph.Tv,
+        netuid=netuid,
+        hotkeys=[],
+        coldkeys=[],
+        block=block,
+        last_update=[],
+        validator_trust=[],
+        rizzo_uid=rizzo_uid,
+        rizzo_hotkey=rizzo_hotkey,
+    )
+    if rizzo_uid is None:
+        return subtensor_data
+
+    # LastUpdate and ValidatorTrust are stored as a single vector per subnet
+    # so the whole (small) vector is read rather than the single entry.
+    validator_trust = subtensor.query(
+        bittensor.storage.SubtensorModule.ValidatorTrust,
+        params=[netuid],
+        block=block,
+    )
+    subtensor_data.validator_trust = [
+        (vt / bittensor.settings.U16_MAX) for vt in validator_trust
+    ]
+    subtensor_data.last_update = subtensor.query(
+        bittensor.storage.SubtensorModule.LastUpdate,
+        params=[mechid * bittensor.settings.GLOBAL_MAX_SUBNET_COUNT + netuid],
+        block=block,
     )
 
     return subtensor_data
 
 
-def get_subtensor_data(log_prefix, network, netuid, mechid):
+def _get_netuid_data_func():
     import bittensor
 
     if int(bittensor.__version__.split(".")[0]) >= 11:
-        return get_subtensor_data_from_bt_11(log_prefix, network, netuid, mechid)
+        return _get_netuid_data_from_bt_11
     else:
-        return get_subtensor_data_from_bt_10(log_prefix, network, netuid, mechid)
+        return _get_netuid_data_from_bt_10
+
+
+def enable_persistent_subtensor_connection():
+    # Called in the subtensor worker process when it starts.
+    global _keep_subtensor_connection
+    _keep_subtensor_connection = True
+
+
+def _close_persistent_subtensor():
+    global _persistent_subtensor
+
+    if _persistent_subtensor is None:
+        return
+
+    _, subtensor_context, _ = _persistent_subtensor
+    _persistent_subtensor = None
+    try:
+        subtensor_context.__exit__(None, None, None)
+    except Exception as exc:
+        logger.warning(f"Error closing subtensor connection: {type(exc).__name__}: {exc}")
+
+
+@contextlib.contextmanager
+def _connect_subtensor(log_prefix, network):
+    import bittensor
 
+    global _persistent_subtensor
 
-def write_subtensor_data_to_mp_queue(log_prefix, network, netuid, mechid, mp_queue_name):
-    subtensor_data = get_subtensor_data(log_prefix, network, netuid, mechid)
-    globals()[mp_queue_name].put(subtensor_data)
+    if not _keep_subtensor_connection:
+        logger.info(f"{log_prefix}: Connecting to subtensor network: {network}")
+        with bittensor.Subtensor(network=network) as subtensor:
+            yield subtensor
+        return
 
+    if _persistent_subtensor is not None and _persistent_subtensor[0] != network:
+        _close_persistent_subtensor()
 
-def write_subtensor_data_to_pkl_file(log_prefix, network, netuid, mechid, pickle_file):
-    subtensor_data = get_subtensor_data(log_prefix, network, netuid, mechid)
+    if _persistent_subtensor is None:
+        logger.info(f"{log_prefix}: Connecting to subtensor network: {network}")
+        subtensor_context = bittensor.Subtensor(network=network)
+        subtensor = subtensor_context.__enter__()
+        _persistent_subtensor = (network, subtensor_context, subtensor)
+    else:
+        logger.info(f"{log_prefix}: Reusing subtensor connection: {network}")
+
+    try:
+        yield _persistent_subtensor[2]
+    except Exception:
+        # Don't reuse a connection that may be broken.
+        _close_persistent_subtensor()
+        raise
+
+
+def get_subtensor_data(
+    log_prefix, network, netuid, mechid, storage_only=False, rizzo_uid=None, rizzo_hotkey=None
+):
+    import bittensor
+
+    if storage_only and int(bittensor.__version__.split(".")[0]) < 11:
+        logger.warning(
+            f"{log_prefix}: Storage-only fetch requires bittensor >= 11. "
+            "Fetching the metagraph instead."
+        )
+        storage_only = False
+
+    with _connect_subtensor(log_prefix, network) as subtensor:
+        if storage_only:
+            return _get_rizzo_data_from_bt_11(
+                log_prefix, subtensor, netuid, mechid, rizzo_uid, rizzo_hotkey
+            )
+
+        get_netuid_data = _get_netuid_data_func()
+        return get_netuid_data(subtensor, netuid, [mechid])[mechid]
+
+
+def get_subtensor_snapshot(log_prefix, network, netuid_mechids):
+    # Gets the subtensor data for every netuid/mechid pair over a single
+    # subtensor connection. Returns a dict keyed by (netuid, mechid).
+    get_netuid_data = _get_netuid_data_func()
+
+    snapshot = {}
+    with _connect_subtensor(log_prefix, network) as subtensor:
+        for netuid, mechids in netuid_mechids.items():
+            netuid_data = get_netuid_data(subtensor, netuid, mechids)
+            for mechid, subtensor_data in netuid_data.items():
+                snapshot[(netuid, mechid)] = subtensor_data
+
+    return snapshot
+
+
+def get_subtensor_data_from_daemon(socket_path, netuid, mechid, timeout=10):
+    # Returns a (snapshot_time, subtensor_data) tuple from the subtensor
+    # snapshot daemon. Raises OSError if the daemon is unavailable.
+    request = json.dumps({"netuid": netuid, "mechid": mechid}) + "\n"
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(request.encode())
+        sock.shutdown(socket.SHUT_WR)
+
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+
+    try:
+        return pickle.loads(b"".join(chunks))
+    except (pickle.UnpicklingError, EOFError) as exc:
+        raise OSError(f"Bad response from subtensor daemon: {exc}")
+
+
+def write_subtensor_data_to_pkl_file(
+    log_prefix, network, netuid, mechid, pickle_file, **fetch_kwargs
+):
+    subtensor_data = get_subtensor_data(log_prefix, network, netuid, mechid, **fetch_kwargs)
     logger.info(f"{log_prefix}: Writing pickle file: {pickle_file}")
     with open(pickle_file, "wb") as fp:
         pickle.dump(subtensor_data, fp)
 
 
-class ValidatorCheckerSubtensor(ValidatorChecker):
+def get_shared_subtensor_snapshot():
+    return _shared_subtensor_snapshot
+
+
+def set_shared_subtensor_snapshot(shared_subtensor_snapshot):
+    global _shared_subtensor_snapshot
+    _shared_subtensor_snapshot = shared_subtensor_snapshot
+
+
+# In-process subtensor snapshot shared by the Updated and vTrust checkers of
+# every subnet supervised by a multi-subnet restarter. The first checker that
+# finds the snapshot stale fetches every subnet over a single connection and
+# the other checkers reuse it.
+class SharedSubtensorSnapshot:
+    log_prefix = "SHARED SUBTENSOR"
+
+    _local_subtensors = LOCAL_SUBTENSORS
+
+    def __init__(self, netuid_mechids, worker_max_rss, worker_max_requests):
+        self._netuid_mechids = netuid_mechids
+        self._lock = threading.Lock()
+        self._snapshot = {}
+        self._snapshot_time = 0
+
+        self._subtensor_worker = SubtensorWorker(
+            self.log_prefix,
+            worker_max_rss,
+            worker_max_requests,
+            initializer=enable_persistent_subtensor_connection,
+        )
+
+        random.seed()
+        self._local_subtensor_index = random.randint(0, len(self._local_subtensors) - 1)
+
+    @classmethod
+    def log_info(cls, message):
+        logger.info(f"{cls.log_prefix}: {message}")
+
+    @classmethod
+    def log_error(cls, message):
+        logger.error(f"{cls.log_prefix}: {message}")
+
+    def get(self, netuid, mechid):
+        with self._lock:
+            snapshot_age = time.time() - self._snapshot_time
+            if snapshot_age > SHARED_SUBTENSOR_SNAPSHOT_MAX_AGE:
+                self._update_snapshot()
+            else:
+                self.log_info(f"Reusing subtensor snapshot ({int(snapshot_age)} seconds old).")
+
+            return self._snapshot.get((netuid, mechid))
+
+    def _update_snapshot(self):
+        # Try each local subtensor once. The checkers fetch directly if this fails.
+        for _ in range(len(self._local_subtensors)):
+            network_name = self._local_subtensors[self._local_subtensor_index]
+            network = f"ws://subtensor-{network_name}.rizzo.network:9944"
+
+            args = [self.log_prefix, network, self._netuid_mechids]
+            try:
+                self._snapshot = self._subtensor_worker.apply(
+                    get_subtensor_snapshot, args, timeout=SUBTENSOR_FETCH_TIMEOUT
+                )
+            except (TypeError, ValueError):
+                raise
+            except Exception as err:
+                self.log_error("")
+                self.log_error(f"Subtensor connection failed on '{network}'")
+                self.log_error(f"{type(err).__name__}: {err}")
+                self.log_error("")
+                self.log_error("Rotating subtensors and trying again.")
+                self._local_subtensor_index = \
+                    (self._local_subtensor_index + 1) % len(self._local_subtensors)
+                time.sleep(1)
+            else:
+                self._snapshot_time = time.time()
+                self.log_info(f"Updated subtensor snapshot for {len(self._snapshot)} subnet mechanisms.")
+                return
+
+        self._snapshot = {}
+        self._snapshot_time = 0
+
+
+class ValidatorCheckerSubtensor(ValidatorPeriodicChecker):
     log_prefix = "CHECK SUBTENSOR"
 
-    _local_subtensors = [
-        "cali",
-        "candyland",
-        "datacenter01",
-        "la",
-        "moonbase",
-        "titan",
-    ]
+    _local_subtensors = LOCAL_SUBTENSORS
 
     def __new__(cls, options):
         if cls is not ValidatorCheckerSubtensor:
             return super().__new__(cls)
 
         checker_type = options.checker_type
-        get_method = "PklFile" if options.use_pickle_file else "MpQueue"
+        get_method = "PklFile" if options.use_pickle_file else "SubtensorWorker"
 
         class_name = f"ValidatorChecker{checker_type}{get_method}"
         class_obj = globals()[class_name]
@@ -139,7 +423,7 @@ class ValidatorCheckerSubtensor(ValidatorChecker):
 
         return super().__new__(class_obj)
 
-    def _init_setup(self, *args, **kwargs):
+    def _init_setup(self, options):
         # Start false in case this is added after a manual restart.
         self._check_for_restart = False
 
@@ -147,19 +431,120 @@ class ValidatorCheckerSubtensor(ValidatorChecker):
         random.seed()
         self._local_subtensor_index = random.randint(0, len(self._local_subtensors) - 1)
 
+        # The subtensor snapshot daemon socket. When the daemon is running, the
+        # subtensor data is read from it rather than fetched directly.
+        self._subtensor_daemon_socket = (
+            os.path.expanduser(options.subtensor_daemon_socket)
+            if options.subtensor_daemon_socket else None
+        )
+
+        # The long-lived subprocess in which the subtensor data is fetched.
+        self._subtensor_worker = SubtensorWorker(
+            self.log_prefix,
+            options.subtensor_worker_max_rss,
+            options.subtensor_worker_max_requests,
+            initializer=enable_persistent_subtensor_connection,
+        )
+
+        # When fetching storage-only, the rizzo uid is resolved once and cached.
+        self._storage_only_fetch = options.storage_only_fetch
+        self._rizzo_uid = None
+        self._rizzo_hotkey = None
+
+    def _stop(self):
+        self._subtensor_worker.close()
+
+    def _fetch_subtensor_data(self):
+        subtensor_data = self._get_subtensor_data_from_daemon()
+        if subtensor_data is not None:
+            return subtensor_data
+
+        shared_subtensor_snapshot = get_shared_subtensor_snapshot()
+        if shared_subtensor_snapshot:
+            subtensor_data = shared_subtensor_snapshot.get(self._netuid, self._mechid)
+            if subtensor_data is not None:
+                return subtensor_data
+            self.log_warning(
+                f"Shared subtensor snapshot has no data for subnet {self._netuid}. "
+                "Fetching the subtensor data directly."
+            )
+
+        subtensor_data = self._get_subtensor_data()
+        if subtensor_data and self._storage_only_fetch:
+            self._rizzo_uid = subtensor_data.rizzo_uid
+            self._rizzo_hotkey = subtensor_data.rizzo_hotkey
+
+        return subtensor_data
+
+    def _get_fetch_kwargs(self):
+        if not self._storage_only_fetch:
+            return {}
+
+        return {
+            "storage_only": True,
+            "rizzo_uid": self._rizzo_uid,
+            "rizzo_hotkey": self._rizzo_hotkey,
+        }
+
+    def _get_subtensor_data_from_daemon(self):
+        if not self._subtensor_daemon_socket:
+            return None
+
+        if not os.path.exists(self._subtensor_daemon_socket):
+            self.log_debug(
+                f"Subtensor daemon socket {self._subtensor_daemon_socket} does not exist."
+            )
+            return None
+
+        try:
+            snapshot_time, subtensor_data = get_subtensor_data_from_daemon(
+                self._subtensor_daemon_socket, self._netuid, self._mechid
+            )
+        except OSError as exc:
+            self.log_warning(f"Subtensor daemon is unavailable: {exc}")
+            self.log_warning("Falling back to fetching the subtensor data directly.")
+            return None
+
+        return self._check_subtensor_daemon_data(snapshot_time, subtensor_data)
+
+    def _check_subtensor_daemon_data(self, snapshot_time, subtensor_data):
+        # Returns the subtensor data from the daemon unless it's missing or stale.
+        if subtensor_data is None:
+            self.log_warning(
+                f"Subtensor daemon has no data for subnet {self._netuid} "
+                f"mechid {self._mechid}. Falling back to fetching the "
+                "subtensor data directly."
+            )
+            return None
+
+        snapshot_age = int(time.time() - snapshot_time)
+        if snapshot_age > SUBTENSOR_DAEMON_MAX_AGE:
+            self.log_warning(
+                f"Subtensor daemon data is {snapshot_age} seconds old. "
+                "Falling back to fetching the subtensor data directly."
+            )
+            return None
+
+        self.log_info(
+            f"Got subtensor data from the subtensor daemon ({snapshot_age} seconds old)."
+        )
+        return subtensor_data
+
     def _get_subtensor_data(self, *subprocess_args):
-        # Loop until we get a subtensor connection
-        while True:
-            self._local_subtensor_index = \
-                (self._local_subtensor_index + 1) % len(self._local_subtensors)
+        # Returns the result of the fetch function, or None if it failed on
+        # every local subtensor. The subtensor is only rotated on failure so
+        # the worker process can keep its connection open.
+        for _ in range(len(self._local_subtensors)):
             network_name = self._local_subtensors[self._local_subtensor_index]
             network = f"ws://subtensor-{network_name}.rizzo.network:9944"
 
             get_subtensor_data_func = globals()[self._get_subtensor_data_func]
             args = [self.log_prefix, network, self._netuid, self._mechid, *subprocess_args]
             try:
-                with multiprocessing.Pool(processes=1) as pool:
-                    pool.apply(get_subtensor_data_func, args)
+                return self._subtensor_worker.apply(
+                    get_subtensor_data_func, args, self._get_fetch_kwargs(),
+                    timeout=SUBTENSOR_FETCH_TIMEOUT,
+                )
             except (TypeError, ValueError):
                 raise
             except Exception as err:
@@ -168,11 +553,17 @@ class ValidatorCheckerSubtensor(ValidatorChecker):
                 self.log_error(f"{type(err).__name__}: {err}")
                 self.log_error("")
                 self.log_error("Rotating subtensors and trying again.")
+                self._local_subtensor_index = \
+                    (self._local_subtensor_index + 1) % len(self._local_subtensors)
                 time.sleep(1)
-            else:
-                break
+
+        self.log_error("Subtensor connection failed on every local subtensor.")
+        return None
 
     def _get_rizzo_uid(self, subtensor_data):
+        if subtensor_data.rizzo_uid is not None:
+            return subtensor_data.rizzo_uid
+
         if subtensor_data.netuid in MULTI_UID_HOTKEYS:
             try:
                 return subtensor_data.hotkeys.index(
@@ -187,20 +578,10 @@ class ValidatorCheckerSubtensor(ValidatorChecker):
             return None
 
 
-class ValidatorCheckerMpQueue(ValidatorCheckerSubtensor):
-    _get_subtensor_data_func = "write_subtensor_data_to_mp_queue"
-
-    def _init_setup(self, *args, **kwargs):
-        super()._init_setup(*args, **kwargs)
-
-        # Create the multiprocessing queue for passing the subtensor data
-        # from the subprocess back to the main process.
-        globals()[self._mp_queue_name] = multiprocessing.Queue()
-
-    def _get_subtensor_data(self):
-        super()._get_subtensor_data(self._mp_queue_name)
-
-        return globals()[self._mp_queue_name].get()
+# The subtensor data is returned over the checker's own subtensor worker
+# pipe, so the checkers of different subnets never share a queue.
+class ValidatorCheckerSubtensorWorker(ValidatorCheckerSubtensor):
+    _get_subtensor_data_func = "get_subtensor_data"
 
 
 class ValidatorCheckerPklFile(ValidatorCheckerSubtensor):
@@ -213,10 +594,13 @@ class ValidatorCheckerPklFile(ValidatorCheckerSubtensor):
         try:
             super()._get_subtensor_data(pickle_file)
 
-            # read pickle file
+            # read pickle file. It's left empty if the fetch failed.
             if not os.path.isfile(pickle_file):
                 self.log_error(f"Pickle file {pickle_file} does not exist, could not get subtensor data.")
                 return None
+            if not os.path.getsize(pickle_file):
+                self.log_error(f"Pickle file {pickle_file} is empty, could not get subtensor data.")
+                return None
 
             self.log_info(f"Reading pickle file: {pickle_file}")
             with open(pickle_file, "rb") as fp:
@@ -239,76 +623,115 @@ class ValidatorCheckerUpdated(ValidatorCheckerSubtensor):
         # Set the mechanism to check
         self._mechid = options.updated_mechid
 
-    def _run(self):
+        # The shared new heads subscription, if enabled, used to schedule the
+        # next check.
+        self._use_block_feed = options.block_feed
+        self._block_feed = None
+
+    def _start(self):
+        if self._use_block_feed:
+            self._block_feed = get_block_feed()
+            if self._block_feed is None:
+                self.log_warning(
+                    "Could not import the websockets python module. Scheduling the "
+                    "Updated checks without the block feed."
+                )
+
         self.log_info("")
         self.log_info("Checking for high Updated values.")
         self.log_info("")
 
-        default_sleep_time = 4320  # 360 blocks
+        return True
 
-        while True:
-            subtensor_data = self._get_subtensor_data()
-            if not subtensor_data:
-                self.log_error(
-                    "Could not get subtensor. Not checking Updated value. "
-                )
-                send_monitor_notification(
-                    self.log_prefix,
-                    f"{RED_X} Failed to check updated value on subnet {self._netuid}"
-                )
-                self.log_info(f"Sleeping for {default_sleep_time} seconds.")
-                time.sleep(default_sleep_time)
-                continue
+    def _check(self):
+        subtensor_data = self._fetch_subtensor_data()
+        restart_description, sleep_interval = self._check_subtensor_data(subtensor_data)
+        if restart_description:
+            self._restart_validator(restart_description)
 
-            rizzo_uid = self._get_rizzo_uid(subtensor_data)
-            if rizzo_uid is None:
-                self.log_warning(
-                    f"Rizzo validator not running for subnet {self._netuid}. "
-                )
-                self.log_info(f"Sleeping for {default_sleep_time} seconds.")
-                time.sleep(default_sleep_time)
-                continue
-
-            rizzo_updated = int(
-                subtensor_data.block - subtensor_data.last_update[rizzo_uid])
-            self.log_info("")
-            self.log_info(f"Rizzo Updated on mechid {self._mechid} is {rizzo_updated} blocks.")
-
-            if self._check_for_restart:
-                # If the rizzo updated value is greater than the restart threshold
-                # the do a restart and set _check_for_restart to False.
-                self.log_info("Updated value check for restart is True.")
-                if rizzo_updated >= self._restart_threshold:
-                    self.log_info(f"Updated value {rizzo_updated} "
-                                   f">= {self._restart_threshold}")
-                    self._restart_validator(f"Updated value is {rizzo_updated}")
-                    self.log_info("Setting check for restart to False.")
-                    self._check_for_restart = False
-                else:
-                    self.log_info(f"Updated value {rizzo_updated} "
-                                   f"< {self._restart_threshold}")
-                    self.log_info("Doing nothing.")
+        return sleep_interval
+
+    def _check_subtensor_data(self, subtensor_data):
+        # Returns the restart description, if a restart is needed, and the
+        # number of seconds until the next check.
+        default_sleep_time = 4320  # 360 blocks
+
+        if not subtensor_data:
+            self.log_error(
+                "Could not get subtensor. Not checking Updated value. "
+            )
+            send_monitor_notification(
+                self.log_prefix,
+                f"{RED_X} Failed to check updated value on subnet {self._netuid}"
+            )
+            return None, default_sleep_time
+
+        rizzo_uid = self._get_rizzo_uid(subtensor_data)
+        if rizzo_uid is None:
+            self.log_warning(
+                f"Rizzo validator not running for subnet {self._netuid}. "
+            )
+            return None, default_sleep_time
+
+        rizzo_updated = int(
+            subtensor_data.block - subtensor_data.last_update[rizzo_uid])
+        self.log_info("")
+        self.log_info(f"Rizzo Updated on mechid {self._mechid} is {rizzo_updated} blocks.")
+
+        restart_description = None
+        if self._check_for_restart:
+            # If the rizzo updated value is greater than the restart threshold
+            # the do a restart and set _check_for_restart to False.
+            self.log_info("Updated value check for restart is True.")
+            if rizzo_updated >= self._restart_threshold:
+                self.log_info(f"Updated value {rizzo_updated} "
+                               f">= {self._restart_threshold}")
+                restart_description = f"Updated value is {rizzo_updated}"
+                self.log_info("Setting check for restart to False.")
+                self._check_for_restart = False
+            else:
+                self.log_info(f"Updated value {rizzo_updated} "
+                               f"< {self._restart_threshold}")
+                self.log_info("Doing nothing.")
+        else:
+            # If the rizzo updated value is less than the restart threshold
+            # then set _check_for_restart to True.
+            self.log_info("Updated value Check for restart is False.")
+            if rizzo_updated < self._restart_threshold:
+                self.log_info(f"Updated value {rizzo_updated} "
+                               f"< {self._restart_threshold}")
+                self.log_info("Setting check for restart to True.")
+                self._check_for_restart = True
             else:
-                # If the rizzo updated value is less than the restart threshold
-                # then set _check_for_restart to True.
-                self.log_info("Updated value Check for restart is False.")
-                if rizzo_updated < self._restart_threshold:
-                    self.log_info(f"Updated value {rizzo_updated} "
-                                   f"< {self._restart_threshold}")
-                    self.log_info("Setting check for restart to True.")
-                    self._check_for_restart = True
-                else:
-                    self.log_info(f"Updated value {rizzo_updated} "
-                                   f">= {self._restart_threshold}")
-                    self.log_info("Doing nothing.")
-
-            seconds_until_threshold = \
-                (self._restart_threshold - rizzo_updated) * 12
-            sleep_interval = (seconds_until_threshold
-                              if seconds_until_threshold > 0
-                              else default_sleep_time)
-            self.log_info(f"Sleeping for {sleep_interval} seconds.")
-            time.sleep(sleep_interval)
+                self.log_info(f"Updated value {rizzo_updated} "
+                               f">= {self._restart_threshold}")
+                self.log_info("Doing nothing.")
+
+        seconds_until_threshold = self._get_seconds_until_threshold(
+            subtensor_data, subtensor_data.last_update[rizzo_uid])
+        sleep_interval = (seconds_until_threshold
+                          if seconds_until_threshold > 0
+                          else default_sleep_time)
+
+        return restart_description, sleep_interval
+
+    def _get_seconds_until_threshold(self, subtensor_data, rizzo_last_update):
+        # Without the block feed this assumes the data is from the current
+        # block and 12 second blocks. With it, the time is counted from the
+        # chain head, as the data may be from an older snapshot, using the
+        # measured block time.
+        block = self._block_feed.get_block() if self._block_feed else None
+        if block is None:
+            return (self._restart_threshold - int(subtensor_data.block - rizzo_last_update)) * 12
+
+        current_block = max(block.number, subtensor_data.block)
+        block_time = self._block_feed.get_block_time()
+        blocks_until_threshold = self._restart_threshold - int(current_block - rizzo_last_update)
+        self.log_info(
+            f"Block feed is at block {block.number} with {block_time:.2f} second blocks. "
+            f"{blocks_until_threshold} blocks until the Updated threshold."
+        )
+        return blocks_until_threshold * block_time
 
 
 class ValidatorCheckerVTrust(ValidatorCheckerSubtensor):
@@ -324,84 +747,95 @@ class ValidatorCheckerVTrust(ValidatorCheckerSubtensor):
         # This is always 0 because the vTrust is the same across all mechanisms.
         self._mechid = 0
 
-    def _run(self):
+    def _start(self):
         self.log_info("")
         self.log_info("Checking for low vTrust values.")
         self.log_info("")
 
+        return True
+
+    def _check(self):
+        subtensor_data = self._fetch_subtensor_data()
+        restart_description, sleep_interval = self._check_subtensor_data(subtensor_data)
+        if restart_description:
+            self._restart_validator(restart_description)
+
+        return sleep_interval
+
+    def _check_subtensor_data(self, subtensor_data):
+        # Returns the restart description, if a restart is needed, and the
+        # number of seconds until the next check.
         sleep_interval = 4320  # 360 blocks
 
-        while True:
-            subtensor_data = self._get_subtensor_data()
-            if not subtensor_data:
-                self.log_error(
-                    "Could not get subtensor. Not checking vTrust value. "
-                )
-                send_monitor_notification(
-                    self.log_prefix,
-                    f"{RED_X} Failed to check vTrust value on subnet {self._netuid}"
-                )
-                self.log_info(f"Sleeping for {sleep_interval} seconds.")
-                time.sleep(sleep_interval)
-                continue
+        if not subtensor_data:
+            self.log_error(
+                "Could not get subtensor. Not checking vTrust value. "
+            )
+            send_monitor_notification(
+                self.log_prefix,
+                f"{RED_X} Failed to check vTrust value on subnet {self._netuid}"
+            )
+            return None, sleep_interval
+
+        rizzo_uid = self._get_rizzo_uid(subtensor_data)
+        if rizzo_uid is None:
+            self.log_warning(
+                f"Rizzo validator not running for subnet {self._netuid}. "
+            )
+            return None, sleep_interval
+
+        rizzo_vtrust = subtensor_data.validator_trust[rizzo_uid]
+        vtrust_str = f"{rizzo_vtrust:.5f}"
 
-            rizzo_uid = self._get_rizzo_uid(subtensor_data)
-            if rizzo_uid is None:
-                self.log_warning(
-                    f"Rizzo validator not running for subnet {self._netuid}. "
-                )
-                self.log_info(f"Sleeping for {sleep_interval} seconds.")
-                time.sleep(sleep_interval)
-                continue
-
-            rizzo_vtrust = subtensor_data.validator_trust[rizzo_uid]
-            vtrust_str = f"{rizzo_vtrust:.5f}"
-
-            self.log_info("")
-            self.log_info(f"Rizzo vTrust is {vtrust_str}")
-
-            if self._check_for_restart:
-                # If the rizzo vTrust value is less than the restart threshold
-                # the do a restart and set _check_for_restart to False.
-                self.log_info("vTrust value check for restart is True.")
-                if rizzo_vtrust < self._restart_threshold:
-                    self.log_info(f"vTrust value {vtrust_str} "
-                                   f"< {self._restart_threshold}")
-                    self._restart_validator(f"vTrust value is {vtrust_str}")
-                    self.log_info("Setting check for restart to False.")
-                    self._check_for_restart = False
-                else:
-                    self.log_info(f"vTrust value {vtrust_str} "
-                                   f">= {self._restart_threshold}")
-                    self.log_info("Doing nothing.")
+        self.log_info("")
+        self.log_info(f"Rizzo vTrust is {vtrust_str}")
+
+        restart_description = None
+        if self._check_for_restart:
+            # If the rizzo vTrust value is less than the restart threshold
+            # the do a restart and set _check_for_restart to False.
+            self.log_info("vTrust value check for restart is True.")
+            if rizzo_vtrust < self._restart_threshold:
+                self.log_info(f"vTrust value {vtrust_str} "
+                               f"< {self._restart_threshold}")
+                restart_description = f"vTrust value is {vtrust_str}"
+                self.log_info("Setting check for restart to False.")
+                self._check_for_restart = False
+            else:
+                self.log_info(f"vTrust value {vtrust_str} "
+                               f">= {self._restart_threshold}")
+                self.log_info("Doing nothing.")
+        else:
+            # If the rizzo vTrust value is greater than the restart threshold
+            # then set _check_for_restart to True.
+            self.log_info("vTrust value Check for restart is False.")
+            if rizzo_vtrust >= self._restart_threshold:
+                self.log_info(f"vTrust value {vtrust_str} "
+                               f">= {self._restart_threshold}")
+                self.log_info("Setting check for restart to True.")
+                self._check_for_restart = True
             else:
-                # If the rizzo vTrust value is greater than the restart threshold
-                # then set _check_for_restart to True.
-                self.log_info("vTrust value Check for restart is False.")
-                if rizzo_vtrust >= self._restart_threshold:
-                    self.log_info(f"vTrust value {vtrust_str} "
-                                   f">= {self._restart_threshold}")
-                    self.log_info("Setting check for restart to True.")
-                    self._check_for_restart = True
-                else:
-                    self.log_info(f"vTrust value {vtrust_str} "
-                                   f"< {self._restart_threshold}")
-                    self.log_info("Doing nothing.")
+                self.log_info(f"vTrust value {vtrust_str} "
+                               f"< {self._restart_threshold}")
+                self.log_info("Doing nothing.")
 
-            self.log_info(f"Sleeping for {sleep_interval} seconds.")
-            time.sleep(sleep_interval)
+        return restart_description, sleep_interval
 
 
-class ValidatorCheckerUpdatedMpQueue(ValidatorCheckerMpQueue, ValidatorCheckerUpdated):
-    _mp_queue_name = "UPDATED_MP_QUEUE"
+class ValidatorCheckerUpdatedSubtensorWorker(
+    ValidatorCheckerSubtensorWorker, ValidatorCheckerUpdated
+):
+    pass
 
 
 class ValidatorCheckerUpdatedPklFile(ValidatorCheckerPklFile, ValidatorCheckerUpdated):
     _pickle_file_name = "subtensor_updated"
 
 
-class ValidatorCheckerVTrustMpQueue(ValidatorCheckerMpQueue, ValidatorCheckerVTrust):
-    _mp_queue_name = "VTRUST_MP_QUEUE"
+class ValidatorCheckerVTrustSubtensorWorker(
+    ValidatorCheckerSubtensorWorker, ValidatorCheckerVTrust
+):
+    pass
 
 
 class ValidatorCheckerVTrustPklFile(ValidatorCheckerPklFile, ValidatorCheckerVTrust):
@@ -1,20 +1,17 @@
-# Standard imports
-import time
-
 # Local imports
-from .checker_base import ValidatorChecker
+from .checker_base import ValidatorPeriodicChecker
 from .constants import RED_X
 from .utils import send_monitor_notification
 
 
-class ValidatorCheckerSystemMemory(ValidatorChecker):
+class ValidatorCheckerSystemMemory(ValidatorPeriodicChecker):
     log_prefix = "CHECK SYSTEM MEMORY"
 
     def _init_setup(self, options):    
         # Set restart threshold
         self._restart_threshold = options.mem_threshold
 
-    def _run(self):
+    def _start(self):
         try:
             import psutil
         except ImportError:
@@ -23,23 +20,32 @@ class ValidatorCheckerSystemMemory(ValidatorChecker):
                 self.log_prefix,
                 f"{RED_X} Failed to run system memory checker on subnet {self._netuid}. No psutil module."
             )
-            return
+            return False
+
+        self._psutil = psutil
 
         self.log_info("")
         self.log_info("Checking for high system memory.")
         self.log_info("")
 
-        while True:
-            memory_used = psutil.virtual_memory().percent
-            self.log_info(f"System memory usage is {memory_used}%.")
+        return True
+
+    def _check(self):
+        memory_used = self._psutil.virtual_memory().percent
+        restart_description = self._check_memory_used(memory_used)
+        if restart_description:
+            self._restart_validator(restart_description)
+
+        return 600  # 10 minutes
+
+    def _check_memory_used(self, memory_used):
+        # Returns the restart description if a restart is needed.
+        self.log_info(f"System memory usage is {memory_used}%.")
 
-            if memory_used >= self._restart_threshold:
-                self.log_info(f"{memory_used}% memory usage >= {self._restart_threshold}%.")
-                self._restart_validator(f"System memory usage is {memory_used}%.")
-            else:
-                self.log_info(f"{memory_used}% memory usage < {self._restart_threshold}%.")
-                self.log_info("Doing nothing.")
+        if memory_used >= self._restart_threshold:
+            self.log_info(f"{memory_used}% memory usage >= {self._restart_threshold}%.")
+            return f"System memory usage is {memory_used}%."
 
-            sleep_interval = 600  # 10 minutes
-            self.log_info(f"Sleeping for {sleep_interval} seconds.")
-            time.sleep(sleep_interval)
+        self.log_info(f"{memory_used}% memory usage < {self._restart_threshold}%.")
+        self.log_info("Doing nothing.")
+        return None
@@ -8,6 +8,9 @@ DEFAULT_VTRUST_THRESHOLD = 0.01
 DEFAULT_MEM_THRESHOLD = 95  # percentage of total memory used
 DEFAULT_STOPPED_LOGS_THRESHOLD = 30
 DEFAULT_LOG_ERRORS_RESTART_WAIT_TIME = 3
+DEFAULT_RESTART_TIMEOUT = 10  # minutes
+DEFAULT_SUBTENSOR_WORKER_MAX_RSS = 1024  # MB
+DEFAULT_SUBTENSOR_WORKER_MAX_REQUESTS = 100
 
 RESTARTER_PREFIX = "RESTARTER"
 
@@ -27,7 +30,86 @@ DISCORD_MONITOR_GIT_REPO_URL = (
     "w8R4RQ33Obr2jQt_uDc4_4m3umeKZqXQ2vIFtKp6NPg4CiMY5j477m8BvzD9XbQQ2nXx"
 )
 
-RESTARTER_GIT_PATHS = ["bin/restart_bad_validator", "restarter"]
+RESTARTER_GIT_PATHS = ["bin/restart_bad_validator", "bin/restart_host_validators", "restarter"]
+RESTARTER_UPDATE_INTERVAL = 3600  # 1 hour
+RESTARTER_UPDATE_STATE_FILE = "~/.restarter/restarter_update.json"  # Shared by the restarters on a host
+
+LOCAL_SUBTENSORS = [
+    "cali",
+    "candyland",
+    "datacenter01",
+    "la",
+    "moonbase",
+    "titan",
+]
+
+# Subtensor snapshot daemon
+SUBTENSOR_DAEMON_SOCKET = "~/.restarter/subtensor_daemon.sock"
+SUBTENSOR_DAEMON_INTERVAL = 12  # 1 block
+SUBTENSOR_DAEMON_MAX_AGE = 300  # Snapshots older than this (in seconds) are ignored
+
+# New heads subscription
+BLOCK_FEED_OPEN_TIMEOUT = 10  # seconds
+BLOCK_FEED_STALL_TIMEOUT = 60  # Resubscribe on another subtensor after this many seconds without a new head
+BLOCK_FEED_RECONNECT_INTERVAL = 5  # seconds
+BLOCK_FEED_BLOCK_TIME_WINDOW = 100  # Blocks over which the block time is measured
+
+# Burn and weight copy subnet parameter cache
+SUBNET_PARAMS_CACHE_DIR = "~/.bittensor/subnet_params_cache"
+SUBNET_PARAMS_CACHE_TTL = 720  # blocks
+SUBNET_PARAMS_INVALIDATING_ERRORS = (
+    "IncorrectWeightVersionKey",
+    "MaxWeightExceeded",
+    "NotSettingEnoughWeights",
+    "WeightVecLengthIsLow",
+    "TooManyUids",
+    "MechanismDoesNotExist",
+)  # Weight setting errors caused by a cached parameter that changed
+
+# Multi-subnet restarter
+HOST_CONFIG_FILE = "~/restarter_host_config.json"
+SHARED_SUBTENSOR_SNAPSHOT_MAX_AGE = 60  # seconds
+
+# Periodic checker scheduler
+SCHEDULER_START_JITTER = 10  # Checkers start at random offsets within this many seconds
+SCHEDULER_MAX_WORKERS = 8  # Threads running the periodic checks
+
+# Bounds on the calls a periodic check can block on, so a check always
+# returns its scheduler worker
+SUBTENSOR_FETCH_TIMEOUT = 120  # Per subtensor worker request, in seconds
+GIT_COMMAND_TIMEOUT = 300  # seconds
+
+# Log output reading
+LOG_READ_CHUNK_SIZE = 256 * 1024  # bytes
+LOG_LINE_MAX_LENGTH = 1024 * 1024  # Longer log lines are skipped, in bytes
+LOG_TAILER_POLL_INTERVAL = 5  # Rescan the log files at least this often, in seconds
+LOG_MATCHER_BENCHMARK_LINES = 100000  # Lines matched to measure the throughput in debug mode
+
+# Docker log stream
+DOCKER_LOG_STREAM_RECONNECT_INTERVAL = 5  # seconds
+
+# pm2 inventory
+PM2_INVENTORY_TTL = 30  # Reload pm2 jlist at least this often, in seconds
+PM2_DEFAULT_HOME = "~/.pm2"  # Used when PM2_HOME isn't set
+
+# Discord notifications
+NOTIFIER_COALESCE_WINDOW = 2  # Notifications queued within this many seconds are sent together
+NOTIFIER_MAX_RETRIES = 5
+NOTIFIER_RETRY_BACKOFF = 1  # First retry delay, doubled on each retry, in seconds
+NOTIFIER_RETRY_MAX_DELAY = 60  # seconds
+NOTIFIER_TIMEOUT = 10  # HTTP request timeout, in seconds
+NOTIFIER_EXIT_FLUSH_TIMEOUT = 15  # Time to finish sending queued notifications at exit, in seconds
+DISCORD_MESSAGE_MAX_LENGTH = 2000  # characters
+
+# Restart script
+RESTART_OUTPUT_DRAIN_TIMEOUT = 1  # Time to finish logging the output once the script exits, in seconds
+
+# Metrics endpoint
+METRICS_HOST = "127.0.0.1"
+METRICS_BATCH_MATCH_BUCKETS = (
+    0.00001, 0.000025, 0.0001, 0.00025, 0.001, 0.0025, 0.01, 0.025, 0.1,
+)  # seconds
+METRICS_RESTART_DURATION_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600)  # seconds
 
 # Debugging
 DEBUG = False
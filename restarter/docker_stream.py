@@ -0,0 +1,241 @@
+# Standard imports
+import calendar
+import re
+import threading
+import time
+
+# Local imports
+from .constants import DOCKER_LOG_STREAM_RECONNECT_INTERVAL
+from .log_tailer import LogLineBatcher
+from .utils import logger
+
+# With timestamps=True docker prefixes every line with an RFC3339Nano UTC
+# timestamp and a space.
+_TIMESTAMP_PREFIX_REGEX = re.compile(rb"^\S+ ", re.MULTILINE)
+
+# The connection states of a docker log stream
+STREAM_CONNECTING = "connecting"
+STREAM_FOLLOWING = "following"
+STREAM_CONTAINER_NOT_FOUND = "container not found"
+STREAM_DISCONNECTED = "disconnected"
+
+_docker_log_streams = {}
+_docker_log_streams_lock = threading.Lock()
+
+
+def get_docker_log_stream(docker_container):
+    # Returns the shared log stream for the container, starting it on first
+    # use, or None if the docker python module isn't installed.
+    try:
+        import docker
+    except ImportError:
+        return None
+
+    with _docker_log_streams_lock:
+        log_stream = _docker_log_streams.get(docker_container)
+        if log_stream is None:
+            log_stream = DockerLogStream(docker, docker_container)
+            log_stream.start()
+            _docker_log_streams[docker_container] = log_stream
+        return log_stream
+
+
+def _parse_timestamp(timestamp):
+    # Returns a docker log timestamp, e.g. 2025-01-01T00:00:00.123456789Z,
+    # as integer nanoseconds since the epoch, or None if it isn't one.
+    seconds, _, fraction = timestamp.rstrip(b"Z").partition(b".")
+    try:
+        epoch_seconds = calendar.timegm(time.strptime(seconds.decode(), "%Y-%m-%dT%H:%M:%S"))
+        return epoch_seconds * 1_000_000_000 + int(fraction[:9].ljust(9, b"0") or b"0")
+    except ValueError:
+        return None
+
+
+# Follows a container's logs through the docker API from a single thread and
+# hands the blocks of log lines to every listener, e.g. the docker log output
+# checker. The timestamp of the last log line is kept so the docker stopped
+# logs checker can read it from memory instead of querying docker.
+#
+# The timestamp of the last line received is also the cursor the stream
+# resumes from when it reconnects, e.g. after the container restarts. The
+# docker "since" filter includes lines at the cursor time, so the lines that
+# were already received with that exact timestamp are skipped.
+#
+# The connection state is kept too, with the time the stream went down, so
+# the stopped logs checker doesn't count the time the container was missing
+# or the stream was disconnected as time without log output. The down time
+# is only cleared once a line is received again, so a container that keeps
+# exiting right after the stream connects still counts as down.
+class DockerLogStream:
+    log_prefix = "DOCKER LOG STREAM"
+
+    def __init__(self, docker, docker_container):
+        self._docker = docker
+        self._docker_container = docker_container
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._batcher = LogLineBatcher()
+
+        # The resume cursor: the timestamp of the last line received, in
+        # nanoseconds, and how many lines were received with that timestamp.
+        self._cursor_time = None
+        self._cursor_count = 0
+        self._skip_count = 0
+
+        self._state = STREAM_CONNECTING
+        self._down_time = None  # time.time() the stream went down
+
+    @classmethod
+    def log_info(cls, message):
+        logger.info(f"{cls.log_prefix}: {message}")
+
+    @classmethod
+    def log_warning(cls, message):
+        logger.warning(f"{cls.log_prefix}: {message}")
+
+    def add_listener(self, listener):
+        # The listener is called from the stream thread with each block of
+        # complete log lines, without the docker timestamps.
+        with self._lock:
+            self._listeners.append(listener)
+
+    def get_last_log_time(self):
+        # Returns the time of the last log line in seconds, or None if no
+        # log line has been received yet.
+        with self._lock:
+            if self._cursor_time is None:
+                return None
+            return self._cursor_time / 1_000_000_000
+
+    def get_state(self):
+        # Returns the connection state and the time the stream went down,
+        # or None if it has received a line since.
+        with self._lock:
+            return self._state, self._down_time
+
+    def _set_state(self, state):
+        with self._lock:
+            self._state = state
+            if state in (STREAM_CONTAINER_NOT_FOUND, STREAM_DISCONNECTED) and self._down_time is None:
+                self._down_time = time.time()
+
+    def start(self):
+        stream_thread = threading.Thread(target=self._run, daemon=True)
+        stream_thread.start()
+
+    def _run(self):
+        client = self._docker.from_env()
+        while True:
+            try:
+                self._follow_logs(client)
+            except Exception as exc:
+                self.log_warning(f"'{self._docker_container}' log stream failed: {exc}")
+                self._set_state(STREAM_DISCONNECTED)
+
+            self.log_info(
+                f"'{self._docker_container}' log stream ended. "
+                f"Reconnecting in {DOCKER_LOG_STREAM_RECONNECT_INTERVAL} seconds."
+            )
+            time.sleep(DOCKER_LOG_STREAM_RECONNECT_INTERVAL)
+
+    def _follow_logs(self, client):
+        # Get the docker container each time in case it was recreated.
+        try:
+            container = client.containers.get(self._docker_container)
+        except self._docker.errors.NotFound:
+            self.log_warning(f"Could not find '{self._docker_container}' docker container.")
+            self._set_state(STREAM_CONTAINER_NOT_FOUND)
+            return
+
+        if self._cursor_time is None:
+            self._set_initial_cursor(container)
+
+        if self._cursor_time is None:
+            log_chunks = container.logs(stream=True, follow=True, timestamps=True)
+        else:
+            # The float "since" may be rounded past the cursor, so start a
+            # microsecond early. Anything already received is skipped.
+            since = (self._cursor_time - 1000) / 1_000_000_000
+            log_chunks = container.logs(stream=True, follow=True, timestamps=True, since=since)
+
+        self.log_info(f"Following '{self._docker_container}' logs.")
+        self._set_state(STREAM_FOLLOWING)
+        self._batcher.clear()
+        resuming = self._cursor_time is not None
+        self._skip_count = self._cursor_count
+        try:
+            for chunk in log_chunks:
+                batch = self._batcher.add(chunk)
+                if not batch:
+                    continue
+
+                if resuming:
+                    batch, resuming = self._skip_received_lines(batch)
+                    if not batch:
+                        continue
+
+                self._dispatch_batch(batch)
+        finally:
+            log_chunks.close()
+            self._set_state(STREAM_DISCONNECTED)
+
+    def _set_initial_cursor(self, container):
+        # Start from the container's last log line so only new lines are
+        # streamed and the stopped logs checker has a time to check.
+        last_line = container.logs(timestamps=True, tail=1)
+        timestamp, _, _ = last_line.partition(b" ")
+        if not timestamp:
+            return
+
+        with self._lock:
+            self._cursor_time = _parse_timestamp(timestamp)
+            self._cursor_count = 1 if self._cursor_time is not None else 0
+
+    def _skip_received_lines(self, batch):
+        # Skips the lines at or before the cursor, which were received before
+        # reconnecting. Returns the rest of the batch and whether the stream is
+        # still resuming, i.e. no line after the cursor has been seen yet.
+        position = 0
+        while position < len(batch):
+            line_end = batch.index(b"\n", position) + 1
+            timestamp, _, _ = batch[position:line_end].partition(b" ")
+            line_time = _parse_timestamp(timestamp)
+            if (
+                line_time is None or line_time > self._cursor_time or
+                (line_time == self._cursor_time and self._skip_count <= 0)
+            ):
+                return batch[position:], False
+            if line_time == self._cursor_time:
+                self._skip_count -= 1
+            position = line_end
+
+        return b"", True
+
+    def _dispatch_batch(self, batch):
+        # Update the cursor from the last lines of the batch.
+        last_line_start = batch.rfind(b"\n", 0, len(batch) - 1) + 1
+        last_time = _parse_timestamp(batch[last_line_start:].partition(b" ")[0])
+
+        same_time_count = 1
+        line_end = last_line_start
+        while line_end > 0:
+            line_start = batch.rfind(b"\n", 0, line_end - 1) + 1
+            if _parse_timestamp(batch[line_start:line_end].partition(b" ")[0]) != last_time:
+                break
+            same_time_count += 1
+            line_end = line_start
+
+        with self._lock:
+            self._down_time = None
+            if last_time is None:
+                pass
+            elif last_time == self._cursor_time:
+                self._cursor_count += same_time_count
+            else:
+                self._cursor_time = last_time
+                self._cursor_count = same_time_count
+            listeners = list(self._listeners)
+
+        batch = _TIMESTAMP_PREFIX_REGEX.sub(b"", batch)
+        for listener in listeners:
+            listener(batch)
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+# Standard imports
+from dataclasses import dataclass
+import re
+import time
+
+# Local imports
+from .constants import (
+    BLACKLIST_EXCLUDE_HOTKEY_REGEXES,
+    BLACKLIST_EXCLUDE_MATCH_REGEXES,
+    BLACKLIST_EXCLUDE_SEARCH_REGEXES,
+    BLACKLIST_REGEXES,
+)
+
+_NAMED_GROUP_REGEX = re.compile(r"\(\?P<(?P<name>\w+)>")
+_NAMED_BACKREF_REGEX = re.compile(r"\(\?P=(?P<name>\w+)\)")
+_NUMBERED_BACKREF_REGEX = re.compile(r"\\[1-9]")
+
+
+def _get_alternative(group_name, pattern, flags=0):
+    # Wraps the pattern in a named group so the combined regex reports which
+    # pattern fired. Named groups inside the pattern are prefixed with the
+    # group name so they stay unique across the alternation.
+    pattern = _NAMED_GROUP_REGEX.sub(
+        lambda m: f"(?P<{group_name}_{m.group('name')}>", pattern
+    )
+    pattern = _NAMED_BACKREF_REGEX.sub(
+        lambda m: f"(?P={group_name}_{m.group('name')})", pattern
+    )
+    if flags & re.IGNORECASE:
+        pattern = f"(?i:{pattern})"
+    return f"(?P<{group_name}>{pattern})"
+
+
+def _can_combine(pattern):
+    # Numbered backreferences would point at the wrong group once combined.
+    return not _NUMBERED_BACKREF_REGEX.search(pattern)
+
+
+class _PatternSet:
+    # A list of patterns searched with a single combined regex.
+
+    def __init__(self, category, patterns):
+        # patterns is a list of (pattern, flags) tuples.
+        self.category = category
+        self.patterns = [pattern for pattern, _ in patterns]
+        self.alternatives = [
+            _get_alternative(self.get_group_name(index), pattern, flags)
+            for index, (pattern, flags) in enumerate(patterns)
+        ]
+        self.combinable = all(_can_combine(pattern) for pattern in self.patterns)
+
+        if self.combinable:
+            self._regexes = None
+            self._regex = re.compile("|".join(self.alternatives)) if self.alternatives else None
+        else:
+            self._regexes = [re.compile(pattern, flags) for pattern, flags in patterns]
+            self._regex = None
+
+    def get_group_name(self, index):
+        return f"{self.category}{index}"
+
+    def get_index(self, group_name):
+        return int(group_name[len(self.category):])
+
+    def search(self, log_line):
+        # Returns the match and the index of the pattern that matched.
+        if self._regexes is not None:
+            for index, regex in enumerate(self._regexes):
+                match = regex.search(log_line)
+                if match:
+                    return match, index
+            return None, None
+
+        if self._regex is None:
+            return None, None
+
+        match = self._regex.search(log_line)
+        if not match:
+            return None, None
+
+        group_name = match.lastgroup
+        return match, self.get_index(group_name)
+
+    def get_group(self, match, index, name):
+        # Gets a named group from inside a pattern in the combined regex.
+        if self._regexes is not None:
+            return match.group(name)
+        return match.group(f"{self.get_group_name(index)}_{name}")
+
+    def get_matched_text(self, match, index):
+        if self._regexes is not None:
+            return match.group()
+        return match.group(self.get_group_name(index))
+
+
+@dataclass
+class LogLineMatch:
+    restart_pattern: str | None = None
+    blacklisted: bool = False
+
+
+# Classifies log lines against the restart patterns and the blacklist
+# patterns. Both sets are compiled into a single alternation with a named
+# group per pattern so the common case of a line matching nothing takes a
+# single regex scan. Lines that do match a blacklist pattern are checked
+# against the blacklist exclude patterns, which are also combined into a
+# single alternation.
+#
+# The alternation is also compiled as a bytes regex so a whole block of raw
+# log output can be scanned at once with match_batch(). Only the lines it
+# hits are decoded and classified.
+class LogLineMatcher:
+    def __init__(self, restart_patterns, check_restart=True, check_blacklist=True):
+        self._restart_set = _PatternSet(
+            "r", [(pattern, 0) for pattern in restart_patterns] if check_restart else []
+        )
+        self._blacklist_set = _PatternSet(
+            "b", list(BLACKLIST_REGEXES) if check_blacklist else []
+        )
+
+        # The exclude match patterns must match the whole line.
+        self._blacklist_exclude_set = _PatternSet(
+            "x",
+            [(pattern, 0) for pattern in BLACKLIST_EXCLUDE_SEARCH_REGEXES]
+            + [(f"^(?:{pattern})$", 0) for pattern in BLACKLIST_EXCLUDE_MATCH_REGEXES]
+        )
+        self._blacklist_exclude_hotkey_set = _PatternSet(
+            "k", [(pattern, 0) for pattern in BLACKLIST_EXCLUDE_HOTKEY_REGEXES]
+        )
+
+        alternatives = self._restart_set.alternatives + self._blacklist_set.alternatives
+        self._has_patterns = bool(alternatives)
+
+        self._combined_regex = None
+        self._batch_regex = None
+        if self._restart_set.combinable and self._blacklist_set.combinable and alternatives:
+            combined_pattern = "|".join(alternatives)
+            self._combined_regex = re.compile(combined_pattern)
+
+            # MULTILINE makes ^ and $ match at the line boundaries within a
+            # batch. Non-ASCII patterns can't be matched against the raw bytes.
+            if combined_pattern.isascii():
+                self._batch_regex = re.compile(combined_pattern.encode(), re.MULTILINE)
+
+    def match(self, log_line):
+        if self._combined_regex is None:
+            return self._match_separately(log_line)
+
+        match = self._combined_regex.search(log_line)
+        if not match:
+            return LogLineMatch()
+
+        # Only the leftmost match is found so search the other set in case
+        # the line matches both.
+        line_match = LogLineMatch()
+        group_name = match.lastgroup
+        if group_name.startswith(self._restart_set.category):
+            index = self._restart_set.get_index(group_name)
+            line_match.restart_pattern = self._restart_set.get_matched_text(match, index)
+            line_match.blacklisted = self._blacklist_set.search(log_line)[0] is not None
+        else:
+            restart_match, index = self._restart_set.search(log_line)
+            if restart_match:
+                line_match.restart_pattern = self._restart_set.get_matched_text(restart_match, index)
+            line_match.blacklisted = True
+
+        return line_match
+
+    def match_batch(self, batch):
+        # Yields (log_line, line_match) for each line in a block of complete
+        # lines that matches a restart or blacklist pattern.
+        if not self._has_patterns or not batch:
+            return
+
+        if self._batch_regex is None:
+            for log_line in batch.decode(errors="replace").splitlines(keepends=True):
+                line_match = self.match(log_line)
+                if line_match.restart_pattern or line_match.blacklisted:
+                    yield log_line, line_match
+            return
+
+        position = 0
+        batch_length = len(batch)
+        while position < batch_length:
+            batch_match = self._batch_regex.search(batch, position)
+            if not batch_match:
+                return
+
+            # The bytes regex is only used to find the candidate lines. The
+            # line is classified with the text regexes, so the reported
+            # pattern and the case-insensitive matching are the same as
+            # when matching line by line.
+            match_start = batch_match.start()
+            line_start = batch.rfind(b"\n", 0, match_start) + 1
+            line_end = batch.find(b"\n", match_start)
+            line_end = batch_length if line_end == -1 else line_end + 1
+            position = line_end
+
+            log_line = batch[line_start:line_end].decode(errors="replace")
+            line_match = self.match(log_line)
+            if line_match.restart_pattern or line_match.blacklisted:
+                yield log_line, line_match
+
+    def measure_throughput(self, log_line, line_count):
+        # Returns the number of lines per second a single core can match in
+        # batches, using log_line as a typical non-matching line.
+        batch = log_line.encode() * line_count
+        start_time = time.thread_time()
+        for _ in self.match_batch(batch):
+            pass
+        elapsed_time = time.thread_time() - start_time
+        return line_count / elapsed_time if elapsed_time > 0 else float("inf")
+
+    def _match_separately(self, log_line):
+        line_match = LogLineMatch()
+        restart_match, index = self._restart_set.search(log_line)
+        if restart_match:
+            line_match.restart_pattern = self._restart_set.get_matched_text(restart_match, index)
+        line_match.blacklisted = self._blacklist_set.search(log_line)[0] is not None
+        return line_match
+
+    def matches_blacklist_exclude(self, log_line):
+        return self._blacklist_exclude_set.search(log_line)[0] is not None
+
+    def get_blacklisted_key(self, log_line):
+        # Returns the key being blacklisted if the line names one.
+        match, index = self._blacklist_exclude_hotkey_set.search(log_line)
+        if not match:
+            return None
+        return self._blacklist_exclude_hotkey_set.get_group(match, index, "key")
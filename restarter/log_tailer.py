@@ -0,0 +1,228 @@
+# Standard imports
+import os
+import select
+
+# Local imports
+from .constants import (
+    LOG_LINE_MAX_LENGTH,
+    LOG_READ_CHUNK_SIZE,
+    LOG_TAILER_POLL_INTERVAL,
+)
+from .inotify import (
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_DELETE,
+    IN_MODIFY,
+    IN_MOVED_FROM,
+    IN_MOVED_TO,
+    Inotify,
+    InotifyError,
+)
+from .utils import logger
+
+
+# Splits a stream of bytes into blocks of complete lines, keeping the partial
+# last line until the rest of it arrives. Keeping the lines together lets the
+# log checkers match a whole block at once instead of decoding and matching
+# each line separately.
+class LogLineBatcher:
+    def __init__(self, translate_crlf=False, max_line_length=LOG_LINE_MAX_LENGTH):
+        # translate_crlf is for output read from a pty, which ends lines with \r\n.
+        self._translate_crlf = translate_crlf
+        self._max_line_length = max_line_length
+        self.partial_line = b""
+
+    def add(self, chunk):
+        # Returns the complete lines, which may be empty.
+        data = self.partial_line + chunk if self.partial_line else chunk
+        if self._translate_crlf:
+            data = data.replace(b"\r\n", b"\n")
+
+        end = data.rfind(b"\n") + 1
+        self.partial_line = data[end:]
+        if len(self.partial_line) > self._max_line_length:
+            logger.debug(f"Skipping log line longer than {self._max_line_length} bytes.")
+            self.partial_line = b""
+        return data[:end]
+
+    def flush(self):
+        # Returns the partial last line as a complete line, for when the
+        # stream ends without a newline.
+        batch = self.partial_line + b"\n" if self.partial_line else b""
+        self.partial_line = b""
+        return batch
+
+    def clear(self):
+        self.partial_line = b""
+
+
+class _TailedFile:
+    def __init__(self, path):
+        self.path = path
+        self.fd = None
+        self.inode = None
+        self.position = 0
+        self.batcher = LogLineBatcher()
+
+
+# Follows a set of log files like "tail -F". The files are read in large
+# chunks and returned as blocks of complete lines. Truncation (pm2-logrotate
+# truncates the log after copying it) and renames/recreation are detected
+# from the file size and inode. inotify on the files' directories is used to
+# wake up when the files change, with a periodic rescan as a fallback in case
+# an event is missed or inotify isn't available.
+class LogFileTailer:
+    log_prefix = "LOG TAILER"
+
+    _inotify_mask = IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+
+    def __init__(
+        self, paths, chunk_size=LOG_READ_CHUNK_SIZE, poll_interval=LOG_TAILER_POLL_INTERVAL
+    ):
+        self._files = [_TailedFile(path) for path in paths]
+        self._chunk_size = chunk_size
+        self._poll_interval = poll_interval
+        self._inotify = None
+
+    @classmethod
+    def log_info(cls, message):
+        logger.info(f"{cls.log_prefix}: {message}")
+
+    @classmethod
+    def log_warning(cls, message):
+        logger.warning(f"{cls.log_prefix}: {message}")
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def open(self):
+        try:
+            self._inotify = Inotify()
+            for log_dir in {os.path.dirname(f.path) for f in self._files}:
+                self._inotify.add_watch(log_dir, self._inotify_mask)
+        except InotifyError as exc:
+            self.log_warning(
+                f"inotify is unavailable ({exc}). Polling the log files every "
+                f"{self._poll_interval} seconds."
+            )
+            if self._inotify:
+                self._inotify.close()
+            self._inotify = None
+
+        # Start from the end of the files. Only new lines are checked.
+        for tailed_file in self._files:
+            self._open_file(tailed_file, from_end=True)
+
+    def close(self):
+        for tailed_file in self._files:
+            self._close_file(tailed_file)
+        if self._inotify:
+            self._inotify.close()
+            self._inotify = None
+
+    def fileno(self):
+        # The inotify file descriptor to wait on, or None when polling.
+        return self._inotify.fileno() if self._inotify else None
+
+    def batches(self):
+        # Yields blocks of new log lines forever.
+        while True:
+            yield from self.read_batches()
+            self.wait()
+
+    def wait(self, timeout=None):
+        # Blocks until the log files change or until the poll interval passes.
+        timeout = self._poll_interval if timeout is None else timeout
+        if self._inotify:
+            select.select([self._inotify], [], [], timeout)
+            self.drain_events()
+        else:
+            select.select([], [], [], timeout)
+
+    def drain_events(self):
+        # The events themselves aren't needed since every file is checked on
+        # each read. They just need to be consumed.
+        if self._inotify:
+            self._inotify.read_events()
+
+    def read_batches(self):
+        batches = []
+        for tailed_file in self._files:
+            batches.extend(self._check_rotation(tailed_file))
+            batches.extend(self._read_file_batches(tailed_file))
+        return batches
+
+    def _open_file(self, tailed_file, from_end=False):
+        try:
+            fd = os.open(tailed_file.path, os.O_RDONLY | os.O_NONBLOCK)
+        except FileNotFoundError:
+            return False
+
+        stat = os.fstat(fd)
+        tailed_file.fd = fd
+        tailed_file.inode = (stat.st_dev, stat.st_ino)
+        tailed_file.position = stat.st_size if from_end else 0
+        tailed_file.batcher.clear()
+        os.lseek(fd, tailed_file.position, os.SEEK_SET)
+        return True
+
+    def _close_file(self, tailed_file):
+        if tailed_file.fd is not None:
+            os.close(tailed_file.fd)
+            tailed_file.fd = None
+            tailed_file.inode = None
+
+    def _check_rotation(self, tailed_file):
+        # Returns any lines left in the old file if the file was replaced.
+        if tailed_file.fd is None:
+            if self._open_file(tailed_file):
+                self.log_info(f"Log file created: {tailed_file.path}")
+            return []
+
+        try:
+            stat = os.stat(tailed_file.path)
+        except FileNotFoundError:
+            # Renamed or deleted. Keep reading the old file until the new one
+            # shows up.
+            return []
+
+        if (stat.st_dev, stat.st_ino) != tailed_file.inode:
+            # The file was replaced. Finish reading the old file before
+            # switching to the new one, which is read from the start.
+            self.log_info(f"Log file rotated: {tailed_file.path}")
+            batches = self._read_file_batches(tailed_file)
+            self._close_file(tailed_file)
+            self._open_file(tailed_file)
+            return batches
+
+        if stat.st_size < tailed_file.position:
+            self.log_info(f"Log file truncated: {tailed_file.path}")
+            tailed_file.position = 0
+            tailed_file.batcher.clear()
+            os.lseek(tailed_file.fd, 0, os.SEEK_SET)
+
+        return []
+
+    def _read_file_batches(self, tailed_file):
+        batches = []
+        if tailed_file.fd is None:
+            return batches
+
+        while True:
+            chunk = os.read(tailed_file.fd, self._chunk_size)
+            if not chunk:
+                break
+            tailed_file.position += len(chunk)
+
+            batch = tailed_file.batcher.add(chunk)
+            if batch:
+                batches.append(batch)
+
+            if len(chunk) < self._chunk_size:
+                break
+
+        return batches
@@ -0,0 +1,250 @@
+# Standard imports
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import heapq
+import itertools
+import os
+import select
+import threading
+import time
+import traceback
+
+# Local imports
+from .inotify import (
+    IN_CLOSE_WRITE,
+    IN_CREATE,
+    IN_MODIFY,
+    IN_MOVED_TO,
+    IN_Q_OVERFLOW,
+    Inotify,
+    InotifyError,
+)
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def get_log_write_watcher():
+    # Returns the shared watcher, starting it on first use, or None if
+    # inotify isn't available.
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None:
+            try:
+                _watcher = LogWriteWatcher()
+            except InotifyError:
+                return None
+            _watcher.start()
+        return _watcher
+
+
+@dataclass
+class _WatchedProcess:
+    log_files: list
+    threshold: float = None
+    last_write_time: float = 0
+    last_deadline_time: float = 0  # When the deadline last passed
+    on_deadline: object = field(default=None, repr=False)
+    sequence: int = 0  # Identifies the process's entry in the deadline heap
+
+    def get_deadline(self):
+        return max(self.last_write_time, self.last_deadline_time) + self.threshold
+
+
+# Keeps the last write time of each watched process's log files in memory.
+# A single thread waits on inotify events for the log files' directories,
+# so nothing is polled between writes no matter how many processes are
+# watched.
+#
+# A process watched with a threshold also gets a deadline, which is pushed
+# back on every write. When the deadline passes, i.e. the process hasn't
+# written to its logs in threshold seconds, on_deadline(key, last_write_time)
+# is called. The callbacks run on a separate thread, so a slow callback,
+# e.g. a pm2 restart, doesn't hold up the inotify events, and an exception
+# in one doesn't stop the watcher. The deadline is then re-armed one
+# threshold later. Each process has a single entry in the deadline heap. A
+# write only updates the last write time, and an entry that has been pushed
+# back is re-queued when it comes up.
+class LogWriteWatcher:
+    _inotify_mask = IN_MODIFY | IN_CLOSE_WRITE | IN_CREATE | IN_MOVED_TO
+
+    def __init__(self):
+        self._inotify = Inotify()
+        self._lock = threading.Lock()
+
+        self._dir_wds = {}  # log dir -> inotify watch descriptor
+        self._wd_dirs = {}  # inotify watch descriptor -> log dir
+        self._file_keys = {}  # (log dir, file name) -> process keys
+        self._processes = {}  # process key -> _WatchedProcess
+        self._deadlines = []  # heap of (deadline, sequence, process key)
+        self._sequence = itertools.count()
+
+        # Wakes up the watcher thread when the deadlines change.
+        self._wakeup_read_fd, self._wakeup_write_fd = os.pipe()
+        os.set_blocking(self._wakeup_read_fd, False)
+        self._thread = None
+        self._callback_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="log-watcher-callback"
+        )
+
+    def watch(self, key, log_files, threshold=None, on_deadline=None):
+        # Returns False if the log files' directories can't be watched, e.g.
+        # when the inotify watch limit is hit, so the caller falls back to
+        # polling the log file modification times.
+        watched_process = _WatchedProcess(
+            log_files=list(log_files),
+            threshold=threshold,
+            last_write_time=self._get_mtime(log_files),
+            on_deadline=on_deadline,
+        )
+
+        file_keys = [
+            os.path.split(os.path.abspath(log_file)) for log_file in watched_process.log_files
+        ]
+
+        with self._lock:
+            self._unwatch(key)
+            for log_dir, _ in file_keys:
+                if log_dir not in self._dir_wds:
+                    try:
+                        wd = self._inotify.add_watch(log_dir, self._inotify_mask)
+                    except InotifyError:
+                        return False
+                    self._dir_wds[log_dir] = wd
+                    self._wd_dirs[wd] = log_dir
+
+            for file_key in file_keys:
+                self._file_keys.setdefault(file_key, set()).add(key)
+
+            self._processes[key] = watched_process
+            if threshold is not None:
+                watched_process.sequence = next(self._sequence)
+                heapq.heappush(
+                    self._deadlines,
+                    (watched_process.get_deadline(), watched_process.sequence, key)
+                )
+
+        self._wakeup()
+        return True
+
+    def unwatch(self, key):
+        with self._lock:
+            self._unwatch(key)
+
+    def is_watched(self, key):
+        with self._lock:
+            return key in self._processes
+
+    def get_last_write_time(self, key):
+        with self._lock:
+            return self._processes[key].last_write_time
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def join(self):
+        self._thread.join()
+
+    def _unwatch(self, key):
+        # The inotify directory watches are kept. The deadline heap entry is
+        # dropped when it comes up.
+        watched_process = self._processes.pop(key, None)
+        if watched_process is None:
+            return
+
+        for log_file in watched_process.log_files:
+            file_key = os.path.split(os.path.abspath(log_file))
+            keys = self._file_keys.get(file_key)
+            if keys:
+                keys.discard(key)
+                if not keys:
+                    del self._file_keys[file_key]
+
+    def _wakeup(self):
+        os.write(self._wakeup_write_fd, b"\0")
+
+    def _run(self):
+        while True:
+            timeout = self._get_timeout()
+            readable, _, _ = select.select(
+                [self._inotify, self._wakeup_read_fd], [], [], timeout
+            )
+            if self._wakeup_read_fd in readable:
+                os.read(self._wakeup_read_fd, 4096)
+            if self._inotify in readable:
+                self._handle_events(self._inotify.read_events())
+
+            self._handle_deadlines()
+
+    def _get_timeout(self):
+        with self._lock:
+            if not self._deadlines:
+                return None
+            return max(self._deadlines[0][0] - time.time(), 0)
+
+    def _handle_events(self, events):
+        write_time = time.time()
+        with self._lock:
+            for wd, mask, _, file_name in events:
+                if mask & IN_Q_OVERFLOW:
+                    # Events were dropped so fall back to the mtimes.
+                    for watched_process in self._processes.values():
+                        watched_process.last_write_time = max(
+                            watched_process.last_write_time,
+                            self._get_mtime(watched_process.log_files),
+                        )
+                    continue
+
+                log_dir = self._wd_dirs.get(wd)
+                for key in self._file_keys.get((log_dir, file_name), ()):
+                    self._processes[key].last_write_time = write_time
+
+    def _handle_deadlines(self):
+        expired = []
+        current_time = time.time()
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= current_time:
+                _, sequence, key = heapq.heappop(self._deadlines)
+                watched_process = self._processes.get(key)
+                if watched_process is None or watched_process.sequence != sequence:
+                    # No longer watched, or watched again with a new entry.
+                    continue
+
+                deadline = watched_process.get_deadline()
+                if deadline > current_time:
+                    # Pushed back by a write since it was queued.
+                    heapq.heappush(self._deadlines, (deadline, sequence, key))
+                    continue
+
+                watched_process.last_deadline_time = current_time
+                heapq.heappush(
+                    self._deadlines, (watched_process.get_deadline(), sequence, key)
+                )
+                expired.append((key, watched_process))
+
+        # The callbacks run without the lock so they can use the watcher.
+        for key, watched_process in expired:
+            if watched_process.on_deadline:
+                self._callback_executor.submit(
+                    self._call_on_deadline,
+                    watched_process.on_deadline, key, watched_process.last_write_time
+                )
+
+    @staticmethod
+    def _call_on_deadline(on_deadline, key, last_write_time):
+        try:
+            on_deadline(key, last_write_time)
+        except Exception:
+            # Keep watching for the next deadlines.
+            traceback.print_exc()
+
+    @staticmethod
+    def _get_mtime(log_files):
+        mtimes = [0]
+        for log_file in log_files:
+            try:
+                mtimes.append(os.path.getmtime(log_file))
+            except OSError:
+                pass
+        return max(mtimes)
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
 # Standard imports
+import argparse
+import asyncio
 from concurrent.futures import ThreadPoolExecutor
+import copy
 from dataclasses import dataclass, field
 import os
 import shlex
@@ -10,6 +13,11 @@ import time
 from typing import Type, TYPE_CHECKING
 
 # Local imports
+from .checker_async import (
+    get_async_checker_class,
+    run_async_checker,
+)
+from .checker_base import ValidatorPeriodicChecker
 from .checker_git_repo import (
     ValidatorCheckerGitUpdateCommits,
     ValidatorCheckerGitUpdateTags,
@@ -19,19 +27,31 @@ from .checker_stopped_logs import (
     ValidatorCheckerDockerStoppedLogs,
     ValidatorCheckerPm2StoppedLogs,
 )
-from .checker_subtensor import ValidatorCheckerSubtensor
+from .checker_subtensor import (
+    SharedSubtensorSnapshot,
+    ValidatorCheckerSubtensor,
+    set_shared_subtensor_snapshot,
+)
 from .checker_system import ValidatorCheckerSystemMemory
 from .constants import (
     AT_SOL,
     AT_USERS,
     DEBUG,
+    NOTIFIER_EXIT_FLUSH_TIMEOUT,
     RED_X,
-    RESTARTER_GIT_PATHS,
     RESTARTER_PREFIX,
+    RESTARTER_UPDATE_INTERVAL,
+)
+from .metrics import MetricsServer
+from .notifier import get_notification_dispatcher
+from .scheduler import CheckerScheduler
+from .self_update import (
+    RestarterUpdateCoordinator,
+    RestarterUpdateError,
 )
 from .utils import (
+    get_all_restart_locks,
     logger,
-    restart_lock,
     send_monitor_notification,
 )
 
@@ -55,23 +75,62 @@ def log_error(message):
 class RestartChecker:
     descriptor: str
     checker_class: Type[ValidatorChecker]
+    options: argparse.Namespace
     set_options: tuple[tuple[str, object]] = field(default_factory=tuple)
 
-
-def _run_checker(checker_class, options):
+    def get_checker_options(self):
+        # Each checker gets its own copy of the options so checkers for
+        # different subnets and processes don't overwrite each other's.
+        checker_options = copy.copy(self.options)
+        for (attr, value) in self.set_options:
+            setattr(checker_options, attr, value)
+        return checker_options
+
+    def get_name(self):
+        # Unique name for the checker, including the process or container it
+        # checks since those checkers share a descriptor.
+        for (attr, value) in self.set_options:
+            if attr in ("pm2_process", "docker_container"):
+                return f"{self.descriptor} ({value})"
+        return self.descriptor
+
+
+def _notify_checker_failure(checker_obj):
+    send_monitor_notification(
+        checker_obj.log_prefix,
+        f"{AT_USERS} {RED_X} restarter check \"{checker_obj.log_prefix}\" "
+        f"failed on subnet {checker_obj._netuid}"
+    )
+
+
+def _create_checker(restart_check, async_runtime=False):
+    options = restart_check.get_checker_options()
     try:
-        checker_obj = checker_class(options)
-        checker_obj.run()
+        if async_runtime:
+            return get_async_checker_class(restart_check.checker_class, options)(options)
+        return restart_check.checker_class(options)
     except Exception as exc:
         import traceback
 
         traceback.print_exc()
-        checker_obj.log_error(f"Error: {exc}")
+        log_error(f"Error creating {restart_check.descriptor} checker: {exc}")
         send_monitor_notification(
-            checker_obj.log_prefix,
-            f"{AT_USERS} {RED_X} restarter check \"{checker_obj.log_prefix}\" "
+            RESTARTER_PREFIX,
+            f"{AT_USERS} {RED_X} restarter check \"{restart_check.descriptor}\" "
             f"failed on subnet {options.netuid}"
         )
+        return None
+
+
+def _run_checker(checker_obj):
+    try:
+        checker_obj.run()
+    except Exception as exc:
+        import traceback
+
+        traceback.print_exc()
+        checker_obj.log_error(f"Error: {exc}")
+        _notify_checker_failure(checker_obj)
 
 
 def notify_ip_address(options):
@@ -105,14 +164,14 @@ def notify_ip_address(options):
         send_monitor_notification(RESTARTER_PREFIX, msg)
 
 
-def check_for_restarter_code_update(netuid):
+def check_for_restarter_code_update(restarter_name):
 
     def send_error(message):
         log_error(message)
         log_error("Not checking for restarter code updates.")
         send_monitor_notification(
             RESTARTER_PREFIX,
-            f"{AT_SOL} {RED_X} Failed to update restarter git repo on subnet {netuid}"
+            f"{AT_SOL} {RED_X} Failed to update restarter git repo on {restarter_name}"
         )
 
     # TODO: This duplicate code needs to be in a separate function.
@@ -127,110 +186,89 @@ def check_for_restarter_code_update(netuid):
 
     repo_path = process.stdout.decode().strip()
 
+    # The pull is coordinated with the other restarters on the host, so
+    # compare the restarter code this process started with against the
+    # code commit they publish.
+    update_coordinator = RestarterUpdateCoordinator(repo_path)
+    try:
+        running_code_commit = update_coordinator.get_code_commit()
+    except RestarterUpdateError as exc:
+        send_error(str(exc))
+        return
+
     def do_update():
         log_info("Checking for restarter code updates.")
 
-        # Hard-coding these because it's just easier
-        restarter_git_paths = shlex.join(RESTARTER_GIT_PATHS)
-
-        # Get current commit
-        get_cmd = f"git -C {repo_path} rev-parse HEAD"
         try:
-            process = subprocess.run(shlex.split(get_cmd), check=True, stdout=subprocess.PIPE)
-        except subprocess.CalledProcessError as exc:
-            send_error(f"'{get_cmd}' command failed: {exc}")
+            update_state = update_coordinator.update()
+        except RestarterUpdateError as exc:
+            send_error(str(exc))
             return
 
-        current_commit = process.stdout.decode().strip()
-
-        # Run git pull
-        pull_cmd = f"git -C {repo_path} pull --autostash"
-        try:
-            subprocess.run(shlex.split(pull_cmd), check=True)
-        except subprocess.CalledProcessError as exc:
-            send_error(f"'{pull_cmd}' command failed: {exc}")
-            return
-
-        # Get new commit
-        try:
-            process = subprocess.run(shlex.split(get_cmd), check=True, stdout=subprocess.PIPE)
-        except subprocess.CalledProcessError as exc:
-            send_error(f"'{get_cmd}' command failed: {exc}")
-            return
-
-        new_commit = process.stdout.decode().strip()
-
-        log_info(f"Current commit: {current_commit}")
-        log_info(f"New commit: {new_commit}")
-        if current_commit != new_commit:
-            log_info("Commits changed.")
-            diff_cmd = f"git -C {repo_path} diff --quiet {current_commit} {new_commit} -- {restarter_git_paths}"
-            if subprocess.run(shlex.split(diff_cmd)).returncode:
-                log_info("Restarter code changed. Exiting process. If this is running in pm2 "
-                         "it should cause a pm2 restart and run the updated code.")
-                with restart_lock:
-                    # Sleeping for a second to make sure all logs are output before restarting.
-                    # Flushing stdout/stderr doesn't seem to help.
-                    time.sleep(1)
-                    # Commenting this for now since this could cause 100+ discord notifications.
-                    # send_monitor_notification(
-                    #     RESTARTER_PREFIX,
-                    #     f"Updating restarter git repo on subnet {netuid}"
-                    # )
-                    os._exit(1)
-            else:
-                log_info("Restarter code unchanged. Doing nothing.")
+        log_info(f"Running restarter code commit: {running_code_commit}")
+        log_info(f"Latest restarter code commit: {update_state.code_commit}")
+        if update_state.code_commit != running_code_commit:
+            log_info("Restarter code changed. Exiting process. If this is running in pm2 "
+                     "it should cause a pm2 restart and run the updated code.")
+            # Acquire every subnet's restart lock so we don't exit mid-restart.
+            for restart_lock in get_all_restart_locks():
+                restart_lock.acquire()
+            # Sleeping for a second to make sure all logs are output before restarting.
+            # Flushing stdout/stderr doesn't seem to help.
+            time.sleep(1)
+            # Commenting this for now since this could cause 100+ discord notifications.
+            # send_monitor_notification(
+            #     RESTARTER_PREFIX,
+            #     f"Updating restarter git repo on {restarter_name}"
+            # )
+            # os._exit skips the atexit flush, so send any queued notifications first.
+            get_notification_dispatcher().flush(NOTIFIER_EXIT_FLUSH_TIMEOUT)
+            os._exit(1)
         else:
-            log_info("Commits are the same. Doing nothing.")
+            log_info("Restarter code unchanged. Doing nothing.")
 
     while True:
         do_update()
 
-        sleep_interval = 3600  # 1 hour
+        sleep_interval = RESTARTER_UPDATE_INTERVAL
         log_info(f"Sleeping for {sleep_interval} seconds.")
         time.sleep(sleep_interval)
 
 
-def run(options):
-    # Temporarily turning off blacklist log checking until i can come back to it.
-    # Right now there's too much else to do and almost every notification has been
-    # a false positive.
-    options.do_check_blacklist_logs = False
-
+def _enable_logging():
     if DEBUG:
         logger.enable_debug()
     else:
         logger.enable_info()
 
-    notify_ip_address(options)
+
+def _check_options(options):
+    # Temporarily turning off blacklist log checking until i can come back to it.
+    # Right now there's too much else to do and almost every notification has been
+    # a false positive.
+    options.do_check_blacklist_logs = False
 
     if not (options.pm2_processes or options.docker_containers):
         if options.do_check_errors:
             log_warning(
-                "No --pm2-process or --docker-container is specified. "
-                "Not checking for log errors.")
+                f"Subnet {options.netuid}: No --pm2-process or --docker-container is "
+                "specified. Not checking for log errors.")
             options.do_check_errors = False
 
         if options.do_check_stopped_logs:
             log_warning(
-                "No --pm2-process or --docker-container is specified. "
-                "Not checking for stopped log output.")
+                f"Subnet {options.netuid}: No --pm2-process or --docker-container is "
+                "specified. Not checking for stopped log output.")
             options.do_check_stopped_logs = False
 
         if options.do_check_blacklist_logs:
             log_warning(
-                "No --pm2-process or --docker-container is specified. "
-                "Not checking for miner blackisting in logs.")
+                f"Subnet {options.netuid}: No --pm2-process or --docker-container is "
+                "specified. Not checking for miner blackisting in logs.")
             options.do_check_blacklist_logs = False
 
-    sleep_time = 15
-    log_info("")
-    log_info(f"Starting validator restarter on subnet {options.netuid}")
-    log_info(f"Sleeping {sleep_time} seconds in case the "
-             "validator process is just starting.")
-    log_info("")
-    time.sleep(sleep_time)
 
+def _get_restart_checks(options):
     # Gather all restart checks
     restart_checks = []
 
@@ -240,6 +278,7 @@ def run(options):
             RestartChecker(
                 descriptor="Updated value",
                 checker_class=ValidatorCheckerSubtensor,
+                options=options,
                 set_options=(("checker_type", "Updated"),)
             )
         )
@@ -250,6 +289,7 @@ def run(options):
             RestartChecker(
                 descriptor="vTrust value",
                 checker_class=ValidatorCheckerSubtensor,
+                options=options,
                 set_options=(("checker_type", "VTrust"),)
             )
         )
@@ -260,6 +300,7 @@ def run(options):
             RestartChecker(
                 descriptor="system memory",
                 checker_class=ValidatorCheckerSystemMemory,
+                options=options,
             )
         )
 
@@ -270,6 +311,7 @@ def run(options):
                 RestartChecker(
                     descriptor="docker log output",
                     checker_class=ValidatorCheckerLogOutputFactory,
+                    options=options,
                     set_options=(
                         ("log_checker_type", "Docker"), ("docker_container", docker_container),
                     )
@@ -280,6 +322,7 @@ def run(options):
                 RestartChecker(
                     descriptor="pm2 log output",
                     checker_class=ValidatorCheckerLogOutputFactory,
+                    options=options,
                     set_options=(
                         ("log_checker_type", "Pm2"), ("pm2_process", pm2_process),
                     )
@@ -293,6 +336,7 @@ def run(options):
                 RestartChecker(
                     descriptor="stopped docker logs",
                     checker_class=ValidatorCheckerDockerStoppedLogs,
+                    options=options,
                     set_options=(("docker_container", docker_container),)
                 )
             )
@@ -301,6 +345,7 @@ def run(options):
                 RestartChecker(
                     descriptor="stopped pm2 logs",
                     checker_class=ValidatorCheckerPm2StoppedLogs,
+                    options=options,
                     set_options=(("pm2_process", pm2_process),)
                 )
             )
@@ -315,31 +360,165 @@ def run(options):
             RestartChecker(
                 descriptor="code update",
                 checker_class=code_checker_class,
+                options=options,
             )
         )
 
-    # Run each check in a separate thread
-    with ThreadPoolExecutor(max_workers=len(restart_checks)) as executor:
-        while restart_checks:
-            restart_check = restart_checks.pop(0)
-            log_info("")
-            log_info("="*(len(restart_check.descriptor)+18))
-            log_info(f"Running {restart_check.descriptor} checker.")
-            log_info("="*(len(restart_check.descriptor)+18))
-            log_info("")
-
-            for (attr, value) in restart_check.set_options:
-                setattr(options, attr, value)
-            executor.submit(_run_checker, restart_check.checker_class, options)
-
-            if restart_checks:
-                log_info(f"Sleeping {sleep_time} seconds before "
-                         "starting the next one.")
-                time.sleep(sleep_time)
+    return restart_checks
+
+
+def _run_restart_checks(restart_checks, do_check_restarter_code, restarter_name):
+    # The periodic checkers are driven by the scheduler. The log output
+    # checkers stream their logs so each one still runs in its own thread.
+    scheduler = CheckerScheduler(on_error=_notify_checker_failure)
+    streaming_checkers = []
+    for restart_check in restart_checks:
+        log_info("")
+        log_info("="*(len(restart_check.descriptor)+18))
+        log_info(f"Running {restart_check.descriptor} checker.")
+        log_info("="*(len(restart_check.descriptor)+18))
+        log_info("")
+
+        checker_obj = _create_checker(restart_check)
+        if checker_obj is None:
+            continue
+
+        if isinstance(checker_obj, ValidatorPeriodicChecker):
+            scheduler.add(restart_check.get_name(), checker_obj)
+        else:
+            streaming_checkers.append(checker_obj)
+
+    scheduler.start()
+
+    with ThreadPoolExecutor(max_workers=max(len(streaming_checkers), 1)) as executor:
+        for checker_obj in streaming_checkers:
+            executor.submit(_run_checker, checker_obj)
 
         log_info("Started all restart checkers.")
-        if options.do_check_restarter_code:
-            log_info(f"Sleeping {sleep_time} seconds before checking for "
-                     "restarter code updates.")
-            time.sleep(sleep_time)
-            check_for_restarter_code_update(options.netuid)
+        if do_check_restarter_code:
+            check_for_restarter_code_update(restarter_name)
+
+    scheduler.join()
+
+
+def _run_restart_checks_async(restart_checks, do_check_restarter_code, restarter_name):
+    asyncio.run(
+        _run_async_checkers(restart_checks, do_check_restarter_code, restarter_name)
+    )
+
+
+async def _run_async_checkers(restart_checks, do_check_restarter_code, restarter_name):
+    # Every checker runs as a task on this event loop.
+    tasks = []
+    for restart_check in restart_checks:
+        log_info("")
+        log_info("="*(len(restart_check.descriptor)+18))
+        log_info(f"Running {restart_check.descriptor} checker.")
+        log_info("="*(len(restart_check.descriptor)+18))
+        log_info("")
+
+        checker_obj = _create_checker(restart_check, async_runtime=True)
+        if checker_obj is None:
+            continue
+
+        tasks.append(asyncio.create_task(run_async_checker(checker_obj, _notify_checker_failure)))
+
+    log_info("Started all restart checkers.")
+    if do_check_restarter_code:
+        # The restarter code update check is hourly and exits the process
+        # so it just runs in a thread.
+        tasks.append(asyncio.create_task(
+            asyncio.to_thread(check_for_restarter_code_update, restarter_name)
+        ))
+
+    await asyncio.gather(*tasks)
+
+
+def _start_metrics_server(options):
+    if options.metrics_port is None and not options.metrics_socket:
+        return
+
+    MetricsServer(options.metrics_port, options.metrics_socket).start()
+
+
+def run(options):
+    _enable_logging()
+
+    notify_ip_address(options)
+
+    _check_options(options)
+
+    sleep_time = 15
+    log_info("")
+    log_info(f"Starting validator restarter on subnet {options.netuid}")
+    log_info(f"Sleeping {sleep_time} seconds in case the "
+             "validator process is just starting.")
+    log_info("")
+    time.sleep(sleep_time)
+
+    _start_metrics_server(options)
+
+    restart_checks = _get_restart_checks(options)
+    run_restart_checks = (
+        _run_restart_checks_async if options.async_runtime else _run_restart_checks
+    )
+    run_restart_checks(
+        restart_checks, options.do_check_restarter_code, f"subnet {options.netuid}"
+    )
+
+
+def run_host(host_options):
+    # Supervise every subnet in the host config from a single restarter process.
+    _enable_logging()
+
+    netuid_options = host_options.netuid_options
+    netuids = [options.netuid for options in netuid_options]
+
+    # Share a single subtensor snapshot between the Updated and vTrust
+    # checkers of every subnet.
+    netuid_mechids = {}
+    for options in netuid_options:
+        notify_ip_address(options)
+        _check_options(options)
+
+        if options.async_runtime:
+            log_warning(
+                f"Subnet {options.netuid}: The async runtime is not supported in the "
+                "host restarter. Running the checkers in threads."
+            )
+
+        if options.do_check_vtrust:
+            netuid_mechids.setdefault(options.netuid, []).append(0)
+        if options.do_check_updated:
+            mechids = netuid_mechids.setdefault(options.netuid, [])
+            if options.updated_mechid not in mechids:
+                mechids.append(options.updated_mechid)
+
+    if netuid_mechids:
+        set_shared_subtensor_snapshot(
+            SharedSubtensorSnapshot(
+                netuid_mechids,
+                netuid_options[0].subtensor_worker_max_rss,
+                netuid_options[0].subtensor_worker_max_requests,
+            )
+        )
+
+    sleep_time = 15
+    log_info("")
+    log_info(f"Starting validator restarter on subnets {netuids}")
+    log_info(f"Sleeping {sleep_time} seconds in case the "
+             "validator processes are just starting.")
+    log_info("")
+    time.sleep(sleep_time)
+
+    _start_metrics_server(host_options)
+
+    restart_checks = []
+    for options in netuid_options:
+        for restart_check in _get_restart_checks(options):
+            restart_check.descriptor = f"subnet {options.netuid} {restart_check.descriptor}"
+            restart_checks.append(restart_check)
+
+    _run_restart_checks(
+        restart_checks, host_options.do_check_restarter_code, "host restarter"
+    )
@@ -0,0 +1,259 @@
+# Standard imports
+import bisect
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import re
+import socketserver
+import threading
+import time
+
+# Local imports
+from .constants import (
+    METRICS_BATCH_MATCH_BUCKETS,
+    METRICS_HOST,
+    METRICS_RESTART_DURATION_BUCKETS,
+)
+from .utils import logger
+
+_LOG_TIMESTAMP_REGEX = re.compile(rb"(\d{4}-\d{2}-\d{2})[ T](\d{2}:\d{2}:\d{2})(\.\d+)?")
+_LOG_TIMESTAMP_SEARCH_LENGTH = 64  # Only the start of the line is searched for the timestamp
+
+
+class _Metric:
+    metric_type = None
+
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        with self._lock:
+            for labels, value in self._values.items():
+                lines.extend(self._render_value(labels, value))
+        return lines
+
+    def _render_value(self, labels, value):
+        return [f"{self.name}{self._format_labels(labels)} {value}"]
+
+    def _format_labels(self, labels, extra_labels=()):
+        label_pairs = list(zip(self.label_names, labels)) + list(extra_labels)
+        if not label_pairs:
+            return ""
+        label_str = ",".join(
+            f"{name}=\"{_escape_label_value(value)}\"" for name, value in label_pairs
+        )
+        return f"{{{label_str}}}"
+
+
+class Counter(_Metric):
+    metric_type = "counter"
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    metric_type = "gauge"
+
+    def set(self, labels, value):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    metric_type = "histogram"
+
+    def __init__(self, name, help_text, label_names, buckets):
+        super().__init__(name, help_text, label_names)
+        self.buckets = sorted(buckets)
+
+    def observe(self, labels, value):
+        with self._lock:
+            bucket_counts, total = self._values.get(labels, (None, 0))
+            if bucket_counts is None:
+                # The last count is the +Inf bucket.
+                bucket_counts = [0] * (len(self.buckets) + 1)
+            bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[labels] = (bucket_counts, total + value)
+
+    def _render_value(self, labels, value):
+        bucket_counts, total = value
+        lines = []
+        cumulative_count = 0
+        for bucket, count in zip(self.buckets + ["+Inf"], bucket_counts):
+            cumulative_count += count
+            bucket_labels = self._format_labels(labels, (("le", bucket),))
+            lines.append(f"{self.name}_bucket{bucket_labels} {cumulative_count}")
+        lines.append(f"{self.name}_sum{self._format_labels(labels)} {total}")
+        lines.append(f"{self.name}_count{self._format_labels(labels)} {cumulative_count}")
+        return lines
+
+
+def _escape_label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+# Log output checker metrics. They're labeled with the netuid and the pm2
+# process or docker container being checked. Rates (e.g. lines per second)
+# are left to the scraper, e.g. rate(restarter_log_lines_total[1m]). So is
+# the average match time per line, e.g.
+# rate(restarter_log_batch_match_seconds_sum[5m]) / rate(restarter_log_lines_total[5m]).
+LOG_LABELS = ("netuid", "process")
+
+LOG_LINES = Counter(
+    "restarter_log_lines_total",
+    "Log lines consumed by the log output checker.",
+    LOG_LABELS,
+)
+LOG_BYTES = Counter(
+    "restarter_log_bytes_total",
+    "Log output bytes consumed by the log output checker.",
+    LOG_LABELS,
+)
+LOG_BATCH_MATCH_SECONDS = Histogram(
+    "restarter_log_batch_match_seconds",
+    "Time to match a batch of log lines against the restart and blacklist patterns.",
+    LOG_LABELS,
+    METRICS_BATCH_MATCH_BUCKETS,
+)
+LOG_LAG_SECONDS = Gauge(
+    "restarter_log_lag_seconds",
+    "Time between the timestamp of the last log line processed and when it was processed.",
+    LOG_LABELS,
+)
+LOG_PROCESS_LAUNCHES = Counter(
+    "restarter_log_process_launches_total",
+    "Launches of the docker logs or pm2 log process read by the log output checker.",
+    LOG_LABELS,
+)
+LOG_RESTART_WAITING = Gauge(
+    "restarter_log_restart_waiting",
+    "1 while the pm2 log patterns check is waiting after a restart, 0 otherwise.",
+    ("netuid",),
+)
+LOG_RESTART_WAIT_SECONDS = Counter(
+    "restarter_log_restart_wait_seconds_total",
+    "Time the pm2 log patterns check has spent waiting after restarts.",
+    ("netuid",),
+)
+
+# Restart metrics.
+RESTART_DURATION_SECONDS = Histogram(
+    "restarter_restart_duration_seconds",
+    "Wall-clock time taken by the restart script. The result label is "
+    "succeeded, failed or timeout.",
+    ("netuid", "result"),
+    METRICS_RESTART_DURATION_BUCKETS,
+)
+
+_METRICS = (
+    LOG_LINES,
+    LOG_BYTES,
+    LOG_BATCH_MATCH_SECONDS,
+    LOG_LAG_SECONDS,
+    LOG_PROCESS_LAUNCHES,
+    LOG_RESTART_WAITING,
+    LOG_RESTART_WAIT_SECONDS,
+    RESTART_DURATION_SECONDS,
+)
+
+
+def render_metrics():
+    # Returns all the metrics in the Prometheus text exposition format.
+    lines = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def record_log_batch(labels, batch, line_count):
+    # Records the lines and bytes consumed and the lag of the batch's last line.
+    LOG_LINES.inc(labels, line_count)
+    LOG_BYTES.inc(labels, len(batch))
+
+    last_line_start = batch.rfind(b"\n", 0, len(batch) - 1) + 1
+    timestamp_match = _LOG_TIMESTAMP_REGEX.search(
+        batch, last_line_start, last_line_start + _LOG_TIMESTAMP_SEARCH_LENGTH
+    )
+    if not timestamp_match:
+        return
+
+    # Log timestamps are in local time.
+    log_date, log_seconds, log_fraction = timestamp_match.groups()
+    try:
+        log_time = time.mktime(
+            time.strptime(f"{log_date.decode()} {log_seconds.decode()}", "%Y-%m-%d %H:%M:%S")
+        )
+    except ValueError:
+        return
+    if log_fraction:
+        log_time += float(log_fraction)
+    LOG_LAG_SECONDS.set(labels, max(time.time() - log_time, 0))
+
+
+class _MetricsRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+
+        body = render_metrics().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Don't log every scrape.
+        pass
+
+
+class _UnixMetricsServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # The http request handler expects a (host, port) client address.
+        request, _ = super().get_request()
+        return request, ("unix", 0)
+
+
+class MetricsServer:
+    log_prefix = "METRICS"
+
+    def __init__(self, port=None, socket_path=None):
+        self._port = port
+        self._socket_path = os.path.expanduser(socket_path) if socket_path else None
+        self._servers = []
+
+    @classmethod
+    def log_info(cls, message):
+        logger.info(f"{cls.log_prefix}: {message}")
+
+    def start(self):
+        if self._port is not None:
+            server = ThreadingHTTPServer((METRICS_HOST, self._port), _MetricsRequestHandler)
+            server.daemon_threads = True
+            self._serve(server, f"http://{METRICS_HOST}:{self._port}/metrics")
+
+        if self._socket_path:
+            os.makedirs(os.path.dirname(self._socket_path), exist_ok=True)
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+            server = _UnixMetricsServer(self._socket_path, _MetricsRequestHandler)
+            os.chmod(self._socket_path, 0o600)
+            self._serve(server, self._socket_path)
+
+    def _serve(self, server, address):
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        self._servers.append(server)
+        self.log_info(f"Serving metrics on {address}")
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+# Standard imports
+from dataclasses import dataclass
+
+# Numpy imports
+import numpy
+
+
+# A snapshot of a subnet's neurons as a struct of arrays, so the weight
+# setting code selects neurons with numpy masks rather than scanning the
+# neuron objects. The rows are in uid order, so a uid indexes its row.
+#
+# The hotkeys and coldkeys are interned: hotkey_index and coldkey_index hold
+# the index of each neuron's key in the sorted unique hotkeys and coldkeys
+# arrays.
+#
+# The vtrust is NaN unless the validator trust is passed in. Only the weight
+# copy code needs it, and it reads it from storage.
+@dataclass(frozen=True)
+class NeuronTable:
+    block: int | None
+    uid: numpy.ndarray
+    stake: numpy.ndarray
+    validator_permit: numpy.ndarray
+    last_update: numpy.ndarray
+    vtrust: numpy.ndarray
+    block_at_registration: numpy.ndarray
+    hotkey_index: numpy.ndarray
+    coldkey_index: numpy.ndarray
+    hotkeys: numpy.ndarray
+    coldkeys: numpy.ndarray
+
+    @classmethod
+    def from_neurons(cls, neurons, block=None, validator_trust=None):
+        neurons = sorted(neurons, key=lambda neuron: neuron.uid)
+        hotkeys, hotkey_index = numpy.unique(
+            numpy.array([neuron.hotkey for neuron in neurons], dtype=str), return_inverse=True
+        )
+        coldkeys, coldkey_index = numpy.unique(
+            numpy.array([neuron.coldkey for neuron in neurons], dtype=str), return_inverse=True
+        )
+
+        uid = numpy.array([neuron.uid for neuron in neurons], dtype=numpy.int64)
+        if validator_trust is None:
+            vtrust = numpy.full(len(neurons), numpy.nan)
+        else:
+            vtrust = numpy.asarray(validator_trust, dtype=numpy.float64)[uid]
+
+        return cls(
+            block=block,
+            uid=uid,
+            stake=numpy.array(
+                [neuron.total_stake.amount for neuron in neurons], dtype=numpy.float64
+            ),
+            validator_permit=numpy.array(
+                [bool(neuron.validator_permit) for neuron in neurons], dtype=bool
+            ),
+            last_update=numpy.array(
+                [neuron.last_update for neuron in neurons], dtype=numpy.int64
+            ),
+            vtrust=vtrust,
+            block_at_registration=numpy.array(
+                [neuron.block_at_registration for neuron in neurons], dtype=numpy.int64
+            ),
+            hotkey_index=hotkey_index,
+            coldkey_index=coldkey_index,
+            hotkeys=hotkeys,
+            coldkeys=coldkeys,
+        )
+
+    @classmethod
+    def from_metagraph(cls, metagraph, validator_trust=None):
+        return cls.from_neurons(
+            metagraph.neurons, block=int(metagraph.block), validator_trust=validator_trust
+        )
+
+    def __len__(self):
+        return len(self.uid)
+
+    def get_hotkey_mask(self, hotkey):
+        return self._get_key_mask(self.hotkeys, self.hotkey_index, hotkey)
+
+    def get_coldkey_mask(self, coldkey):
+        return self._get_key_mask(self.coldkeys, self.coldkey_index, coldkey)
+
+    def get_hotkey_uid(self, hotkey):
+        # Returns the lowest uid registered to the hotkey, or None.
+        uids = self.uid[self.get_hotkey_mask(hotkey)]
+        return int(uids[0]) if uids.size else None
+
+    def get_oldest_uid(self, mask):
+        # Returns the uid of the earliest registered neuron in the mask, or
+        # None if the mask is empty. Ties go to the lowest uid.
+        uids = self.uid[mask]
+        if not uids.size:
+            return None
+        return int(uids[numpy.argmin(self.block_at_registration[mask])])
+
+    def get_top_stake_uids(self, mask=None, count=None):
+        # Returns the uids in the mask ordered by stake, highest first. Equal
+        # stakes stay in uid order.
+        uids = self.uid if mask is None else self.uid[mask]
+        stake = self.stake if mask is None else self.stake[mask]
+        return uids[numpy.argsort(-stake, kind="stable")][:count]
+
+    @staticmethod
+    def _get_key_mask(keys, key_index, key):
+        # The keys are sorted, so the key is found with a binary search.
+        if key is None:
+            return numpy.zeros(len(key_index), dtype=bool)
+        index = numpy.searchsorted(keys, key)
+        if index == len(keys) or keys[index] != key:
+            return numpy.zeros(len(key_index), dtype=bool)
+        return key_index == index
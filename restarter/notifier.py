@@ -0,0 +1,255 @@
+# Standard imports
+import atexit
+from dataclasses import dataclass, field
+import http.client
+import json
+import os
+import queue
+import threading
+import time
+import traceback
+import urllib.parse
+
+# Local imports
+from .constants import (
+    DISCORD_MESSAGE_MAX_LENGTH,
+    NOTIFIER_COALESCE_WINDOW,
+    NOTIFIER_EXIT_FLUSH_TIMEOUT,
+    NOTIFIER_MAX_RETRIES,
+    NOTIFIER_RETRY_BACKOFF,
+    NOTIFIER_RETRY_MAX_DELAY,
+    NOTIFIER_TIMEOUT,
+)
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_notification_dispatcher():
+    # Returns the shared dispatcher, starting it on first use. Queued
+    # notifications are given a chance to go out when the process exits.
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = NotificationDispatcher()
+            _dispatcher.start()
+            atexit.register(_dispatcher.flush, NOTIFIER_EXIT_FLUSH_TIMEOUT)
+        return _dispatcher
+
+
+def _reset_dispatcher_after_fork():
+    # The dispatcher thread doesn't survive a fork, so a forked child starts
+    # its own dispatcher on first use.
+    global _dispatcher, _dispatcher_lock
+    _dispatcher = None
+    _dispatcher_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_dispatcher_after_fork)
+
+
+@dataclass
+class _Notification:
+    url: str
+    content: str
+    log_info: object = field(default=None, repr=False)
+    log_error: object = field(default=None, repr=False)
+
+
+class _RequestError(Exception):
+    def __init__(self, message, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after  # Delay requested by discord, in seconds
+
+
+# Sends discord webhook notifications from a background thread so callers,
+# e.g. a checker holding the restart lock, never wait on the network.
+#
+# Notifications queued within the coalesce window of each other are sent to
+# their webhook as a single digest message, with repeats of the same message
+# counted instead of sent again. This keeps bursts, e.g. every subnet in a
+# host restarter reporting the same subtensor outage, under discord's rate
+# limits. The HTTPS connection to each webhook host is kept alive between
+# messages. Failed requests are retried with exponential backoff, waiting
+# for discord's retry_after when rate limited.
+#
+# log_info and log_error are optional callables taking a message, used to
+# report whether each notification was sent.
+class NotificationDispatcher:
+    def __init__(
+        self,
+        coalesce_window=NOTIFIER_COALESCE_WINDOW,
+        max_retries=NOTIFIER_MAX_RETRIES,
+    ):
+        self._coalesce_window = coalesce_window
+        self._max_retries = max_retries
+        self._queue = queue.Queue()
+        self._connections = {}  # (scheme, host, port) -> http connection
+
+        # Notifications queued or being sent, for flush().
+        self._unfinished_count = 0
+        self._unfinished_condition = threading.Condition()
+
+    def send(self, url, content, log_info=None, log_error=None):
+        with self._unfinished_condition:
+            self._unfinished_count += 1
+        self._queue.put(_Notification(url, content, log_info, log_error))
+
+    def flush(self, timeout=None):
+        # Waits until the queued notifications have been sent, or have
+        # failed. Returns False if the timeout passed first.
+        with self._unfinished_condition:
+            return self._unfinished_condition.wait_for(
+                lambda: self._unfinished_count == 0, timeout
+            )
+
+    def start(self):
+        dispatcher_thread = threading.Thread(target=self._run, daemon=True)
+        dispatcher_thread.start()
+
+    def _run(self):
+        while True:
+            notifications = self._get_notifications()
+            try:
+                self._send_notifications(notifications)
+            except Exception:
+                # Keep the dispatcher running for the next notifications.
+                traceback.print_exc()
+            finally:
+                with self._unfinished_condition:
+                    self._unfinished_count -= len(notifications)
+                    self._unfinished_condition.notify_all()
+
+    def _get_notifications(self):
+        # Waits for a notification, then collects the ones queued during
+        # the coalesce window after it.
+        notifications = [self._queue.get()]
+        window_end_time = time.monotonic() + self._coalesce_window
+        while True:
+            remaining_time = window_end_time - time.monotonic()
+            if remaining_time <= 0:
+                break
+            try:
+                notifications.append(self._queue.get(timeout=remaining_time))
+            except queue.Empty:
+                break
+        return notifications
+
+    def _send_notifications(self, notifications):
+        url_notifications = {}
+        for notification in notifications:
+            url_notifications.setdefault(notification.url, []).append(notification)
+
+        for url, notifications in url_notifications.items():
+            errors = [
+                self._post(url, message) for message in self._get_digest_messages(notifications)
+            ]
+            error = next((error for error in errors if error is not None), None)
+            for notification in notifications:
+                if error is None:
+                    if notification.log_info:
+                        notification.log_info("Discord monitor notification successfully sent.")
+                elif notification.log_error:
+                    notification.log_error(f"Failed to send discord monitor notification: {error}")
+
+    @staticmethod
+    def _get_digest_messages(notifications):
+        # Counts repeated messages and packs the messages into as few
+        # discord messages as the length limit allows.
+        message_counts = {}
+        for notification in notifications:
+            message_counts[notification.content] = message_counts.get(notification.content, 0) + 1
+
+        digest_messages = []
+        digest_lines = []
+        digest_length = 0
+        for message, count in message_counts.items():
+            line = message if count == 1 else f"{message} (x{count})"
+            if digest_lines and digest_length + 1 + len(line) > DISCORD_MESSAGE_MAX_LENGTH:
+                digest_messages.append("\n".join(digest_lines))
+                digest_lines = []
+                digest_length = 0
+            digest_length += len(line) + (1 if digest_lines else 0)
+            digest_lines.append(line)
+
+        if digest_lines:
+            digest_messages.append("\n".join(digest_lines))
+        return digest_messages
+
+    def _post(self, url, message):
+        # Returns None once the message is sent, or the last error.
+        body = json.dumps({"content": message}).encode()
+        error = None
+        for retry in range(self._max_retries + 1):
+            try:
+                self._request(url, body)
+                return None
+            except _RequestError as exc:
+                error = exc
+
+            if not error.retryable or retry == self._max_retries:
+                break
+
+            if error.retry_after is not None:
+                retry_delay = min(error.retry_after, NOTIFIER_RETRY_MAX_DELAY)
+            else:
+                retry_delay = min(NOTIFIER_RETRY_BACKOFF * 2 ** retry, NOTIFIER_RETRY_MAX_DELAY)
+            time.sleep(retry_delay)
+
+        return error
+
+    def _request(self, url, body):
+        parsed_url = urllib.parse.urlsplit(url)
+        connection_key = (parsed_url.scheme, parsed_url.hostname, parsed_url.port)
+        path = parsed_url.path + (f"?{parsed_url.query}" if parsed_url.query else "")
+
+        connection = self._connections.get(connection_key)
+        if connection is None:
+            connection_class = (
+                http.client.HTTPSConnection if parsed_url.scheme == "https"
+                else http.client.HTTPConnection
+            )
+            connection = connection_class(
+                parsed_url.hostname, parsed_url.port, timeout=NOTIFIER_TIMEOUT
+            )
+            self._connections[connection_key] = connection
+
+        try:
+            connection.request(
+                "POST", path, body, {"Content-Type": "application/json"}
+            )
+            response = connection.getresponse()
+            response_body = response.read()
+        except (OSError, http.client.HTTPException) as exc:
+            # Reconnect on the next request.
+            connection.close()
+            del self._connections[connection_key]
+            raise _RequestError(f"{type(exc).__name__}: {exc}")
+
+        if 200 <= response.status < 300:
+            return
+
+        # Rate limits and server errors are retried. Other errors, e.g. a
+        # deleted webhook, won't go away.
+        raise _RequestError(
+            f"HTTP {response.status} {response.reason}: {response_body[:200]!r}",
+            retryable=response.status == 429 or response.status >= 500,
+            retry_after=(
+                self._get_retry_after(response, response_body)
+                if response.status == 429 else None
+            ),
+        )
+
+    @staticmethod
+    def _get_retry_after(response, response_body):
+        # Discord returns retry_after in seconds in the json body, and in
+        # the Retry-After header.
+        try:
+            return max(float(json.loads(response_body)["retry_after"]), 0)
+        except (ValueError, KeyError, TypeError):
+            pass
+        try:
+            return max(float(response.getheader("Retry-After")), 0)
+        except (TypeError, ValueError):
+            return None
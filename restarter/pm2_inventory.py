@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+# Standard imports
+from dataclasses import dataclass, field
+import json
+import os
+import shlex
+import subprocess
+import threading
+import time
+
+# Local imports
+from .constants import (
+    PM2_DEFAULT_HOME,
+    PM2_INVENTORY_TTL,
+)
+
+_inventory = None
+_inventory_lock = threading.Lock()
+
+
+def get_pm2_inventory():
+    # Returns the shared pm2 inventory, creating it on first use.
+    global _inventory
+    with _inventory_lock:
+        if _inventory is None:
+            _inventory = Pm2Inventory()
+        return _inventory
+
+
+@dataclass
+class Pm2Process:
+    name: str
+    pm_id: int
+    status: str
+    exec_path: str
+    cwd: str
+    args: list
+    out_log_path: str
+    err_log_path: str
+    pm2_env: dict = field(default_factory=dict, repr=False)
+
+    @classmethod
+    def from_jlist(cls, pm2_process):
+        pm2_env = pm2_process.get("pm2_env", {})
+
+        # pm2 keeps the args as a list, unless they were given as a string
+        # in an ecosystem file.
+        args = pm2_env.get("args") or []
+        if isinstance(args, str):
+            args = shlex.split(args)
+
+        return cls(
+            name=pm2_process["name"],
+            pm_id=pm2_process.get("pm_id"),
+            status=pm2_env.get("status"),
+            exec_path=pm2_env.get("pm_exec_path", ""),
+            cwd=pm2_env.get("pm_cwd", ""),
+            args=[str(arg) for arg in args],
+            out_log_path=pm2_env.get("pm_out_log_path"),
+            err_log_path=pm2_env.get("pm_err_log_path"),
+            pm2_env=pm2_env,
+        )
+
+    @property
+    def script_name(self):
+        return os.path.basename(self.exec_path)
+
+    @property
+    def online(self):
+        return self.status == "online"
+
+    @property
+    def log_files(self):
+        return [self.out_log_path, self.err_log_path]
+
+    def get_arg(self, flag):
+        # Returns the value following the flag in the process args, or None
+        # if the flag isn't there.
+        try:
+            return self.args[self.args.index(flag) + 1]
+        except (ValueError, IndexError):
+            return None
+
+
+# Caches the output of pm2 jlist so the checkers and scripts looking up pm2
+# processes don't each start pm2 and parse the full process list. The
+# processes are indexed by name, exec path, script name and "--flag value"
+# args.
+#
+# The cached list is reloaded once it's older than the TTL, or sooner when
+# the pm2 daemon changes its process list. pm2 writes a pid file per running
+# process to $PM2_HOME/pids and removes it when the process stops, and
+# rewrites $PM2_HOME/pm2.pid when the daemon restarts, so starting, stopping,
+# restarting or deleting a process shows up as a change to their mtimes.
+class Pm2Inventory:
+    def __init__(self, ttl=PM2_INVENTORY_TTL, pm2_home=None):
+        pm2_home = os.path.expanduser(pm2_home or os.environ.get("PM2_HOME", PM2_DEFAULT_HOME))
+        self._pids_dir = os.path.join(pm2_home, "pids")
+        self._daemon_pid_file = os.path.join(pm2_home, "pm2.pid")
+        self._ttl = ttl
+        self._lock = threading.Lock()
+
+        self._load_time = None
+        self._change_marker = None
+        self._processes = []
+        self._by_name = {}
+        self._by_exec_path = {}
+        self._by_script_name = {}
+        self._by_arg = {}  # (flag, value) -> processes
+
+    def get_processes(self):
+        with self._lock:
+            self._refresh()
+            return list(self._processes)
+
+    def get_process(self, name):
+        # Returns the process with the name, or None if there isn't one.
+        with self._lock:
+            self._refresh()
+            return self._by_name.get(name)
+
+    def find_by_exec_path(self, exec_path):
+        with self._lock:
+            self._refresh()
+            return list(self._by_exec_path.get(os.path.realpath(exec_path), []))
+
+    def find_by_script_name(self, script_name):
+        with self._lock:
+            self._refresh()
+            return list(self._by_script_name.get(script_name, []))
+
+    def find_by_arg(self, flag, value):
+        # Returns the processes started with "flag value" in their args.
+        with self._lock:
+            self._refresh()
+            return list(self._by_arg.get((flag, str(value)), []))
+
+    def invalidate(self):
+        # Reloads the process list on the next lookup, e.g. after a restart.
+        with self._lock:
+            self._load_time = None
+
+    def _refresh(self):
+        change_marker = self._get_change_marker()
+        if (
+            self._load_time is not None and
+            change_marker == self._change_marker and
+            time.monotonic() - self._load_time < self._ttl
+        ):
+            return
+
+        self._load(self._run_jlist())
+        self._load_time = time.monotonic()
+        self._change_marker = change_marker
+
+    def _get_change_marker(self):
+        change_marker = []
+        for path in (self._pids_dir, self._daemon_pid_file):
+            try:
+                change_marker.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                change_marker.append(None)
+        return tuple(change_marker)
+
+    @staticmethod
+    def _run_jlist():
+        # Raises ValueError if pm2 doesn't output a process list.
+        process = subprocess.run(["pm2", "jlist"], stdout=subprocess.PIPE)
+        return json.loads(process.stdout)
+
+    def _load(self, pm2_output):
+        processes = [Pm2Process.from_jlist(pm2_process) for pm2_process in pm2_output]
+        by_name = {}
+        by_exec_path = {}
+        by_script_name = {}
+        by_arg = {}
+        for process in processes:
+            by_name.setdefault(process.name, process)
+            if process.exec_path:
+                by_exec_path.setdefault(os.path.realpath(process.exec_path), []).append(process)
+                by_script_name.setdefault(process.script_name, []).append(process)
+            for flag, value in zip(process.args, process.args[1:]):
+                if flag.startswith("-"):
+                    by_arg.setdefault((flag, value), []).append(process)
+
+        self._processes = processes
+        self._by_name = by_name
+        self._by_exec_path = by_exec_path
+        self._by_script_name = by_script_name
+        self._by_arg = by_arg
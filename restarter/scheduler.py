@@ -0,0 +1,131 @@
+# Standard imports
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import heapq
+import itertools
+import random
+import threading
+import time
+
+# Local imports
+from .constants import (
+    SCHEDULER_MAX_WORKERS,
+    SCHEDULER_START_JITTER,
+)
+from .utils import logger
+
+
+@dataclass(order=True)
+class _ScheduledCheck:
+    due_time: float
+    sequence: int
+    name: str = field(compare=False)
+    checker: object = field(compare=False)
+    started: bool = field(default=False, compare=False)
+
+
+# Drives the periodic work of every checker from a single scheduler thread.
+# Checks are kept in a heap ordered by their next due time. When a check is
+# due it's handed to a pool of worker threads, so a slow subtensor fetch or a
+# restart doesn't hold up the other checks, and it's pushed back onto the
+# heap with the interval returned by the checker once it finishes.
+#
+# The pool is bounded by max_workers. Every call a check can block on has its
+# own timeout: the subtensor fetches try each local subtensor once with
+# SUBTENSOR_FETCH_TIMEOUT, the git commands have GIT_COMMAND_TIMEOUT and the
+# restart script has the restart timeout. So a check always returns its
+# worker, and a subtensor outage can't keep the other checkers from running
+# for long.
+class CheckerScheduler:
+    log_prefix = "SCHEDULER"
+
+    def __init__(self, max_workers=SCHEDULER_MAX_WORKERS, on_error=None):
+        self._max_workers = max_workers
+        self._on_error = on_error
+        self._heap = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._next_due_times = {}
+        self._executor = None  # Created on start, once the checkers are added
+        self._thread = None
+
+    @classmethod
+    def log_info(cls, message):
+        logger.info(f"{cls.log_prefix}: {message}")
+
+    @classmethod
+    def log_error(cls, message):
+        logger.error(f"{cls.log_prefix}: {message}")
+
+    def add(self, name, checker, start_jitter=SCHEDULER_START_JITTER):
+        # Jitter the first run so the checkers don't all hit the subtensor
+        # and pm2 at the same time.
+        start_delay = random.uniform(0, start_jitter)
+        self.log_info(f"Starting {name} checker in {start_delay:.1f} seconds.")
+        self._push(_ScheduledCheck(time.time() + start_delay, next(self._sequence), name, checker))
+
+    def get_next_due_times(self):
+        # Returns the next due time of each checker, keyed by checker name.
+        # Checkers that are currently running aren't included.
+        with self._condition:
+            return dict(self._next_due_times)
+
+    def start(self):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(min(len(self._heap), self._max_workers), 1),
+            thread_name_prefix="checker",
+        )
+        self._thread = threading.Thread(target=self.run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def join(self):
+        if self._thread:
+            self._thread.join()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0].due_time > time.time():
+                    timeout = self._heap[0].due_time - time.time() if self._heap else None
+                    self._condition.wait(timeout)
+
+                scheduled_check = heapq.heappop(self._heap)
+                del self._next_due_times[scheduled_check.name]
+
+            self._executor.submit(self._run_check, scheduled_check)
+
+    def _push(self, scheduled_check):
+        with self._condition:
+            heapq.heappush(self._heap, scheduled_check)
+            self._next_due_times[scheduled_check.name] = scheduled_check.due_time
+            self._condition.notify()
+
+    def _run_check(self, scheduled_check):
+        checker = scheduled_check.checker
+        try:
+            if not scheduled_check.started:
+                if not checker.start():
+                    self.log_info(f"{scheduled_check.name} checker did not start.")
+                    return
+                scheduled_check.started = True
+
+            interval = checker.check()
+
+        except Exception as exc:
+            import traceback
+
+            traceback.print_exc()
+            checker.log_error(f"Error: {exc}")
+            self.log_error(f"Removing {scheduled_check.name} checker.")
+            if scheduled_check.started:
+                checker.stop()
+            if self._on_error:
+                self._on_error(checker)
+            return
+
+        scheduled_check.due_time = time.time() + interval
+        scheduled_check.sequence = next(self._sequence)
+        checker.log_info(
+            f"Next check in {interval} seconds at {time.ctime(scheduled_check.due_time)}."
+        )
+        self._push(scheduled_check)
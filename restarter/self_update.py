@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+# Standard imports
+from dataclasses import asdict, dataclass
+import fcntl
+import json
+import os
+import shlex
+import subprocess
+import tempfile
+import time
+
+# Local imports
+from .constants import (
+    RESTARTER_GIT_PATHS,
+    RESTARTER_PREFIX,
+    RESTARTER_UPDATE_INTERVAL,
+    RESTARTER_UPDATE_STATE_FILE,
+)
+from .utils import logger
+
+
+class RestarterUpdateError(Exception):
+    pass
+
+
+@dataclass
+class RestarterUpdateState:
+    commit: str  # HEAD after the last pull
+    code_commit: str  # Last commit changing RESTARTER_GIT_PATHS at that HEAD
+    update_time: float
+    error: str | None = None  # Set if the last pull failed
+
+
+# Coordinates the restarter code update between all the restarters on a host,
+# which share the same restarter repo checkout. The restarter that finds the
+# shared state older than the update interval takes the file lock, pulls the
+# repo and publishes the resulting commits to the state file. The others wait
+# on the lock if a pull is in progress, then read the published state instead
+# of running git themselves.
+#
+# Each restarter compares the published restarter code commit with the one
+# it was started with to decide whether its code changed.
+class RestarterUpdateCoordinator:
+    log_prefix = RESTARTER_PREFIX
+
+    def __init__(
+        self,
+        repo_path,
+        state_file=RESTARTER_UPDATE_STATE_FILE,
+        interval=RESTARTER_UPDATE_INTERVAL,
+    ):
+        self._repo_path = repo_path
+        self._state_file = os.path.expanduser(state_file)
+        self._lock_file = f"{self._state_file}.lock"
+        self._interval = interval
+
+    @classmethod
+    def log_info(cls, message):
+        logger.info(f"{cls.log_prefix}: {message}")
+
+    @classmethod
+    def log_warning(cls, message):
+        logger.warning(f"{cls.log_prefix}: {message}")
+
+    def get_code_commit(self):
+        # Returns the last commit changing the restarter code at the current
+        # HEAD. This only reads the repo.
+        paths = shlex.join(RESTARTER_GIT_PATHS)
+        return self._run_git(f"log -1 --format=%H HEAD -- {paths}")
+
+    def update(self):
+        # Returns the latest state, pulling the repo first if no restarter
+        # on the host has in the last interval. Raises RestarterUpdateError
+        # if this restarter's pull fails.
+        #
+        # The state is also stale when the repo's HEAD isn't the published
+        # commit, e.g. after bin/start_restarter pulled the repo, so a
+        # restarter started on newer code doesn't exit on the older state.
+        os.makedirs(os.path.dirname(self._state_file), exist_ok=True)
+        with open(self._lock_file, "a") as lock_fp:
+            # The lock is released when the file is closed.
+            fcntl.flock(lock_fp, fcntl.LOCK_EX)
+
+            state = self._read_state()
+            if (
+                state and
+                time.time() - state.update_time < self._interval and
+                self._run_git("rev-parse HEAD") == state.commit
+            ):
+                self.log_info(
+                    f"Using the restarter repo update from {time.ctime(state.update_time)}."
+                )
+                if state.error:
+                    self.log_warning(f"The last restarter repo update failed: {state.error}")
+                return state
+
+            state = self._pull()
+            self._write_state(state)
+
+        if state.error:
+            raise RestarterUpdateError(state.error)
+        return state
+
+    def _pull(self):
+        current_commit = self._run_git("rev-parse HEAD")
+        error = None
+        try:
+            self._run_git("pull --autostash", capture_output=False)
+        except RestarterUpdateError as exc:
+            error = str(exc)
+
+        new_commit = self._run_git("rev-parse HEAD")
+        self.log_info(f"Current commit: {current_commit}")
+        self.log_info(f"New commit: {new_commit}")
+
+        return RestarterUpdateState(
+            commit=new_commit,
+            code_commit=self.get_code_commit(),
+            update_time=time.time(),
+            error=error,
+        )
+
+    def _run_git(self, git_args, capture_output=True):
+        git_cmd = f"git -C {self._repo_path} {git_args}"
+        try:
+            process = subprocess.run(
+                shlex.split(git_cmd),
+                check=True,
+                stdout=subprocess.PIPE if capture_output else None,
+            )
+        except subprocess.CalledProcessError as exc:
+            raise RestarterUpdateError(f"'{git_cmd}' command failed: {exc}")
+
+        return process.stdout.decode().strip() if capture_output else None
+
+    def _read_states(self):
+        # The state file holds a state per repo path in case the host has
+        # more than one restarter checkout.
+        try:
+            with open(self._state_file, "r") as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            return {}
+
+    def _read_state(self):
+        state = self._read_states().get(self._repo_path)
+        try:
+            return RestarterUpdateState(**state) if state else None
+        except TypeError:
+            return None
+
+    def _write_state(self, state):
+        # Written to a temporary file and renamed so a reader never sees a
+        # partial file.
+        states = self._read_states()
+        states[self._repo_path] = asdict(state)
+
+        fd, temp_file = tempfile.mkstemp(dir=os.path.dirname(self._state_file))
+        try:
+            with os.fdopen(fd, "w") as fp:
+                json.dump(states, fp, indent=4)
+            os.replace(temp_file, self._state_file)
+        except BaseException:
+            os.unlink(temp_file)
+            raise
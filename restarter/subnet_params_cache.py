@@ -0,0 +1,96 @@
+# Standard imports
+import json
+import os
+import tempfile
+
+# Local imports
+from .constants import (
+    SUBNET_PARAMS_CACHE_DIR,
+    SUBNET_PARAMS_CACHE_TTL,
+    SUBNET_PARAMS_INVALIDATING_ERRORS,
+)
+
+
+# Caches the subnet parameters that rarely change, e.g. the weights version
+# key and the weight limits, so the burn and weight copy loops don't read
+# them from the chain on every iteration. The parameters are stamped with the
+# block they were read at and expire ttl blocks later.
+#
+# The cache is kept in a json file per netuid and is read from disk on every
+# lookup, so it's shared between the loop's subprocesses and survives
+# restarts. The name separates the caches of different loops on the same
+# subnet, as they cache different parameters.
+class SubnetParamsCache:
+    def __init__(self, name, netuid, ttl=SUBNET_PARAMS_CACHE_TTL, cache_dir=SUBNET_PARAMS_CACHE_DIR):
+        self._cache_file = os.path.join(
+            os.path.expanduser(cache_dir), f"{name}_sn{netuid}.json"
+        )
+        self._ttl = ttl
+
+    def get(self, block):
+        # Returns a (cached block, params) tuple, or None if nothing is cached
+        # or the params expired at the block.
+        if not self._ttl:
+            return None
+
+        entry = self._read()
+        if entry is None:
+            return None
+
+        cached_block = entry["block"]
+        # A block before the cached one means the chain data was reset.
+        if not 0 <= block - cached_block < self._ttl:
+            return None
+
+        return cached_block, entry["params"]
+
+    def set(self, block, params):
+        if self._ttl:
+            self._write({"block": block, "params": params})
+
+    def update(self, **params):
+        # Adds params to the cached entry without changing its block, e.g.
+        # a value resolved from the cached ones.
+        entry = self._read()
+        if entry is not None:
+            entry["params"].update(params)
+            self._write(entry)
+
+    def invalidate(self):
+        try:
+            os.unlink(self._cache_file)
+        except FileNotFoundError:
+            pass
+
+    def invalidate_on_error(self, error):
+        # Invalidates the cache if the weight setting error is caused by a
+        # cached parameter that changed. Returns whether it did.
+        if not any(error_name in str(error) for error_name in SUBNET_PARAMS_INVALIDATING_ERRORS):
+            return False
+
+        self.invalidate()
+        return True
+
+    def _read(self):
+        try:
+            with open(self._cache_file, "r") as fp:
+                entry = json.load(fp)
+            if isinstance(entry["block"], int) and isinstance(entry["params"], dict):
+                return entry
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    def _write(self, entry):
+        # Written to a temporary file and renamed so a reader never sees a
+        # partial file.
+        cache_dir = os.path.dirname(self._cache_file)
+        os.makedirs(cache_dir, exist_ok=True)
+        fd, temp_file = tempfile.mkstemp(dir=cache_dir)
+        try:
+            with os.fdopen(fd, "w") as fp:
+                json.dump(entry, fp, indent=4)
+            os.replace(temp_file, self._cache_file)
+        except BaseException:
+            os.unlink(temp_file)
+            raise
@@ -0,0 +1,148 @@
+# Standard imports
+import json
+import os
+import pickle
+import random
+import socketserver
+import threading
+import time
+
+# Local imports
+from .checker_subtensor import (
+    enable_persistent_subtensor_connection,
+    get_subtensor_snapshot,
+)
+from .constants import LOCAL_SUBTENSORS
+from .subtensor_worker import SubtensorWorker
+from .utils import logger
+
+
+# Host-wide daemon that fetches the subtensor data for every configured netuid
+# over a single subtensor connection once per interval and serves it to the
+# restarter Updated and vTrust checkers over a unix socket.
+class SubtensorSnapshotDaemon:
+    log_prefix = "SUBTENSOR DAEMON"
+
+    _local_subtensors = LOCAL_SUBTENSORS
+
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                request = json.loads(self.rfile.readline())
+                key = (int(request["netuid"]), int(request["mechid"]))
+            except (ValueError, KeyError, TypeError) as exc:
+                self.server.snapshot_daemon.log_error(f"Bad request: {exc}")
+                return
+
+            snapshot_time, subtensor_data = self.server.snapshot_daemon.get_snapshot_data(key)
+            self.wfile.write(pickle.dumps((snapshot_time, subtensor_data)))
+
+    class Server(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+    def __init__(self, netuid_mechids, socket_path, interval, worker_max_rss, worker_max_requests):
+        self._netuid_mechids = netuid_mechids
+        self._socket_path = os.path.expanduser(socket_path)
+        self._interval = interval
+
+        # The long-lived subprocess in which the snapshots are fetched.
+        self._subtensor_worker = SubtensorWorker(
+            self.log_prefix,
+            worker_max_rss,
+            worker_max_requests,
+            initializer=enable_persistent_subtensor_connection,
+        )
+
+        self._snapshot_lock = threading.Lock()
+        self._snapshot = {}
+        self._snapshot_time = 0
+
+        # Randomize local subtensor.
+        random.seed()
+        self._local_subtensor_index = random.randint(0, len(self._local_subtensors) - 1)
+
+    @classmethod
+    def log_info(cls, message):
+        logger.info(f"{cls.log_prefix}: {message}")
+
+    @classmethod
+    def log_error(cls, message):
+        logger.error(f"{cls.log_prefix}: {message}")
+
+    def get_snapshot_data(self, key):
+        with self._snapshot_lock:
+            return self._snapshot_time, self._snapshot.get(key)
+
+    def run(self):
+        self.log_info("")
+        self.log_info("Starting subtensor snapshot daemon.")
+        for netuid, mechids in self._netuid_mechids.items():
+            self.log_info(f"Subnet {netuid}: mechids {mechids}")
+        self.log_info("")
+
+        server = self._start_server()
+        try:
+            while True:
+                start_time = time.time()
+                self._update_snapshot()
+
+                sleep_interval = self._interval - (time.time() - start_time)
+                if sleep_interval > 0:
+                    time.sleep(sleep_interval)
+                else:
+                    self.log_info(
+                        f"Fetching the snapshot took longer than {self._interval} "
+                        "seconds. Not sleeping."
+                    )
+        finally:
+            self._subtensor_worker.close()
+            server.shutdown()
+            server.server_close()
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+
+    def _start_server(self):
+        os.makedirs(os.path.dirname(self._socket_path), exist_ok=True)
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+
+        server = self.Server(self._socket_path, self.RequestHandler)
+        server.snapshot_daemon = self
+        os.chmod(self._socket_path, 0o600)
+
+        server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+        server_thread.start()
+        self.log_info(f"Serving subtensor snapshots on {self._socket_path}")
+
+        return server
+
+    def _update_snapshot(self):
+        # Loop until we get a subtensor connection. The subtensor is only rotated
+        # on failure so the worker process can keep its connection open.
+        while True:
+            network_name = self._local_subtensors[self._local_subtensor_index]
+            network = f"ws://subtensor-{network_name}.rizzo.network:9944"
+
+            args = [self.log_prefix, network, self._netuid_mechids]
+            try:
+                snapshot = self._subtensor_worker.apply(get_subtensor_snapshot, args)
+            except (TypeError, ValueError):
+                raise
+            except Exception as err:
+                self.log_error("")
+                self.log_error(f"Subtensor connection failed on '{network}'")
+                self.log_error(f"{type(err).__name__}: {err}")
+                self.log_error("")
+                self.log_error("Rotating subtensors and trying again.")
+                self._local_subtensor_index = \
+                    (self._local_subtensor_index + 1) % len(self._local_subtensors)
+                time.sleep(1)
+            else:
+                break
+
+        with self._snapshot_lock:
+            self._snapshot = snapshot
+            self._snapshot_time = time.time()
+
+        blocks = {subtensor_data.block for subtensor_data in snapshot.values()}
+        self.log_info(f"Updated snapshot for {len(snapshot)} subnet mechanisms at block(s) {sorted(blocks)}.")
@@ -0,0 +1,164 @@
+# Standard imports
+import multiprocessing
+import time
+
+# Local imports
+from .utils import logger
+
+
+def _get_process_rss_mb(pid):
+    # Read the resident set size from /proc rather than requiring psutil.
+    try:
+        with open(f"/proc/{pid}/status", "r") as fp:
+            for line in fp:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError, IndexError):
+        pass
+
+    return None
+
+
+def _worker_main(conn, parent_conn, initializer):
+    # Close the inherited parent end of the pipe so the worker sees EOF
+    # when the parent closes it.
+    parent_conn.close()
+
+    if initializer:
+        initializer()
+
+    while True:
+        try:
+            func, args, kwargs = conn.recv()
+        except EOFError:
+            # The parent process closed the pipe.
+            return
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            try:
+                conn.send(("error", exc))
+            except Exception:
+                # The exception couldn't be pickled.
+                conn.send(("error", RuntimeError(f"{type(exc).__name__}: {exc}")))
+        else:
+            conn.send(("ok", result))
+
+
+class SubtensorWorkerError(Exception):
+    pass
+
+
+# A long-lived subprocess for running the subtensor fetches. This replaces
+# forking a new multiprocessing Pool for every fetch. The worker is only
+# recycled when its memory grows past max_rss_mb or after max_requests
+# requests to get around the subtensor connection memory leaks.
+class SubtensorWorker:
+    def __init__(self, log_prefix, max_rss_mb, max_requests, initializer=None):
+        self._log_prefix = log_prefix
+        self._max_rss_mb = max_rss_mb
+        self._max_requests = max_requests
+        self._initializer = initializer
+
+        self._mp_context = multiprocessing.get_context("fork")
+        self._process = None
+        self._conn = None
+        self._num_requests = 0
+        self._num_recycles = 0
+
+    def log_info(self, message):
+        logger.info(f"{self._log_prefix}: {message}")
+
+    def log_warning(self, message):
+        logger.warning(f"{self._log_prefix}: {message}")
+
+    @property
+    def num_recycles(self):
+        return self._num_recycles
+
+    def apply(self, func, args=(), kwargs=None, timeout=None):
+        # The worker is killed if it doesn't answer within the timeout, since
+        # it may be stuck on a subtensor call.
+        self._ensure_worker()
+
+        start_time = time.time()
+        try:
+            self._conn.send((func, args, kwargs or {}))
+            if timeout is not None and not self._conn.poll(timeout):
+                self.log_warning(f"Subtensor worker request timed out after {timeout} seconds.")
+                self._stop_worker(kill=True)
+                raise SubtensorWorkerError("Subtensor worker request timed out.")
+            status, result = self._conn.recv()
+        except (EOFError, OSError) as exc:
+            # The worker died mid-request.
+            self.log_warning(f"Subtensor worker died: {type(exc).__name__}: {exc}")
+            self._stop_worker()
+            raise SubtensorWorkerError("Subtensor worker died.")
+        finally:
+            self._num_requests += 1
+
+        self.log_info(
+            f"Subtensor worker request took {time.time() - start_time:.2f} seconds "
+            f"(request {self._num_requests}, {self._num_recycles} worker recycles)."
+        )
+
+        if status == "error":
+            raise result
+
+        return result
+
+    def close(self):
+        self._stop_worker()
+
+    def _ensure_worker(self):
+        if self._process is not None:
+            recycle_reason = self._get_recycle_reason()
+            if not recycle_reason:
+                return
+
+            self._num_recycles += 1
+            self.log_info(
+                f"Recycling subtensor worker: {recycle_reason} "
+                f"({self._num_recycles} worker recycles)."
+            )
+            self._stop_worker()
+
+        parent_conn, child_conn = self._mp_context.Pipe()
+        self._process = self._mp_context.Process(
+            target=_worker_main, args=(child_conn, parent_conn, self._initializer),
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._num_requests = 0
+        self.log_info(f"Started subtensor worker process {self._process.pid}.")
+
+    def _get_recycle_reason(self):
+        if not self._process.is_alive():
+            return "worker process is not running"
+
+        if self._max_requests and self._num_requests >= self._max_requests:
+            return f"{self._num_requests} requests >= {self._max_requests}"
+
+        if self._max_rss_mb:
+            rss_mb = _get_process_rss_mb(self._process.pid)
+            if rss_mb is not None and rss_mb >= self._max_rss_mb:
+                return f"{rss_mb:.0f} MB RSS >= {self._max_rss_mb} MB"
+
+        return None
+
+    def _stop_worker(self, kill=False):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+        if self._process is not None:
+            # Closing the pipe makes the worker exit on its own.
+            if not kill:
+                self._process.join(timeout=10)
+            if self._process.is_alive():
+                self._process.kill()
+                self._process.join()
+            self._process = None
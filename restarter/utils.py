@@ -1,8 +1,5 @@
 # Standard imports
-import json
 import logging
-import shlex
-import subprocess
 import sys
 import threading
 import time
@@ -15,41 +12,48 @@ from .constants import (
     DISCORD_MONITOR_URL,
     DISCORD_MONITOR_GIT_REPO_URL,
 )
+from .notifier import get_notification_dispatcher
 
 
-_pm2_log_output_wait_timer = None
-restart_lock = threading.Lock()
+# Keyed by netuid so a single restarter process can supervise multiple subnets.
+_pm2_log_output_wait_timers = {}
+_restart_locks = {}
+_restart_locks_lock = threading.Lock()
 
 
-def get_pm2_log_output_wait_timer():
-    return _pm2_log_output_wait_timer
+def get_pm2_log_output_wait_timer(netuid):
+    return _pm2_log_output_wait_timers.get(netuid)
 
 
-def set_pm2_log_output_wait_timer(pm2_log_output_wait_timer):
-    global _pm2_log_output_wait_timer
-    _pm2_log_output_wait_timer = pm2_log_output_wait_timer
+def set_pm2_log_output_wait_timer(netuid, pm2_log_output_wait_timer):
+    _pm2_log_output_wait_timers[netuid] = pm2_log_output_wait_timer
+
+
+def get_restart_lock(netuid):
+    with _restart_locks_lock:
+        return _restart_locks.setdefault(netuid, threading.Lock())
+
+
+def get_all_restart_locks():
+    with _restart_locks_lock:
+        return list(_restart_locks.values())
 
 
 def send_monitor_notification(log_prefix, message, git_update_notify=False):
+    # Queues the notification so the caller, e.g. a checker holding the
+    # restart lock, doesn't wait on discord.
     discord_monitor_url = (
         DISCORD_MONITOR_GIT_REPO_URL if git_update_notify else DISCORD_MONITOR_URL
     )
-    payload = json.dumps({"content": f"validator restarter: {message}"})
-    monitor_cmd = [
-        "curl", "-H", "Content-Type: application/json",
-        "-d", payload, discord_monitor_url
-    ]
-
-    monitor_cmd_str = shlex.join(monitor_cmd)
-    logger.info(f"{log_prefix}: Running command: '{monitor_cmd_str}'")
-
-    try:
-        subprocess.run(monitor_cmd, check=True)
-    except subprocess.CalledProcessError as exc:
-        logger.error(f"{log_prefix}: Failed to send discord monitor notification.")
-        logger.error(f"{log_prefix}: '{monitor_cmd_str}' command failed with error {exc}")
-    else:
-        logger.info(f"{log_prefix}: Discord monitor notification successfully sent.")
+    content = f"validator restarter: {message}"
+    logger.info(f"{log_prefix}: Queuing discord monitor notification: {content}")
+
+    get_notification_dispatcher().send(
+        discord_monitor_url,
+        content,
+        log_info=lambda msg: logger.info(f"{log_prefix}: {msg}"),
+        log_error=lambda msg: logger.error(f"{log_prefix}: {msg}"),
+    )
 
 
 def _get_logger():
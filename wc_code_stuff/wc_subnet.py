@@ -1,8 +1,10 @@
 # Standard imports
 import argparse
+from dataclasses import dataclass, field, replace
 import logging
 import multiprocessing
 import random
+import os
 import sys
 import time
 
@@ -10,6 +12,15 @@ import time
 import bittensor as bt
 from bittensor.wallet import Wallet
 
+# Set path to import local modules
+sys.path = [os.path.dirname(os.path.dirname(os.path.abspath(__file__)))] + sys.path
+
+# Local imports
+from restarter.block_feed import get_block_feed
+from restarter.constants import SUBNET_PARAMS_CACHE_TTL
+from restarter.neuron_table import NeuronTable
+from restarter.subnet_params_cache import SubnetParamsCache
+
 
 # Constants
 
@@ -22,6 +33,21 @@ BLOCK_TIME = 12
 # Weight setting interval in blocks
 INTERVAL = 120
 
+# The number of blocks before the weight setting block to prepare the weights
+PREPARE_BLOCKS = 3
+
+# Seconds between block number checks while waiting for the weight setting
+# block in the last block before it
+TRIGGER_POLL_INTERVAL = 1
+
+# Extra seconds to wait for the block feed to reach the next weight setting
+# block before falling back to the block time
+BLOCK_FEED_WAIT_MARGIN = 60
+
+# Seconds between checks of the block feed's latest block while waiting for
+# the weight setting block in the iteration subprocess
+FEED_BLOCK_POLL_INTERVAL = 0.1
+
 # Local subtensors to rotate
 LOCAL_SUBTENSORS = [
     "cali",
@@ -48,10 +74,39 @@ logger = logging.getLogger(__name__)
 # Create Mulitprocessing queue
 mp_queue = multiprocessing.Queue()
 
+# The latest block number on the block feed, published by the main process
+# for the iteration subprocesses. 0 without the block feed.
+mp_feed_block = multiprocessing.Value("q", 0)
+
+
+@dataclass
+class PreparedWeights:
+    # The weight setting calls, by mechid, built before the weight setting
+    # block so only the submission is left for it.
+    netuid: int
+    weights: dict
+    mechids: list
+    version_key: int
+    calls: dict = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.calls = {
+            mechid: bt.SetWeights(
+                netuid=self.netuid,
+                weights=self.weights,
+                mechid=mechid,
+                version_key=self.version_key
+            )
+            for mechid in self.mechids
+        }
+
 
 class WCValidator:
     def __init__(self):
         self.config = self.get_config()
+        self.params_cache = SubnetParamsCache(
+            "wc", self.config.netuid, ttl=self.config.params_cache_ttl
+        )
 
         # Randomize local subtensor index.
         random.seed()
@@ -86,6 +141,13 @@ class WCValidator:
             help="Manually specify the UID to copy weights from (overrides auto-detection)."
         )
 
+        run_command_parser.add_argument(
+            "--auto-detect-source",
+            action="store_true",
+            help="When --source-uid is not specified, copy the weights from the highest "
+                 "stake validator with 1.0 vTrust that set weights in the last two tempos."
+        )
+
         run_command_parser.add_argument(
             "--local-subtensor",
             nargs="?",
@@ -95,6 +157,22 @@ class WCValidator:
                  "subtensors. When not specified, use the 'finney' network subtensor."
         )
 
+        run_command_parser.add_argument(
+            "--block-feed",
+            action="store_true",
+            help="Wait for the next weight setting block by following the chain head "
+                 "through a new heads subscription on the local subtensors, rather than "
+                 "sleeping 12 seconds per block. Requires --local-subtensor."
+        )
+
+        run_command_parser.add_argument(
+            "--params-cache-ttl",
+            type=int,
+            default=SUBNET_PARAMS_CACHE_TTL,
+            help="The number of blocks to cache the weights version key and mechanisms "
+                 f"for. 0 disables the cache. Default: {SUBNET_PARAMS_CACHE_TTL}"
+        )
+
         run_command_parser.add_argument(
             "--dryrun",
             action="store_true",
@@ -149,10 +227,11 @@ class WCValidator:
         logger.info("Blocks until next epoch, %s...", blocks_until_epoch)
         return blocks_until_epoch
 
-    def get_next_perfect_weight_setting_opportunity(self, subtensor, start_block):
-        blocks_to_wait = start_block + INTERVAL - subtensor.block
-        logger.info("Blocks until next weight set, %s...", blocks_to_wait)
-        return blocks_to_wait
+    def get_next_perfect_weight_setting_opportunity(self, start_block):
+        # Returns the next weight setting block.
+        trigger_block = start_block + INTERVAL
+        logger.info("Next weight set at block %s...", trigger_block)
+        return trigger_block
 
     def ensure_registered_and_validator_permit(self, subtensor, wallet):
         try:
@@ -205,45 +284,88 @@ class WCValidator:
         mech_split = subtensor.subnets.mechanism_emission_split(self.config.netuid)
         return sorted(range(mech_count), key=lambda m: bt.settings.U16_MAX - mech_split[m])
 
+    def get_subnet_params(self, subtensor):
+        # Returns the weights version key and the mechids, which are cached
+        # for the params cache ttl.
+        block = subtensor.block
+        cached_params = self.params_cache.get(block)
+        if cached_params:
+            cached_block, params = cached_params
+            logger.info("Using the subnet parameters cached at block %s.", cached_block)
+            logger.info("Weights Version Key: %s", params["version_key"])
+            return params["version_key"], params["mechids"]
+
+        version_key = self.get_weights_version_key(subtensor)
+        mechids = self.get_mechids(subtensor)
+        self.params_cache.set(block, {"version_key": version_key, "mechids": mechids})
+        return version_key, mechids
+
+    def fetch_neuron_table(self, subtensor):
+        # The validator trust is read at the metagraph's block, so it has an
+        # entry for every neuron.
+        try:
+            metagraph = subtensor.subnets.metagraph(self.config.netuid)
+            if not metagraph.neurons:
+                return None
+
+            validator_trust = subtensor.query(
+                bt.storage.SubtensorModule.ValidatorTrust,
+                block=int(metagraph.block),
+                params=[self.config.netuid],
+            )
+            if len(validator_trust) < len(metagraph.neurons):
+                logger.error(
+                    "Validator trust has %s entries for %s neurons.",
+                    len(validator_trust), len(metagraph.neurons)
+                )
+                return None
+
+            validator_trust = [(vt / bt.settings.U16_MAX) for vt in validator_trust]
+            return NeuronTable.from_metagraph(metagraph, validator_trust=validator_trust)
+        except Exception as e:
+            logger.exception("Error fetching neurons: %s", e)
+            return None
+
     # TODO - Make this better.
-    # TODO - Convert to bt 11.
     def get_wc_uid(self, subtensor, this_uid):
-        logger.error("Auto detection of Weight Copy UID has not been implemented yet.")
-        return None
+        neuron_table = self.fetch_neuron_table(subtensor)
+        if neuron_table is None:
+            logger.warning("Unable to retrieve neurons.")
+            return None
+
+        # Get all validators that aren't us
+        vali_mask = neuron_table.validator_permit & (neuron_table.uid != this_uid)
+        if not vali_mask.any():
+            logger.warning("There are no other validators on this subnet.")
+            return None
+
+        # Filter validators to those with 1.0 vT
+        vali_mask &= neuron_table.vtrust >= (1.0 - EPSILON)
+        if not vali_mask.any():
+            logger.warning("There are no validators with 1.0 vTrust.")
+            return None
+
+        # Filter validators to those with low updated values
+        vali_mask &= neuron_table.block - neuron_table.last_update <= 720  # two tempos
+        if not vali_mask.any():
+            logger.warning("There are no validators with updated value <= 720.")
+            return None
 
-        # # Get all validators that aren't us
-        # vali_uids = metagraph.uids[metagraph.validator_permit]
-        # vali_uids = vali_uids[vali_uids != this_uid]
-        # if not vali_uids.size:
-        #     logger.warning("There are no other validators on this subnet.")
-        #     return None
-
-        # # Filter validators to those with 1.0 vT
-        # vali_vtrust = metagraph.Tv[vali_uids]
-        # vali_uids = vali_uids[vali_vtrust >= (1.0 - EPSILON)]
-        # if not vali_uids.size:
-        #     logger.warning("There are no validators with 1.0 vTrust.")
-        #     return None
-
-        # # Filter validators to those with low updated values 
-        # vali_updated = metagraph.block - metagraph.last_update[vali_uids]
-        # vali_uids = vali_uids[vali_updated <= 720]  # two tempos
-        # if not vali_uids.size:
-        #     logger.warning("There are no validators with updated value <= 720.")
-        #     return None
-
-        # # Select the validator with the highest stake
-        # vali_stake = metagraph.total_stake[vali_uids]
-        # max_stake = max(vali_stake)
-        # wc_uid = int(vali_uids[vali_stake == max_stake][0])
-
-        # return wc_uid
+        # Select the validator with the highest stake
+        return int(neuron_table.get_top_stake_uids(vali_mask, count=1)[0])
 
     def determine_wc_uid(self, subtensor, this_uid):
         if self.config.source_uid is not None:
             logger.info("Using manually specified source UID: %s", self.config.source_uid)
             return self.config.source_uid
 
+        if not self.config.auto_detect_source:
+            logger.error(
+                "No source UID. Specify --source-uid, or --auto-detect-source to "
+                "auto-detect it."
+            )
+            return None
+
         wc_uid = self.get_wc_uid(subtensor, this_uid)
         if wc_uid is None:
             logger.warning("Could not determine WC UID. Not setting weights.")
@@ -259,30 +381,29 @@ class WCValidator:
 
         return weights
 
-    def submit_weights(self, subtensor, wallet, weights, mechids, version_key):
+    def invalidate_params_cache(self, error):
+        # A cached parameter may have changed on chain, so it's read again on
+        # the next iteration.
+        if self.params_cache.invalidate_on_error(error):
+            logger.warning("Subnet parameters cache invalidated by the weight setting error.")
+
+    def submit_weights(self, subtensor, wallet, prepared_weights):
         any_success = False
 
-        for mechid in mechids:
+        for mechid, call in prepared_weights.calls.items():
             try:
-                result = subtensor.execute(
-                    bt.SetWeights(
-                        netuid=self.config.netuid,
-                        weights=weights,
-                        mechid=mechid,
-                        version_key=version_key
-                    ),
-                    wallet,
-                    retries=2
-                ).raise_for_failure()
+                result = subtensor.execute(call, wallet, retries=2).raise_for_failure()
 
             except bt.ChainError as exc:
                 logger.error(
                     "Error setting weights on mechanism %i: %s: %s",
                     mechid, type(exc).__name__, exc)
+                self.invalidate_params_cache(exc)
 
             else:
                 if not result.success:
                     logger.error("Error setting weights on mechanism %i: %s", mechid, result.message)
+                    self.invalidate_params_cache(result.message)
                 else:
                     logger.info("Weights set on mechanism %i.", mechid)
 
@@ -290,7 +411,10 @@ class WCValidator:
 
         return any_success
 
-    def run_wc_code(self):
+    def run_wc_code(self, trigger_block):
+        # Returns the number of blocks to wait, the block they're counted
+        # from and the next weight setting block, if known.
+
         # Initialize wallet.
         # Must initialize it here rather than making it an object variable
         # when running in subprocess mode. Must run in subprocess mode to
@@ -302,60 +426,190 @@ class WCValidator:
         with bt.Subtensor(network=self.config.subtensor_network) as subtensor:
             logger.info("Subtensor: %s", subtensor)
 
-            # Check if registered and has validator permit
-            this_uid = self.ensure_registered_and_validator_permit(subtensor, wallet)
-            if this_uid is None:
-                return self.get_blocks_until_next_epoch(subtensor)
+            # Waking up early for a scheduled weight setting block, e.g. when
+            # the block time is off, waits again rather than setting the
+            # weights early.
+            block = subtensor.block
+            if trigger_block is not None and trigger_block - block > PREPARE_BLOCKS:
+                logger.info(
+                    "The weight setting block is still %s blocks away...", trigger_block - block
+                )
+                return trigger_block - block - PREPARE_BLOCKS, block, trigger_block
+
+            # Prepare the weights, then set them at the weight setting block
+            # if it's within PREPARE_BLOCKS. Otherwise they're set right away,
+            # e.g. on the first run.
+            prepared_weights, wait_blocks = self.prepare_weights(subtensor, wallet)
+            block = subtensor.block
+            if prepared_weights is None:
+                return wait_blocks, block, None
+
+            if trigger_block is not None and 0 < trigger_block - block <= PREPARE_BLOCKS:
+                self.wait_for_trigger_block(subtensor, trigger_block)
+
+            return self.commit_weights(subtensor, wallet, prepared_weights, trigger_block)
+
+    def prepare_weights(self, subtensor, wallet):
+        # Returns the prepared weights, or None and the number of blocks to
+        # wait if weights can't be set.
+
+        # Check if registered and has validator permit
+        this_uid = self.ensure_registered_and_validator_permit(subtensor, wallet)
+        if this_uid is None:
+            return None, self.get_blocks_until_next_epoch(subtensor)
 
-            # Get the weights version key.
-            version_key = self.get_weights_version_key(subtensor)
+        # Get the weights version key and the mechids.
+        version_key, mechids = self.get_subnet_params(subtensor)
 
-            # Get the mechids.
-            mechids = self.get_mechids(subtensor)
+        # Get the wc uid
+        wc_uid = self.determine_wc_uid(subtensor, this_uid)
+        if wc_uid is None:
+            return None, self.get_blocks_until_next_epoch(subtensor)
 
-            # Get the wc uid
-            wc_uid = self.determine_wc_uid(subtensor, this_uid)
-            if wc_uid is None:
-                return self.get_blocks_until_next_epoch(subtensor)
+        # Get the weights to set
+        weights = self.prepare_weight_payload(subtensor, wc_uid)
 
-            # Get the weights to set
-            weights = self.prepare_weight_payload(subtensor, wc_uid)
+        prepared_weights = PreparedWeights(self.config.netuid, weights, mechids, version_key)
+        return prepared_weights, None
 
-            # Get the current block to use after setting weights when determining
-            # the next block for setting weights.
-            start_block = subtensor.block
+    def wait_for_trigger_block(self, subtensor, trigger_block):
+        # Waits on the block feed when it's on, otherwise polls the block
+        # number on the open subtensor connection, so setting the weights
+        # doesn't wait on a new connection.
+        logger.info("Waiting for weight setting block %s...", trigger_block)
+        if self.wait_for_feed_block(trigger_block):
+            return
 
-            # Set weights
-            if self.config.dryrun:
-                logger.info("DRYRUN: Not setting weights.")
-                return self.get_next_perfect_weight_setting_opportunity(subtensor, start_block)
+        while True:
+            block = subtensor.block
+            if block >= trigger_block:
+                return
 
-            if self.submit_weights(subtensor, wallet, weights, mechids, version_key):
-                return self.get_next_perfect_weight_setting_opportunity(subtensor, start_block)
-            else:
-                return self.get_blocks_until_next_epoch(subtensor)
+            time.sleep(BLOCK_TIME if trigger_block - block > 1 else TRIGGER_POLL_INTERVAL)
 
-    def run_in_subprocess(self):
-        wait_blocks = self.run_wc_code()
-        mp_queue.put(wait_blocks)
+    def commit_weights(self, subtensor, wallet, prepared_weights, trigger_block):
+        # Only the weights version key is checked again before setting the
+        # prepared weights.
+        version_key = subtensor.query(
+            bt.storage.SubtensorModule.WeightsVersionKey,
+            params=[self.config.netuid],
+        )
+        if version_key != prepared_weights.version_key:
+            logger.info(
+                "Weights Version Key changed from %s to %s.",
+                prepared_weights.version_key, version_key
+            )
+            prepared_weights = replace(prepared_weights, version_key=version_key)
+            self.params_cache.update(version_key=version_key)
+
+        # Get the current block to use after setting weights when determining
+        # the next block for setting weights.
+        start_block = subtensor.block
+        if trigger_block is not None:
+            logger.info(
+                "Scheduling error: %+i blocks from the weight setting block.",
+                start_block - trigger_block
+            )
+
+        # Set weights
+        if self.config.dryrun:
+            logger.info("DRYRUN: Not setting weights.")
+        elif not self.submit_weights(subtensor, wallet, prepared_weights):
+            return self.get_blocks_until_next_epoch(subtensor), start_block, None
+
+        # The weights are prepared PREPARE_BLOCKS before the next weight
+        # setting block.
+        trigger_block = self.get_next_perfect_weight_setting_opportunity(start_block)
+        return trigger_block - PREPARE_BLOCKS - start_block, start_block, trigger_block
+
+    def wait_for_feed_block(self, trigger_block):
+        # Waits for the block feed's latest block, published by the main
+        # process, to reach the trigger block. Returns False without the
+        # block feed, or if it didn't get there in time, e.g. it stalled.
+        feed_block = mp_feed_block.value
+        if not feed_block:
+            return False
+
+        timeout = max(trigger_block - feed_block, 0) * BLOCK_TIME + BLOCK_FEED_WAIT_MARGIN
+        deadline = time.time() + timeout
+        while mp_feed_block.value < trigger_block:
+            if time.time() >= deadline:
+                logger.warning(
+                    "Block feed did not reach block %s in %i seconds. Polling the block number.",
+                    trigger_block, timeout
+                )
+                return False
+            time.sleep(FEED_BLOCK_POLL_INTERVAL)
+
+        return True
+
+    @staticmethod
+    def publish_feed_block(block):
+        # Called from the block feed thread with each new block.
+        mp_feed_block.value = block.number
+
+    def get_block_feed(self):
+        if not self.config.block_feed:
+            return None
+
+        # The block feed subscribes on the local subtensors.
+        if self.config.local_subtensor is False:
+            logger.warning("The block feed requires --local-subtensor. Not using the block feed.")
+            return None
+
+        network_names = (
+            [self.config.local_subtensor] if self.config.local_subtensor else LOCAL_SUBTENSORS
+        )
+        block_feed = get_block_feed(network_names)
+        if block_feed is None:
+            logger.warning("Could not import the websockets python module. Not using the block feed.")
+        return block_feed
+
+    def wait_for_blocks(self, block_feed, wait_blocks, from_block):
+        # Waits until the chain reaches the target block on the block feed,
+        # falling back to the block time without it.
+        block = block_feed.get_block() if block_feed else None
+        if block is None:
+            time.sleep(wait_blocks * BLOCK_TIME + 0.1)
+            return
+
+        # The target is counted from the block the wait was computed at, so
+        # the time taken by the iteration isn't waited on top of it.
+        target_block = from_block + wait_blocks
+        remaining_blocks = max(target_block - block.number, 0)
+        logger.info("Waiting for block %s, %s blocks from now...", target_block, remaining_blocks)
+        timeout = remaining_blocks * block_feed.get_block_time(BLOCK_TIME) + BLOCK_FEED_WAIT_MARGIN
+        if block_feed.wait_for_block(target_block, timeout) is None:
+            logger.warning(
+                "Block feed did not reach block %s in %i seconds. Not waiting any longer.",
+                target_block, timeout
+            )
+
+    def run_in_subprocess(self, trigger_block):
+        mp_queue.put(self.run_wc_code(trigger_block))
 
     def run(self):
         logger.info("Running validator for subnet %s...", self.config.netuid)
 
+        block_feed = self.get_block_feed()
+        if block_feed:
+            block_feed.add_listener(self.publish_feed_block)
+        trigger_block = None
+
         while True:
             logger.info("Running validator loop...")
             self.rotate_local_subtensor()
 
-            args = []
+            args = [trigger_block]
             with multiprocessing.Pool(processes=1) as pool:
                 pool.apply(self.run_in_subprocess, args)
 
             # Wait for next time to set weights.
-            wait_blocks = mp_queue.get()
+            wait_blocks, from_block, trigger_block = mp_queue.get()
             logger.info(
-                "Waiting %s blocks before next weight set...", wait_blocks
+                "Waiting %s blocks from block %s before next weight set...", wait_blocks, from_block
             )
-            time.sleep(wait_blocks * BLOCK_TIME + 0.1)
+            self.wait_for_blocks(block_feed, wait_blocks, from_block)
 
 
 if __name__ == "__main__":